@@ -168,9 +168,15 @@ export default function App() {
       setOrbState("idle");
     };
     ws.onmessage = (event) => {
-      setOrbState("idle");
       try {
         const data = JSON.parse(event.data);
+        // Control frames (pong, session info, fact reports, the transcript of a voice
+        // upload) are not chat replies; the reply may still be on its way
+        if (data.type) {
+          if (data.type === "facts" && data.new_facts > 0) refreshMemories();
+          return;
+        }
+        setOrbState("idle");
         if (data.error) {
           setError(data.error);
           setMessages((p) => [...p, { id: nextId(), role: "assistant", text: `⚠️ ${data.error}`, timestamp: new Date().toISOString() }]);
@@ -185,7 +191,7 @@ export default function App() {
         }]);
         if (data.audio) new Audio(`data:audio/wav;base64,${data.audio}`).play().catch(() => {});
         if (data.new_facts > 0) refreshMemories();
-      } catch { /* ignore */ }
+      } catch { setOrbState("idle"); }
     };
   }, []);
 
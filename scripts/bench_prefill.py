@@ -0,0 +1,86 @@
+"""Compare Ollama prefill time: flat /api/generate prompts vs. /api/chat sessions.
+
+Runs the same short conversation twice against a running Ollama server and
+prints the prompt-evaluation token count and time Ollama reports per turn:
+
+* ``generate`` — the old path: system prompt + memory + input flattened
+  into one string per turn, so the system prompt is re-evaluated each time.
+* ``chat`` — role-tagged messages with the system prompt and earlier turns
+  as a stable prefix, so only the new tokens need evaluating.
+
+Usage:
+    python scripts/bench_prefill.py --model llama3:latest --turns 6
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from convo_ai.config import Config  # noqa: E402
+from convo_ai.services.ollama import OllamaService  # noqa: E402
+from convo_ai.services.prompt import DEFAULT_SYSTEM_PROMPT, CompiledPrompt  # noqa: E402
+
+TURNS = [
+    "Good morning! What's a good way to start the day?",
+    "Could you make that shorter?",
+    "What should I have for breakfast?",
+    "Something with coffee, perhaps?",
+    "Remind me what you suggested first.",
+    "Thanks, that's all for now.",
+    "Actually, one more thing: any tips for focus?",
+    "Lovely. Goodbye for now.",
+]
+MEMORY = "- [preference] The user prefers concise answers\n- [name] The user's name is Bradley"
+
+
+async def run(mode: str, ollama: OllamaService, turns: int) -> list[dict]:
+    prompt = CompiledPrompt(DEFAULT_SYSTEM_PROMPT, version=0)
+    history: list[tuple[str, str]] = []
+    rows = []
+    for text in TURNS[:turns]:
+        if mode == "chat":
+            reply = await ollama.chat(prompt.messages(text, MEMORY, history))
+        else:
+            reply = await ollama.generate(prompt.render(text, MEMORY))
+        history.append((text, reply))
+        rows.append(dict(ollama.last_stats))
+    return rows
+
+
+def report(mode: str, rows: list[dict]) -> None:
+    print(f"\n{mode}")
+    print(f"{'turn':>4}  {'prompt tokens':>13}  {'prefill ms':>10}")
+    for i, row in enumerate(rows, 1):
+        print(f"{i:>4}  {row['prompt_eval_count']:>13}  {row['prompt_eval_ms']:>10.1f}")
+    # Turn 1 is a cold start for both modes; compare the warm turns.
+    warm = [row["prompt_eval_ms"] for row in rows[1:]] or [0.0]
+    print(f"warm-turn prefill: median {statistics.median(warm):.1f} ms, total {sum(warm):.1f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None, help="Ollama model (default: from config)")
+    parser.add_argument("--url", default=None, help="Ollama /api/generate URL")
+    parser.add_argument("--turns", type=int, default=6, choices=range(2, len(TURNS) + 1))
+    parser.add_argument("--config", default=None, help="Path to config.json")
+    args = parser.parse_args()
+
+    config = Config.from_file(args.config) if args.config else Config()
+    if args.model:
+        config.model = args.model
+    if args.url:
+        config.ollama_api_url = args.url
+    ollama = OllamaService(config)
+    try:
+        for mode in ("generate", "chat"):
+            report(mode, await run(mode, ollama, args.turns))
+    finally:
+        await ollama.client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,30 +2,61 @@
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 import logging
 import re
-import tempfile
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-import requests
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.requests import HTTPConnection
 
 from ..config import Config
+from ..services.archive import HistoryArchive, RetentionWorker
+from ..services.budget import PromptAssembler
 from ..services.database import Database
-from ..services.memory import MemoryService
-from ..services.ollama import OllamaService
+from ..services.extraction import ExtractionJob, FactExtractionWorker, FactsCallback
+from ..services.history_writer import HistoryWriter
+from ..services.http import create_http_client
+from ..services.memory import MemoryService, validate_memory_item
+from ..services.ollama import FALLBACK_RESPONSE, Message, OllamaService
 from ..services.prompt import DEFAULT_SYSTEM_PROMPT, PromptService
-from ..services.stt import STTService
+from ..services.response_cache import ResponseCache
+from ..services.semantic_cache import CachedTurn, SemanticCache, scope_key
+from ..services.session import ChatSession, SessionStore, parse_bool
+from ..services.storage import DEFAULT_USER, Storage
+from ..services.streaming_stt import StreamingTranscriber
+from ..services.stt_pool import TranscriptionPool
+from ..services.summary import SessionSummarizer
 from ..services.tts import TTSService
 
 logger = logging.getLogger(__name__)
 
+# Cap on per-line errors echoed back by bulk imports
+MAX_REPORTED_ERRORS = 20
+
+USER_HEADER = "X-User-Id"
+MAX_USER_ID_LENGTH = 128
+
+
+def current_user(conn: HTTPConnection) -> str:
+    """Resolve the caller's user id from the ``X-User-Id`` header or ``?user_id=``.
+
+    History, memories and the system prompt are all partitioned by this id;
+    callers that send neither share the ``default`` user.
+    """
+    raw = conn.headers.get(USER_HEADER) or conn.query_params.get("user_id") or ""
+    return raw.strip()[:MAX_USER_ID_LENGTH] or DEFAULT_USER
+
 
 def naturalize_response(text: str) -> str:
     """Make the response more natural and Jarvis-like."""
@@ -49,6 +80,23 @@ def analyze_mood(text: str) -> str:
     return "neutral"
 
 
+@dataclass
+class PreparedTurn:
+    """An LLM request built for one chat turn, plus what went into it."""
+
+    request: str | list[Message]
+    memories: list[dict[str, Any]]
+    usage: dict[str, Any]
+    text: str = ""
+    cache_key: str | None = None
+    cached: bool = False
+    # Semantic cache: the query embedding, its scope, and the turn it matched or created
+    embedding: list[float] | None = None
+    scope: str | None = None
+    semantic: CachedTurn | None = None
+    similarity: float | None = None
+
+
 async def _safe_send(websocket: WebSocket, data: dict[str, Any]) -> None:
     """Send JSON over WebSocket, silently ignoring errors if the socket is closed."""
     import contextlib
@@ -62,10 +110,96 @@ def create_app(config: Config | None = None) -> FastAPI:
     if config is None:
         config = Config.from_file()
 
+    state: dict[str, Any] = {
+        "config": config,
+        "sessions": SessionStore(
+            max_history=config.conversation_settings.max_history,
+            idle_timeout=config.conversation_settings.session_idle_timeout,
+        ),
+    }
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        # One pooled HTTP client shared by every service that talks to Ollama.
+        http = create_http_client(config)
+        state["http"] = http
+        try:
+            # History, memories and the prompt share one SQLite file and engine.
+            storage = Storage(config)
+            state["storage"] = storage
+            state["db"] = Database(config, storage=storage)
+            state["archive"] = HistoryArchive(
+                config.storage_settings.archive_dir or storage.sibling_path("_archive"),
+                segment_max_bytes=config.storage_settings.archive_segment_max_bytes,
+            )
+            # New rows must never reuse an id the archive already holds
+            state["db"].reserve_ids(state["archive"].last_id)
+            state["ollama"] = OllamaService(config, client=http)
+            # Whisper replicas live in worker threads/processes, off the event loop
+            stt_pool = TranscriptionPool(config)
+            await stt_pool.start()
+            state["stt"] = stt_pool
+            state["tts"] = TTSService(config)
+            state["memory"] = MemoryService(config, client=http, storage=storage)
+            state["prompt"] = PromptService(config, storage=storage)
+            logger.info("All services initialized (including memory + prompt).")
+        except Exception as exc:
+            logger.error("Failed to initialize one or more services: %s", exc)
+        if "memory" in state and config.memory_settings.background_extraction:
+            extractor = FactExtractionWorker(
+                state["memory"], max_queue=config.memory_settings.extraction_queue_size
+            )
+            extractor.start()
+            state["extractor"] = extractor
+        storage_settings = config.storage_settings
+        if "db" in state and storage_settings.history_write_behind:
+            history_writer = HistoryWriter(
+                state["db"],
+                batch_size=storage_settings.history_batch_size,
+                flush_interval=storage_settings.history_flush_interval,
+                max_pending=storage_settings.history_max_pending,
+            )
+            history_writer.start()
+            state["history_writer"] = history_writer
+        if "archive" in state and storage_settings.history_retention_days > 0:
+            retention = RetentionWorker(
+                state["db"],
+                state["archive"],
+                retention_days=storage_settings.history_retention_days,
+                interval=storage_settings.archive_interval,
+            )
+            retention.start()
+            state["retention"] = retention
+        if config.conversation_settings.summarize_history:
+            state["summarizer"] = SessionSummarizer(config, client=http)
+        if config.cache_settings.response_cache_enabled:
+            state["response_cache"] = ResponseCache(config.cache_settings)
+        if config.cache_settings.semantic_cache_enabled:
+            state["semantic_cache"] = SemanticCache(config.cache_settings)
+        try:
+            yield
+        finally:
+            if "summarizer" in state:
+                await state.pop("summarizer").stop()
+            if "extractor" in state:
+                await state.pop("extractor").stop()
+            if "retention" in state:
+                await state.pop("retention").stop()
+            if "history_writer" in state:
+                await state.pop("history_writer").stop()
+            if "memory" in state:
+                state["memory"].save_index()
+            if "stt" in state:
+                await state.pop("stt").stop()
+            await http.aclose()
+            if "storage" in state:
+                state["storage"].engine.dispose()
+
     app = FastAPI(
         title="Convo-AI",
         version="0.3.0",
         description="Local-first voice AI with RAG memory",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -76,21 +210,6 @@ def create_app(config: Config | None = None) -> FastAPI:
         allow_headers=["*"],
     )
 
-    state: dict[str, Any] = {"config": config}
-
-    @app.on_event("startup")
-    async def _startup() -> None:
-        try:
-            state["db"] = Database(config)
-            state["ollama"] = OllamaService(config)
-            state["stt"] = STTService(config)
-            state["tts"] = TTSService(config)
-            state["memory"] = MemoryService(config)
-            state["prompt"] = PromptService(config)
-            logger.info("All services initialized (including memory + prompt).")
-        except Exception as exc:
-            logger.error("Failed to initialize one or more services: %s", exc)
-
     # ─── Basic endpoints ──────────────────────────────────────────────
 
     @app.get("/")
@@ -110,18 +229,66 @@ def create_app(config: Config | None = None) -> FastAPI:
                     "db": "db" in state,
                     "memory": "memory" in state,
                     "prompt": "prompt" in state,
+                    "extractor": "extractor" in state,
+                    "history_writer": "history_writer" in state,
+                    "summarizer": "summarizer" in state,
                 },
             }
         )
 
+    @app.get("/api/stats/history")
+    async def history_writer_stats() -> dict[str, Any]:
+        writer: HistoryWriter | None = state.get("history_writer")
+        stats: dict[str, Any] = {"enabled": writer is not None}
+        if writer is not None:
+            stats.update(writer.stats())
+        retention: RetentionWorker | None = state.get("retention")
+        archive: HistoryArchive | None = state.get("archive")
+        if retention is not None:
+            stats["archive"] = retention.stats()
+        elif archive is not None:
+            stats["archive"] = archive.stats()
+        return stats
+
+    @app.get("/api/stats/sessions")
+    async def session_stats() -> dict[str, Any]:
+        summarizer: SessionSummarizer | None = state.get("summarizer")
+        stats: dict[str, Any] = {"live": len(state["sessions"])}
+        if summarizer is not None:
+            stats["summarizer"] = summarizer.stats()
+        return stats
+
+    @app.get("/api/stats/stt")
+    async def stt_stats() -> dict[str, Any]:
+        pool: TranscriptionPool | None = state.get("stt")
+        return {"enabled": pool is not None, **(pool.stats() if pool is not None else {})}
+
+    @app.get("/api/stats/cache")
+    async def cache_stats() -> dict[str, Any]:
+        cache: ResponseCache | None = state.get("response_cache")
+        semantic: SemanticCache | None = state.get("semantic_cache")
+        return {
+            "enabled": cache is not None,
+            **(cache.stats() if cache is not None else {}),
+            "semantic": {
+                "enabled": semantic is not None,
+                **(semantic.stats() if semantic is not None else {}),
+            },
+        }
+
     # ─── Model management ─────────────────────────────────────────────
 
     @app.get("/api/models")
     async def list_models() -> JSONResponse:
         try:
-            resp = requests.get(
+            http = state.get("http")
+            if http is None:
+                return JSONResponse(
+                    {"models": [], "current": config.model, "error": "http client not ready"}
+                )
+            resp = await http.get(
                 config.ollama_api_url.replace("/api/generate", "/api/tags"),
-                timeout=10,
+                timeout=config.http_settings.models_timeout,
             )
             resp.raise_for_status()
             data = resp.json()
@@ -143,7 +310,7 @@ def create_app(config: Config | None = None) -> FastAPI:
         if "model" in payload:
             config.model = payload["model"]
             if "ollama" in state:
-                state["ollama"] = OllamaService(config)
+                state["ollama"] = OllamaService(config, client=state.get("http"))
         if "temperature" in payload:
             config.model_settings.temperature = float(payload["temperature"])
         if "voice_speaker" in payload:
@@ -179,14 +346,16 @@ def create_app(config: Config | None = None) -> FastAPI:
     # ─── Memory endpoints ─────────────────────────────────────────────
 
     @app.get("/api/memory")
-    async def get_memories() -> list[dict[str, Any]]:
+    async def get_memories(user_id: str = Depends(current_user)) -> list[dict[str, Any]]:
         mem: MemoryService | None = state.get("memory")
         if mem is None:
             return []
-        return mem.get_all_memories()
+        return mem.get_all_memories(user_id)
 
     @app.post("/api/memory")
-    async def add_memory(payload: dict[str, Any]) -> dict[str, Any]:
+    async def add_memory(
+        payload: dict[str, Any], user_id: str = Depends(current_user)
+    ) -> dict[str, Any]:
         mem: MemoryService | None = state.get("memory")
         if mem is None:
             return {"error": "memory service not initialized"}
@@ -195,34 +364,88 @@ def create_app(config: Config | None = None) -> FastAPI:
             return {"error": "empty content"}
         category = payload.get("category", "general")
         importance = int(payload.get("importance", 5))
-        entry = mem.add_memory(content, category=category, importance=importance)
-        return entry
+        entry = await mem.add_memory(
+            content, category=category, importance=importance, user_id=user_id
+        )
+        return mem._entry_to_dict(entry)
+
+    @app.post("/api/memory/bulk")
+    async def bulk_add_memories(
+        request: Request, user_id: str = Depends(current_user)
+    ) -> dict[str, Any]:
+        """Import memories from an NDJSON body, one ``{"content": ...}`` object per line."""
+        mem: MemoryService | None = state.get("memory")
+        if mem is None:
+            return {"error": "memory service not initialized"}
+
+        batch_size = max(1, config.memory_settings.bulk_import_batch_size)
+        batch: list[dict[str, Any]] = []
+        errors: list[dict[str, Any]] = []
+        imported = 0
+        line_no = 0
+        buffer = b""
+
+        async def flush() -> None:
+            nonlocal imported
+            if batch:
+                imported += len(await mem.add_memories(batch, user_id=user_id))
+                batch.clear()
+
+        def parse(raw: bytes) -> None:
+            nonlocal line_no
+            line_no += 1
+            if not raw.strip():
+                return
+            try:
+                # Bad lines are reported and skipped, never left to fail the batch they'd join
+                batch.append(validate_memory_item(json.loads(raw)))
+            except ValueError as exc:
+                errors.append({"line": line_no, "error": str(exc)})
+
+        # Parse the body as it streams in so large imports never sit in memory whole.
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                parse(raw)
+                if len(batch) >= batch_size:
+                    await flush()
+        parse(buffer)
+        await flush()
+        return {
+            "status": "ok",
+            "imported": imported,
+            "failed": len(errors),
+            "errors": errors[:MAX_REPORTED_ERRORS],
+        }
 
     @app.delete("/api/memory/{memory_id}")
-    async def delete_memory(memory_id: int) -> dict[str, str]:
+    async def delete_memory(memory_id: int, user_id: str = Depends(current_user)) -> dict[str, str]:
         mem: MemoryService | None = state.get("memory")
         if mem is None:
             return {"status": "no memory service"}
-        deleted = mem.delete_memory(memory_id)
+        deleted = mem.delete_memory(memory_id, user_id=user_id)
         return {"status": "deleted" if deleted else "not found"}
 
     @app.delete("/api/memory")
-    async def clear_memories() -> dict[str, Any]:
+    async def clear_memories(user_id: str = Depends(current_user)) -> dict[str, Any]:
         mem: MemoryService | None = state.get("memory")
         if mem is None:
             return {"status": "no memory service"}
-        count = mem.clear_all()
+        count = mem.clear_all(user_id)
         return {"status": "cleared", "count": count}
 
     @app.put("/api/memory/{memory_id}")
-    async def update_memory(memory_id: int, payload: dict[str, Any]) -> dict[str, Any]:
+    async def update_memory(
+        memory_id: int, payload: dict[str, Any], user_id: str = Depends(current_user)
+    ) -> dict[str, Any]:
         mem: MemoryService | None = state.get("memory")
         if mem is None:
             return {"error": "memory service not initialized"}
         content = (payload.get("content") or "").strip()
         if not content:
             return {"error": "empty content"}
-        result = mem.update_memory(memory_id, content)
+        result = await mem.update_memory(memory_id, content, user_id=user_id)
         if result is None:
             return {"error": "memory not found"}
         return result
@@ -230,71 +453,303 @@ def create_app(config: Config | None = None) -> FastAPI:
     # ─── System prompt endpoints ──────────────────────────────────────
 
     @app.get("/api/prompt")
-    async def get_prompt() -> dict[str, Any]:
+    async def get_prompt(user_id: str = Depends(current_user)) -> dict[str, Any]:
         prompt_svc: PromptService | None = state.get("prompt")
         if prompt_svc is None:
             return {"prompt": DEFAULT_SYSTEM_PROMPT, "default": DEFAULT_SYSTEM_PROMPT}
-        return {"prompt": prompt_svc.get_prompt(), "default": DEFAULT_SYSTEM_PROMPT}
+        return {
+            "prompt": prompt_svc.get_prompt(user_id),
+            "default": DEFAULT_SYSTEM_PROMPT,
+            "version": prompt_svc.version,
+        }
 
     @app.put("/api/prompt")
-    async def update_prompt(payload: dict[str, Any]) -> dict[str, Any]:
+    async def update_prompt(
+        payload: dict[str, Any], user_id: str = Depends(current_user)
+    ) -> dict[str, Any]:
         prompt_svc: PromptService | None = state.get("prompt")
         if prompt_svc is None:
             return {"error": "prompt service not initialized"}
         content = (payload.get("prompt") or "").strip()
         if not content:
             return {"error": "empty prompt"}
-        updated = prompt_svc.set_prompt(content)
-        return {"status": "ok", "prompt": updated}
+        updated = prompt_svc.set_prompt(content, user_id=user_id)
+        return {"status": "ok", "prompt": updated, "version": prompt_svc.version}
 
     @app.post("/api/prompt/reset")
-    async def reset_prompt() -> dict[str, Any]:
+    async def reset_prompt(user_id: str = Depends(current_user)) -> dict[str, Any]:
         prompt_svc: PromptService | None = state.get("prompt")
         if prompt_svc is None:
             return {"error": "prompt service not initialized"}
-        reset = prompt_svc.reset_prompt()
-        return {"status": "ok", "prompt": reset}
+        reset = prompt_svc.reset_prompt(user_id)
+        return {"status": "ok", "prompt": reset, "version": prompt_svc.version}
 
     # ─── History endpoints ────────────────────────────────────────────
 
+    async def _flush_history() -> None:
+        """Make queued write-behind rows visible before reading or clearing history."""
+        writer: HistoryWriter | None = state.get("history_writer")
+        if writer is not None:
+            await writer.flush()
+
     @app.get("/api/history")
-    async def get_history(limit: int = 50) -> list[dict[str, Any]]:
+    async def get_history(
+        limit: int = 50, before_id: int | None = None, user_id: str = Depends(current_user)
+    ) -> list[dict[str, Any]]:
+        db: Database | None = state.get("db")
+        if db is None:
+            return []
+        await _flush_history()
+        entries = [
+            entry.model_dump()
+            for entry in db.get_history(limit=limit, before_id=before_id, user_id=user_id)
+        ]
+        archive: HistoryArchive | None = state.get("archive")
+        if len(entries) < limit and archive is not None and len(archive):
+            # Paged past the hot window: continue from the archived segments
+            older_than = entries[-1]["id"] if entries else before_id
+            entries += await asyncio.to_thread(
+                archive.read_before, older_than, limit - len(entries), user_id
+            )
+        return entries
+
+    @app.get("/api/history/search")
+    async def search_history(
+        q: str,
+        limit: int = 20,
+        before_id: int | None = None,
+        user_id: str = Depends(current_user),
+    ) -> list[dict[str, Any]]:
         db: Database | None = state.get("db")
         if db is None:
             return []
-        entries = db.get_history(limit=limit)
-        return [entry.model_dump() for entry in entries]
+        await _flush_history()
+        return db.search(q, limit=limit, before_id=before_id, user_id=user_id)
 
     @app.delete("/api/history")
-    async def clear_history() -> dict[str, str]:
+    async def clear_history(
+        before_id: int | None = None, user_id: str = Depends(current_user)
+    ) -> dict[str, Any]:
         db: Database | None = state.get("db")
         if db is None:
             return {"status": "no database"}
-        db.clear_history()
-        return {"status": "cleared"}
+        await _flush_history()
+        deleted = db.delete_history(before_id=before_id, user_id=user_id)
+        archive: HistoryArchive | None = state.get("archive")
+        if archive is not None:
+            deleted += await asyncio.to_thread(archive.delete_before, before_id, user_id)
+        return {"status": "cleared", "deleted": deleted}
 
     @app.post("/api/reset")
-    async def reset_all() -> dict[str, Any]:
-        """Wipe everything: history, memories, and reset personality to default."""
+    async def reset_all(user_id: str = Depends(current_user)) -> dict[str, Any]:
+        """Wipe the user's history and memories, and reset their personality to default."""
         results: dict[str, Any] = {}
         db: Database | None = state.get("db")
         if db is not None:
-            db.clear_history()
+            await _flush_history()
+            db.clear_history(user_id)
+            if "archive" in state:
+                await asyncio.to_thread(state["archive"].delete_before, None, user_id)
             results["history"] = "cleared"
         mem: MemoryService | None = state.get("memory")
         if mem is not None:
-            count = mem.clear_all()
+            count = mem.clear_all(user_id)
             results["memories"] = f"cleared ({count})"
         prompt_svc: PromptService | None = state.get("prompt")
         if prompt_svc is not None:
-            prompt_svc.reset_prompt()
+            prompt_svc.reset_prompt(user_id)
             results["personality"] = "reset"
         return {"status": "ok", **results}
 
+    # ─── Chat pipeline ────────────────────────────────────────────────
+
+    async def _prepare_turn(
+        ollama: OllamaService,
+        prompt: str,
+        user_id: str = DEFAULT_USER,
+        session: ChatSession | None = None,
+    ) -> PreparedTurn:
+        """Retrieve the user's relevant memories (RAG) and build the LLM request.
+
+        With the chat API enabled this is a message list whose system prompt and
+        earlier session turns form a stable prefix Ollama can serve from its KV
+        cache; otherwise it is a single flattened prompt for /api/generate.
+        Memories and history are trimmed to fit ``num_ctx``; the returned usage
+        dict reports the estimated tokens per prompt section.
+        """
+        memory_svc: MemoryService | None = state.get("memory")
+        prompt_svc: PromptService | None = state.get("prompt")
+        memories: list[dict[str, Any]] = []
+        if memory_svc is not None:
+            retrieval = await memory_svc.retrieve(
+                prompt, k=config.memory_settings.retrieval_k, user_id=user_id
+            )
+            memories = retrieval.memories
+
+        # The session's recent turns plus the summary of everything older
+        history = [(t.user_text, t.assistant_text) for t in session.history] if session else []
+        summary = session.summary if session is not None else ""
+        compiled = prompt_svc.compiled(user_id) if prompt_svc is not None else None
+        system = compiled.system if compiled is not None else ""
+        assembled = PromptAssembler(config).assemble(system, prompt, memories, history, summary)
+
+        # Build the full prompt with system prompt + memory + user input
+        if prompt_svc is not None and config.model_settings.use_chat_api:
+            request: str | list[Message] = prompt_svc.build_messages(
+                prompt, assembled.memory_context, assembled.history, user_id, summary
+            )
+        elif prompt_svc is not None:
+            request = prompt_svc.build_prompt(
+                prompt, assembled.memory_context, user_id, assembled.history, summary
+            )
+        else:
+            request = ollama.build_prompt(prompt)
+
+        turn = PreparedTurn(request, assembled.memories, assembled.usage, text=prompt)
+        if "response_cache" in state:
+            turn.cache_key = ResponseCache.key(
+                user_id=user_id,
+                model=config.model,
+                options=ollama._options(),
+                prompt_version=compiled.version if compiled is not None else -1,
+                memory_context=assembled.memory_context,
+                user_input=prompt,
+                history=assembled.history,
+                summary=summary,
+            )
+        if "semantic_cache" in state and memory_svc is not None:
+            # Retrieval just embedded the same text, so this is an embedding-cache hit.
+            turn.embedding = await memory_svc._embed(prompt) or None
+            turn.scope = scope_key(
+                user_id=user_id,
+                model=config.model,
+                options=ollama._options(),
+                prompt_version=compiled.version if compiled is not None else -1,
+                memory_context=assembled.memory_context,
+                history=assembled.history,
+                summary=summary,
+            )
+        return turn
+
+    def _cached_reply(turn: PreparedTurn, bypass_cache: bool) -> str | None:
+        """An exact-match reply, else the reply of a close paraphrase, else None."""
+        cache: ResponseCache | None = state.get("response_cache")
+        semantic: SemanticCache | None = state.get("semantic_cache")
+        if bypass_cache:
+            # Skip the lookup; the fresh reply still replaces the cached one.
+            if cache is not None:
+                cache.bypassed += 1
+            return None
+        if cache is not None and turn.cache_key is not None:
+            reply = cache.get(turn.cache_key)
+            if reply is not None:
+                turn.cached = True
+                return reply
+        if semantic is not None and turn.embedding is not None and turn.scope is not None:
+            match = semantic.lookup(turn.scope, turn.embedding)
+            if match is not None:
+                turn.semantic, turn.similarity = match
+                turn.cached = True
+                return turn.semantic.reply
+        return None
+
+    def _store_reply(turn: PreparedTurn, raw: str) -> None:
+        if not raw or raw == FALLBACK_RESPONSE:
+            return
+        cache: ResponseCache | None = state.get("response_cache")
+        if cache is not None and turn.cache_key is not None:
+            cache.put(turn.cache_key, raw)
+        semantic: SemanticCache | None = state.get("semantic_cache")
+        if semantic is not None and turn.embedding is not None and turn.scope is not None:
+            turn.semantic = semantic.store(turn.scope, turn.embedding, turn.text, raw)
+
+    async def _reply(ollama: OllamaService, turn: PreparedTurn, bypass_cache: bool) -> str:
+        """The raw LLM reply for ``turn``, from the response cache when possible."""
+        cached = _cached_reply(turn, bypass_cache)
+        if cached is not None:
+            return cached
+        raw = await ollama.complete(turn.request)
+        _store_reply(turn, raw)
+        return raw
+
+    async def _reply_stream(
+        ollama: OllamaService, turn: PreparedTurn, bypass_cache: bool
+    ) -> AsyncIterator[str]:
+        """Like ``_reply`` but yields deltas; a cached reply arrives as one delta."""
+        cached = _cached_reply(turn, bypass_cache)
+        if cached is not None:
+            yield cached
+            return
+        parts: list[str] = []
+        async for delta in ollama.complete_stream(turn.request):
+            parts.append(delta)
+            yield delta
+        _store_reply(turn, "".join(parts).strip())
+
+    def _remember_turn(session: ChatSession, prompt: str, response_text: str) -> None:
+        """Add the exchange to the session buffer and summarise whatever it pushed out."""
+        session.add_turn(prompt, response_text)
+        summarizer: SessionSummarizer | None = state.get("summarizer")
+        if summarizer is not None:
+            summarizer.schedule(session)
+
+    async def _finish_turn(
+        prompt: str,
+        response_text: str,
+        on_facts: FactsCallback | None = None,
+        user_id: str = DEFAULT_USER,
+    ) -> tuple[str, list[dict[str, Any]], bool]:
+        """Extract new facts and persist the exchange.
+
+        Returns (mood, new facts, facts pending). With the background worker
+        running, extraction is queued and ``on_facts`` is awaited with the
+        stored facts once it finishes; the turn itself does not wait.
+        """
+        mood = analyze_mood(prompt)
+        memory_svc: MemoryService | None = state.get("memory")
+        extractor: FactExtractionWorker | None = state.get("extractor")
+        db: Database | None = state.get("db")
+
+        new_facts: list[dict[str, Any]] = []
+        pending = False
+        if extractor is not None:
+            pending = extractor.submit(
+                ExtractionJob(prompt, response_text, on_done=on_facts, user_id=user_id)
+            )
+        elif memory_svc is not None and db is not None:
+            facts = await memory_svc.extract_facts(prompt, response_text)
+            # New facts and the exchange commit together in one transaction
+            with db.storage.unit_of_work() as uow:
+                entries = await memory_svc.add_memories(
+                    ({"content": content, "category": category} for category, content in facts),
+                    uow=uow,
+                    user_id=user_id,
+                )
+                db.add_entry(prompt, response_text, mood, uow=uow, user_id=user_id)
+            new_facts = [memory_svc._entry_to_dict(entry) for entry in entries]
+            return mood, new_facts, pending
+        elif memory_svc is not None:
+            facts = await memory_svc.extract_facts(prompt, response_text)
+            entries = await memory_svc.add_memories(
+                ({"content": content, "category": category} for category, content in facts),
+                user_id=user_id,
+            )
+            new_facts = [memory_svc._entry_to_dict(entry) for entry in entries]
+
+        # Persist conversation; the write-behind queue keeps the commit off the reply path
+        history_writer: HistoryWriter | None = state.get("history_writer")
+        if history_writer is not None:
+            await history_writer.submit(prompt, response_text, mood, user_id=user_id)
+        elif db is not None:
+            db.add_entry(prompt, response_text, mood, user_id=user_id)
+        return mood, new_facts, pending
+
     # ─── Chat (REST) ──────────────────────────────────────────────────
 
-    @app.post("/api/chat")
-    async def chat(payload: dict[str, Any]) -> dict[str, Any]:
+    @app.post("/api/chat", response_model=None)
+    async def chat(
+        payload: dict[str, Any], user_id: str = Depends(current_user)
+    ) -> dict[str, Any] | StreamingResponse:
         prompt = (payload.get("text") or "").strip()
         if not prompt:
             return {"error": "empty prompt"}
@@ -303,152 +758,368 @@ def create_app(config: Config | None = None) -> FastAPI:
         if ollama is None:
             return {"error": "ollama service not initialized"}
 
-        # Retrieve relevant memories (RAG)
-        memory_svc: MemoryService | None = state.get("memory")
-        prompt_svc: PromptService | None = state.get("prompt")
-        memories_used: list[dict[str, Any]] = []
-        memory_context = ""
-        if memory_svc is not None:
-            memories_used = memory_svc.search_relevant(prompt, k=5)
-            memory_context = memory_svc.build_context_block(prompt, k=5)
+        # Passing a session_id lets REST clients reuse the cached conversation prefix too
+        session: ChatSession | None = None
+        if payload.get("session_id"):
+            session = state["sessions"].get_or_create(str(payload["session_id"]), user_id=user_id)
+        turn = await _prepare_turn(ollama, prompt, user_id, session)
+        bypass_cache = bool(payload.get("no_cache"))
 
-        # Build the full prompt with system prompt + memory + user input
-        if prompt_svc is not None:
-            full_prompt = prompt_svc.build_prompt(prompt, memory_context)
-        else:
-            full_prompt = ollama.build_prompt(prompt)
+        if payload.get("stream"):
 
-        raw = ollama.generate(full_prompt)
-        response_text = naturalize_response(raw)
-        mood = analyze_mood(prompt)
+            async def _ndjson() -> AsyncIterator[str]:
+                parts: list[str] = []
+                try:
+                    async for delta in _reply_stream(ollama, turn, bypass_cache):
+                        parts.append(delta)
+                        yield json.dumps({"delta": delta}) + "\n"
+                except Exception as exc:
+                    logger.error("Streaming chat failed: %s", exc)
+                    yield json.dumps({"error": str(exc)}) + "\n"
+                    return
+                response_text = naturalize_response("".join(parts).strip() or FALLBACK_RESPONSE)
+                mood, new_facts, pending = await _finish_turn(
+                    prompt, response_text, user_id=user_id
+                )
+                summary: dict[str, Any] = {
+                    "done": True,
+                    "text": prompt,
+                    "response": response_text,
+                    "mood": mood,
+                    "model": config.model,
+                    "memories_used": len(turn.memories),
+                    "prompt_tokens": turn.usage,
+                    "cached": turn.cached,
+                    "cache_similarity": turn.similarity,
+                    "new_facts": len(new_facts),
+                    "facts_pending": pending,
+                }
+                if session is not None:
+                    _remember_turn(session, prompt, response_text)
+                    summary["session_id"] = session.id
+                yield json.dumps(summary) + "\n"
 
-        # Extract and store new facts
-        new_facts: list[dict[str, Any]] = []
-        if memory_svc is not None:
-            facts = memory_svc.extract_facts(prompt, response_text)
-            for category, content in facts:
-                entry = memory_svc.add_memory(content, category=category)
-                new_facts.append(memory_svc._entry_to_dict(entry))
+            return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
 
-        # Persist conversation
-        db: Database | None = state.get("db")
-        if db is not None:
-            db.add_entry(user_text=prompt, assistant_text=response_text, mood=mood)
+        raw = await _reply(ollama, turn, bypass_cache)
+        response_text = naturalize_response(raw)
+        mood, new_facts, pending = await _finish_turn(prompt, response_text, user_id=user_id)
 
-        return {
+        result: dict[str, Any] = {
             "text": prompt,
             "response": response_text,
             "mood": mood,
             "model": config.model,
-            "memories_used": len(memories_used),
+            "memories_used": len(turn.memories),
+            "prompt_tokens": turn.usage,
+            "cached": turn.cached,
+            "cache_similarity": turn.similarity,
             "new_facts": len(new_facts),
+            "facts_pending": pending,
         }
+        if session is not None:
+            _remember_turn(session, prompt, response_text)
+            result["session_id"] = session.id
+        return result
 
     # ─── Chat (WebSocket) ─────────────────────────────────────────────
 
-    @app.websocket("/ws")
-    async def websocket_endpoint(websocket: WebSocket) -> None:
-        await websocket.accept()
-        try:
-            data = await websocket.receive()
+    async def _ws_turn(
+        websocket: WebSocket,
+        session: ChatSession,
+        prompt: str,
+        stream: bool,
+        request_id: Any = None,
+        bypass_cache: bool = False,
+    ) -> None:
+        """Run one chat turn for a WebSocket session and send the result frame(s)."""
+
+        def tagged(frame: dict[str, Any]) -> dict[str, Any]:
+            if request_id is not None:
+                frame["id"] = request_id
+            return frame
 
-            # Handle disconnect messages gracefully
-            msg_type = data.get("type", "")
-            if msg_type == "websocket.disconnect":
-                logger.info("WebSocket client disconnected (close code: %s)", data.get("code"))
-                return
+        if not prompt:
+            await _safe_send(websocket, tagged({"error": "empty prompt"}))
+            return
 
-            prompt = ""
+        ollama: OllamaService | None = state.get("ollama")
+        if ollama is None:
+            await _safe_send(websocket, tagged({"error": "ollama not initialized"}))
+            return
 
-            if "bytes" in data:
-                audio_data = data["bytes"]
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:  # noqa: SIM115
-                    f.write(audio_data)
-                    temp_path = f.name
-                stt: STTService | None = state.get("stt")
-                if stt is None:
-                    await _safe_send(websocket, {"error": "stt not initialized"})
-                    return
-                prompt = stt.transcribe(temp_path)
-                Path(temp_path).unlink(missing_ok=True)
-            elif "text" in data:
-                try:
-                    text_data = json.loads(data["text"])
-                    prompt = text_data.get("text", "")
-                except json.JSONDecodeError:
-                    await _safe_send(websocket, {"error": "invalid json"})
-                    return
-            else:
-                # Could be a disconnect or unknown message type — just bail
-                logger.warning("WebSocket received unknown message type: %s", msg_type)
-                return
+        turn = await _prepare_turn(ollama, prompt, session.user_id, session)
 
-            if not prompt:
-                await _safe_send(websocket, {"error": "empty prompt"})
-                return
+        if stream:
+            parts: list[str] = []
+            async for delta in _reply_stream(ollama, turn, bypass_cache):
+                parts.append(delta)
+                await _safe_send(websocket, tagged({"delta": delta}))
+            raw = "".join(parts).strip() or FALLBACK_RESPONSE
+        else:
+            raw = await _reply(ollama, turn, bypass_cache)
+        response_text = naturalize_response(raw)
 
-            ollama: OllamaService | None = state.get("ollama")
-            if ollama is None:
-                await _safe_send(websocket, {"error": "ollama not initialized"})
-                return
+        async def report_facts(facts: list[dict[str, Any]]) -> None:
+            # Pushed later on the same socket, once background extraction finishes.
+            await _safe_send(
+                websocket,
+                tagged(
+                    {
+                        "type": "facts",
+                        "new_facts": len(facts),
+                        "new_fact_details": facts,
+                        "session_id": session.id,
+                    }
+                ),
+            )
 
-            # RAG: retrieve relevant memories
-            memory_svc: MemoryService | None = state.get("memory")
-            prompt_svc: PromptService | None = state.get("prompt")
-            memories_used: list[dict[str, Any]] = []
-            memory_context = ""
-            if memory_svc is not None:
-                memories_used = memory_svc.search_relevant(prompt, k=5)
-                memory_context = memory_svc.build_context_block(prompt, k=5)
-
-            # Build full prompt
-            if prompt_svc is not None:
-                full_prompt = prompt_svc.build_prompt(prompt, memory_context)
+        mood, new_facts, pending = await _finish_turn(
+            prompt, response_text, report_facts, user_id=session.user_id
+        )
+        _remember_turn(session, prompt, response_text)
+
+        # TTS; a semantic cache hit carries the audio synthesized for the original turn
+        tts: TTSService | None = state.get("tts")
+        audio_b64 = ""
+        if tts is not None and session.preferences.get("audio", True):
+            voice = f"{config.voice_model}|{config.voice_speaker}|{config.voice_speed}"
+            cached_turn = turn.semantic
+            if cached_turn is not None and cached_turn.audio_b64 and cached_turn.voice == voice:
+                audio_b64 = cached_turn.audio_b64
+                state["semantic_cache"].audio_hits += 1
             else:
-                full_prompt = ollama.build_prompt(prompt)
-
-            raw = ollama.generate(full_prompt)
-            response_text = naturalize_response(raw)
-            mood = analyze_mood(prompt)
-
-            # Extract and store new facts
-            new_facts: list[dict[str, Any]] = []
-            if memory_svc is not None:
-                facts = memory_svc.extract_facts(prompt, response_text)
-                for category, content in facts:
-                    entry = memory_svc.add_memory(content, category=category)
-                    new_facts.append(memory_svc._entry_to_dict(entry))
-
-            # TTS
-            tts: TTSService | None = state.get("tts")
-            audio_b64 = ""
-            if tts is not None:
                 wav_bytes = tts.synthesize(response_text)
                 audio_b64 = base64.b64encode(wav_bytes).decode("utf-8")
+                if cached_turn is not None:
+                    cached_turn.audio_b64, cached_turn.voice = audio_b64, voice
+
+        result: dict[str, Any] = {
+            "text": prompt,
+            "response": response_text,
+            "audio": audio_b64,
+            "mood": mood,
+            "model": config.model,
+            "memories_used": len(turn.memories),
+            "prompt_tokens": turn.usage,
+            "cached": turn.cached,
+            "cache_similarity": turn.similarity,
+            "new_facts": len(new_facts),
+            "new_fact_details": new_facts,
+            "facts_pending": pending,
+            "session_id": session.id,
+        }
+        if stream:
+            result["done"] = True
+        await _safe_send(websocket, tagged(result))
+
+    # Live audio streams, by session id: binary frames feed these between
+    # "audio_start" and "audio_end" instead of being read as whole WAV uploads.
+    audio_streams: dict[str, StreamingTranscriber] = {}
+
+    async def _ws_audio_control(
+        websocket: WebSocket, session: ChatSession, kind: str, message: dict[str, Any]
+    ) -> None:
+        """Handle the audio_start / audio_end / audio_cancel messages of a live stream."""
+        request_id = message.get("id")
+        previous = audio_streams.pop(session.id, None)
+        if kind == "audio_start":
+            if previous is not None:
+                await previous.cancel()
+            stt: TranscriptionPool | None = state.get("stt")
+            if stt is None:
+                await _safe_send(websocket, {"error": "stt not initialized", "id": request_id})
+                return
 
-            # Persist conversation
-            db: Database | None = state.get("db")
-            if db is not None:
-                db.add_entry(user_text=prompt, assistant_text=response_text, mood=mood)
+            async def send_transcript(event: dict[str, Any]) -> None:
+                await _safe_send(websocket, {**event, "id": request_id})
 
+            sample_rate = int(message.get("sample_rate") or config.stt_settings.sample_rate)
+            if sample_rate <= 0:
+                await _safe_send(
+                    websocket, {"error": "sample_rate must be positive", "id": request_id}
+                )
+                return
+            profile = stt.profile(message.get("profile") or session.preferences["stt_profile"])
+            audio_streams[session.id] = StreamingTranscriber(
+                stt,
+                config.stt_settings,
+                sample_rate=sample_rate,
+                on_event=send_transcript,
+                profile=profile,
+            )
+            await _safe_send(
+                websocket,
+                {
+                    "type": "audio_started",
+                    "id": request_id,
+                    "sample_rate": sample_rate,
+                    "profile": profile,
+                },
+            )
+        elif previous is None:
+            await _safe_send(websocket, {"error": "no audio stream", "id": request_id})
+        elif kind == "audio_cancel":
+            await previous.cancel()
+        else:
+            started = time.perf_counter()
+            prompt = await previous.finish()
             await _safe_send(
                 websocket,
                 {
+                    "type": "transcript",
+                    "final": True,
                     "text": prompt,
-                    "response": response_text,
-                    "audio": audio_b64,
-                    "mood": mood,
-                    "model": config.model,
-                    "memories_used": len(memories_used),
-                    "new_facts": len(new_facts),
-                    "new_fact_details": new_facts,
+                    "profile": previous.profile,
+                    # What the user waits for after they stop talking
+                    "stt_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "id": request_id,
+                },
+            )
+            stream = parse_bool(message.get("stream", session.preferences["stream"]))
+            await _ws_turn(
+                websocket,
+                session,
+                prompt,
+                stream,
+                request_id,
+                parse_bool(message.get("no_cache") or False),
+            )
+
+    async def _ws_message(websocket: WebSocket, session: ChatSession, data: dict[str, Any]) -> None:
+        """Dispatch one inbound WebSocket frame within a session."""
+        live = audio_streams.get(session.id)
+        if data.get("bytes") is not None and live is not None:
+            live.feed(data["bytes"])
+            return
+        if data.get("bytes") is not None:
+            audio_data = data["bytes"]
+            stt: TranscriptionPool | None = state.get("stt")
+            if stt is None:
+                await _safe_send(websocket, {"error": "stt not initialized"})
+                return
+            profile = stt.profile(session.preferences["stt_profile"])
+            started = time.perf_counter()
+            # Decoded in memory; no temp file round-trip
+            prompt = await stt.transcribe_bytes(
+                audio_data,
+                audio_format=session.preferences["audio_format"],
+                sample_rate=session.preferences["sample_rate"],
+                profile=profile,
+            )
+            await _safe_send(
+                websocket,
+                {
+                    "type": "transcript",
+                    "final": True,
+                    "text": prompt,
+                    "profile": profile,
+                    "stt_ms": round((time.perf_counter() - started) * 1000, 2),
                 },
             )
+            await _ws_turn(websocket, session, prompt, session.preferences["stream"])
+            return
+
+        if data.get("text") is None:
+            logger.warning("WebSocket received unknown message type: %s", data.get("type"))
+            return
+
+        try:
+            message = json.loads(data["text"])
+        except json.JSONDecodeError:
+            await _safe_send(websocket, {"error": "invalid json"})
+            return
+        if not isinstance(message, dict):
+            await _safe_send(websocket, {"error": "invalid json"})
+            return
+
+        request_id = message.get("id")
+        kind = message.get("type", "chat")
+        if kind == "ping":
+            await _safe_send(websocket, {"type": "pong", "id": request_id})
+        elif kind == "hello":
+            await _safe_send(
+                websocket,
+                {
+                    "type": "session",
+                    "id": request_id,
+                    "session_id": session.id,
+                    "user_id": session.user_id,
+                    "preferences": session.preferences,
+                    "turns": len(session.history),
+                },
+            )
+        elif kind == "preferences":
+            try:
+                prefs = session.update_preferences(message.get("preferences") or {})
+            except ValueError as exc:
+                await _safe_send(websocket, {"error": str(exc), "id": request_id})
+                return
+            await _safe_send(
+                websocket, {"type": "preferences", "id": request_id, "preferences": prefs}
+            )
+        elif kind in ("audio_start", "audio_end", "audio_cancel"):
+            await _ws_audio_control(websocket, session, kind, message)
+        elif kind == "chat":
+            prompt = (message.get("text") or "").strip()
+            stream = parse_bool(message.get("stream", session.preferences["stream"]))
+            await _ws_turn(
+                websocket,
+                session,
+                prompt,
+                stream,
+                request_id,
+                parse_bool(message.get("no_cache") or False),
+            )
+        else:
+            await _safe_send(
+                websocket, {"error": f"unknown message type: {kind}", "id": request_id}
+            )
+
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket: WebSocket) -> None:
+        await websocket.accept()
+        sessions: SessionStore = state["sessions"]
+        session = sessions.get_or_create(
+            websocket.query_params.get("session_id"), user_id=current_user(websocket)
+        )
+        # Token streaming can be enabled for the whole connection (?stream=1, handy for
+        # raw audio uploads), via a "preferences" message, or per chat message.
+        if websocket.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+            session.preferences["stream"] = True
+        # Headerless uploads can negotiate their format up front: ?audio_format=pcm16&sample_rate=
+        # and any upload can pick a Whisper decode profile: ?stt_profile=fast
+        try:
+            session.update_preferences(
+                {
+                    key: websocket.query_params[key]
+                    for key in ("audio_format", "sample_rate", "stt_profile")
+                    if key in websocket.query_params
+                }
+            )
+        except ValueError as exc:
+            await _safe_send(websocket, {"error": str(exc)})
+        try:
+            while True:
+                data = await websocket.receive()
+                if data.get("type") == "websocket.disconnect":
+                    logger.info("WebSocket client disconnected (close code: %s)", data.get("code"))
+                    break
+                session.touch()
+                try:
+                    await _ws_message(websocket, session, data)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as exc:
+                    # A failed turn should not tear down the whole session.
+                    logger.error("WebSocket error: %s", exc)
+                    await _safe_send(websocket, {"error": str(exc)})
         except WebSocketDisconnect:
             logger.info("WebSocket client disconnected")
-        except Exception as exc:
-            logger.error("WebSocket error: %s", exc)
-            await _safe_send(websocket, {"error": str(exc)})
+        finally:
+            live = audio_streams.pop(session.id, None)
+            if live is not None:
+                await live.cancel()
 
     # Serve built frontend if it exists
     frontend_dist = Path(__file__).resolve().parent.parent.parent.parent / "frontend" / "dist"
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import base64
+import contextlib
 import json
 import logging
 import os
@@ -11,6 +12,7 @@ import shutil
 import tempfile
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 
 import websockets
 
@@ -29,6 +31,9 @@ class ConvoClient:
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.session_log: list[dict[str, str]] = []
         self.mood_state: dict[str, int] = {"positive": 0, "neutral": 0, "negative": 0}
+        # One WebSocket session is reused for every utterance (see _connection).
+        self._ws: Any = None
+        self._request_seq = 0
 
     # ------------------------------------------------------------------
     # Audio recording (cross-platform via sounddevice)
@@ -130,25 +135,46 @@ class ConvoClient:
     # WebSocket communication
     # ------------------------------------------------------------------
 
+    async def _connection(self) -> Any:
+        """Return the open session socket, connecting on first use."""
+        if self._ws is None:
+            self._ws = await websockets.connect(self.ws_url, ping_timeout=30, max_size=8388608)
+        return self._ws
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            ws, self._ws = self._ws, None
+            with contextlib.suppress(Exception):
+                await ws.close()
+
     async def send_and_receive(
         self,
         audio_bytes: bytes | None = None,
         text: str | None = None,
     ) -> dict | None:
+        if audio_bytes is None and text is None:
+            return None
         try:
-            async with websockets.connect(self.ws_url, ping_timeout=30, max_size=8388608) as ws:
-                if audio_bytes is not None:
-                    await ws.send(audio_bytes)
-                elif text is not None:
-                    await ws.send(json.dumps({"text": text}))
-                else:
-                    return None
-
-                print(random.choice(JARVIS_SETTINGS["thinking"]))
-                response = await ws.recv()
-                data = json.loads(response)
+            ws = await self._connection()
+            self._request_seq += 1
+            request_id = f"cli-{self._request_seq}"
+            if audio_bytes is not None:
+                await ws.send(audio_bytes)
+            else:
+                await ws.send(json.dumps({"id": request_id, "text": text}))
+
+            print(random.choice(JARVIS_SETTINGS["thinking"]))
+            while True:
+                data = json.loads(await ws.recv())
+                # Skip control frames and stream deltas; wait for the turn result.
+                if "type" in data or "delta" in data:
+                    continue
+                if data.get("id") not in (None, request_id):
+                    continue
                 return data
         except Exception as exc:
+            # Drop the socket so the next call reconnects with a fresh session.
+            await self.close()
             print(f"❌ Communication error: {exc}")
             return None
 
@@ -226,6 +252,8 @@ class ConvoClient:
         except KeyboardInterrupt:
             self.save_session()
             print("\n" + random.choice(JARVIS_SETTINGS["farewells"]))
+        finally:
+            await self.close()
 
     def _handle_response(self, data: dict | None) -> None:
         if data is None:
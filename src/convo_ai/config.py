@@ -20,6 +20,9 @@ class ModelSettings:
     presence_penalty: float = 0.1
     frequency_penalty: float = 0.1
     num_ctx: int = 2048
+    # Send role-tagged messages to /api/chat so turns share a cacheable prefix
+    use_chat_api: bool = True
+    keep_alive: str = "30m"  # how long Ollama keeps the model (and its KV cache) loaded
 
 
 @dataclass
@@ -32,6 +35,14 @@ class ConversationSettings:
     humor_level: str = "subtle"
     accent: str = "british"
     persist_history: bool = True
+    session_idle_timeout: float = 1800.0
+    # Prompt budget: num_ctx minus num_predict minus this margin (estimates are approximate)
+    prompt_token_margin: int = 64
+    # Fraction of the budget left after system prompt + input that memories may use
+    memory_token_share: float = 0.4
+    # Fold turns that fall out of the max_history window into a running summary
+    summarize_history: bool = True
+    summary_max_words: int = 120
 
 
 @dataclass
@@ -44,6 +55,136 @@ class TTSSettings:
     noise_scale_w: float = 0.8
 
 
+@dataclass
+class MemorySettings:
+    """Long-term memory retrieval settings."""
+
+    embed_model: str = "nomic-embed-text"
+    retrieval_k: int = 5
+    embedding_cache_size: int = 256
+    embed_batch_size: int = 64
+    bulk_import_batch_size: int = 512
+    # Extract facts off the request path in a background worker queue.
+    background_extraction: bool = True
+    extraction_queue_size: int = 100
+    # Approximate (IVF) search; below ann_threshold memories retrieval stays exact.
+    ann_enabled: bool = True
+    ann_threshold: int = 20000
+    ann_nlist: int = 0  # 0 = sqrt(number of memories)
+    ann_nprobe: int = 8
+    ann_train_sample: int = 20000
+    ann_iterations: int = 10
+
+
+@dataclass
+class HTTPSettings:
+    """Connection pool and timeout settings for the shared Ollama HTTP client."""
+
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    generate_timeout: float = 120.0
+    embed_timeout: float = 30.0
+    extract_timeout: float = 30.0
+    models_timeout: float = 10.0
+
+
+@dataclass
+class StorageSettings:
+    """SQLite connection pool and pragma settings."""
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size: int = -65536  # negative = KiB, i.e. 64 MiB page cache per connection
+    mmap_size: int = 268435456  # 256 MiB
+    temp_store: str = "MEMORY"
+    pool_size: int = 5
+    max_overflow: int = 10
+    # Write-behind history persistence
+    history_write_behind: bool = True
+    history_batch_size: int = 32
+    history_flush_interval: float = 0.5
+    history_max_pending: int = 1000
+    # Archival of old history into compressed JSONL segments (0 days = keep everything hot)
+    history_retention_days: float = 0.0
+    archive_dir: str = ""  # default: <database name>_archive next to the database
+    archive_segment_max_bytes: int = 8 * 1024 * 1024
+    archive_interval: float = 3600.0
+
+
+def _default_stt_profiles() -> dict[str, dict[str, Any]]:
+    return {
+        # Greedy search, English pinned, silence trimmed: lowest latency
+        "fast": {
+            "vad_filter": True,
+            "beam_size": 1,
+            "language": "en",
+            "without_timestamps": True,
+            "condition_on_previous_text": False,
+        },
+        "balanced": {
+            "vad_filter": True,
+            "beam_size": 3,
+            "language": None,
+            "without_timestamps": True,
+            "condition_on_previous_text": False,
+        },
+        # faster-whisper's own defaults
+        "accurate": {
+            "vad_filter": False,
+            "beam_size": 5,
+            "language": None,
+            "without_timestamps": False,
+            "condition_on_previous_text": True,
+        },
+    }
+
+
+@dataclass
+class STTSettings:
+    """Speech-to-text settings, including live (streamed) audio."""
+
+    sample_rate: int = 16000
+    # Energy VAD on streamed PCM: RMS threshold (full scale = 1.0) per frame
+    vad_frame_ms: int = 30
+    vad_energy_threshold: float = 0.015
+    # Silence that closes a speech segment, and audio kept from before speech starts
+    segment_silence_ms: int = 500
+    pre_roll_ms: int = 200
+    max_segment_s: float = 20.0
+    # Re-transcribe the open segment for a partial transcript this often
+    partial_interval_ms: int = 1000
+    # Worker pool: "thread" or "process" workers, each with its own model replica
+    workers: int = 1
+    worker_mode: str = "thread"
+    cpu_threads: int = 0  # per replica; 0 = faster-whisper's default
+    queue_size: int = 16  # jobs allowed to wait for a free worker
+    # Micro-batching: decode clips arriving within max_wait_ms of each other together
+    batch_enabled: bool = False
+    batch_max_size: int = 8
+    batch_max_wait_ms: int = 20
+    # Named Whisper decode profiles; requests pick one by name, else default_profile
+    default_profile: str = "balanced"
+    profiles: dict[str, dict[str, Any]] = field(default_factory=_default_stt_profiles)
+
+
+@dataclass
+class CacheSettings:
+    """Response caching for repeated questions."""
+
+    # Exact-match cache of LLM replies (off by default: time-sensitive answers go stale)
+    response_cache_enabled: bool = False
+    response_cache_size: int = 512
+    response_cache_ttl: float = 300.0  # seconds; 0 = no expiry
+    # Reuse the reply (and TTS audio) of an earlier turn whose query is a close paraphrase
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.92  # cosine similarity of the query embeddings
+    semantic_cache_size: int = 1000
+    semantic_cache_ttl: float = 3600.0
+
+
 @dataclass
 class Config:
     """Top-level application configuration."""
@@ -67,6 +208,11 @@ class Config:
     model_settings: ModelSettings = field(default_factory=ModelSettings)
     conversation_settings: ConversationSettings = field(default_factory=ConversationSettings)
     tts_settings: TTSSettings = field(default_factory=TTSSettings)
+    http_settings: HTTPSettings = field(default_factory=HTTPSettings)
+    memory_settings: MemorySettings = field(default_factory=MemorySettings)
+    storage_settings: StorageSettings = field(default_factory=StorageSettings)
+    cache_settings: CacheSettings = field(default_factory=CacheSettings)
+    stt_settings: STTSettings = field(default_factory=STTSettings)
 
     @classmethod
     def from_file(cls, path: str | Path = "config.json") -> Config:
@@ -78,10 +224,20 @@ class Config:
         model_settings = ModelSettings(**data.pop("model_settings", {}))
         conversation_settings = ConversationSettings(**data.pop("conversation_settings", {}))
         tts_settings = TTSSettings(**data.pop("tts_settings", {}))
+        http_settings = HTTPSettings(**data.pop("http_settings", {}))
+        memory_settings = MemorySettings(**data.pop("memory_settings", {}))
+        storage_settings = StorageSettings(**data.pop("storage_settings", {}))
+        cache_settings = CacheSettings(**data.pop("cache_settings", {}))
+        stt_settings = STTSettings(**data.pop("stt_settings", {}))
         return cls(
             model_settings=model_settings,
             conversation_settings=conversation_settings,
             tts_settings=tts_settings,
+            http_settings=http_settings,
+            memory_settings=memory_settings,
+            storage_settings=storage_settings,
+            cache_settings=cache_settings,
+            stt_settings=stt_settings,
             **data,
         )
 
@@ -107,6 +263,11 @@ class Config:
             "model_settings": self.model_settings.__dict__,
             "conversation_settings": self.conversation_settings.__dict__,
             "tts_settings": self.tts_settings.__dict__,
+            "http_settings": self.http_settings.__dict__,
+            "memory_settings": self.memory_settings.__dict__,
+            "storage_settings": self.storage_settings.__dict__,
+            "cache_settings": self.cache_settings.__dict__,
+            "stt_settings": self.stt_settings.__dict__,
         }
 
 
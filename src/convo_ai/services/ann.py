@@ -0,0 +1,164 @@
+"""Approximate nearest-neighbour search for large memory stores.
+
+An inverted-file (IVF-flat) index in pure NumPy: unit vectors are
+clustered with spherical k-means, each vector is filed under its nearest
+centroid, and a query only scores the vectors in its ``nprobe`` closest
+lists. ``nprobe`` trades recall for latency. Inserts and deletes are
+incremental; the centroids are retrained when the store has grown
+enough that the lists get long (see ``VectorIndex``).
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_ASSIGN_CHUNK = 8192
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) for each row, computed in chunks."""
+    out = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK):
+        block = vectors[start : start + _ASSIGN_CHUNK]
+        out[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors, keyed by caller-supplied integer IDs."""
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8) -> None:
+        self.nlist = nlist  # 0 = choose from the data size at training time
+        self.nprobe = nprobe
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+        self._lists: list[set[int]] = []
+        self._assignment: dict[int, int] = {}
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._assignment)
+
+    def reset(self) -> None:
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._assignment = {}
+
+    def train(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        iterations: int = 10,
+        sample_size: int = 20000,
+        seed: int = 0,
+    ) -> None:
+        """Fit centroids with spherical k-means and file every vector."""
+        n = vectors.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if n > sample_size:
+            sample = vectors[rng.choice(n, size=sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _assign(sample, centroids)
+            # Sum members per cluster: sort by label, then reduce each contiguous run.
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            if empty.any():
+                # Re-seed empty clusters from random sample rows
+                sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1)
+            centroids = (sums / norms[:, None]).astype(np.float32)
+
+        self.centroids = centroids
+        self.trained_size = n
+        self._lists = [set() for _ in range(nlist)]
+        self._assignment = {}
+        for item_id, label in zip(ids.tolist(), _assign(vectors, centroids).tolist(), strict=True):
+            self._assignment[item_id] = label
+            self._lists[label].add(item_id)
+        logger.info("Trained IVF index: %d vectors in %d lists", n, nlist)
+
+    def add(self, item_id: int, unit: np.ndarray) -> None:
+        if self.centroids is None:
+            return
+        self.remove(item_id)
+        label = int(np.argmax(self.centroids @ unit))
+        self._assignment[item_id] = label
+        self._lists[label].add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        label = self._assignment.pop(item_id, None)
+        if label is not None:
+            self._lists[label].discard(item_id)
+
+    def candidates(self, unit: np.ndarray, nprobe: int | None = None) -> list[int]:
+        """IDs filed under the ``nprobe`` centroids closest to ``unit``."""
+        if self.centroids is None:
+            return []
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        sims = self.centroids @ unit
+        probe = np.argpartition(sims, -nprobe)[-nprobe:] if nprobe < sims.size else range(sims.size)
+        out: list[int] = []
+        for label in probe:
+            out.extend(self._lists[int(label)])
+        return out
+
+    # ─── Persistence ──────────────────────────────────────────────────
+
+    def save(self, path: str | Path) -> None:
+        if self.centroids is None:
+            return
+        ids = np.fromiter(self._assignment.keys(), dtype=np.int64, count=len(self._assignment))
+        labels = np.fromiter(self._assignment.values(), dtype=np.int64, count=len(self._assignment))
+        tmp = Path(f"{path}.tmp.npz")
+        np.savez(
+            tmp,
+            centroids=self.centroids,
+            ids=ids,
+            labels=labels,
+            trained_size=np.int64(self.trained_size),
+        )
+        tmp.replace(path)
+
+    def load(self, path: str | Path) -> bool:
+        """Restore a saved index. Returns False if the file is missing or unreadable."""
+        p = Path(path)
+        if not p.exists():
+            return False
+        try:
+            with np.load(p) as data:
+                centroids = data["centroids"].astype(np.float32)
+                ids = data["ids"]
+                labels = data["labels"]
+                trained_size = int(data["trained_size"])
+        except Exception as exc:
+            logger.warning("Ignoring unreadable ANN index %s: %s", p, exc)
+            return False
+        self.centroids = centroids
+        self.trained_size = trained_size
+        self._lists = [set() for _ in range(centroids.shape[0])]
+        self._assignment = {}
+        for item_id, label in zip(ids.tolist(), labels.tolist(), strict=True):
+            self._assignment[item_id] = label
+            self._lists[label].add(item_id)
+        return True
+
+    def ids(self) -> set[int]:
+        return set(self._assignment)
@@ -0,0 +1,395 @@
+"""Cold storage for old conversation history.
+
+Turns older than the retention window are moved out of SQLite into
+append-only, gzip-compressed JSONL segment files. A segment is rotated
+when it passes ``segment_max_bytes`` or when the UTC day changes, and a
+small JSON index records each segment's id and timestamp range and how
+many rows each user has in it, so reads only open the segments they need.
+
+Rows are written (and fsynced) to the archive before they are deleted
+from SQLite. History ids come from an AUTOINCREMENT sequence and are
+never reused, so ids at or below the archive's high-water mark are ones
+already archived; ``append`` skips them, and a run only deletes rows the
+archive actually wrote.
+
+The retention worker appends from a worker thread while request handlers
+read and delete, so every method that touches the segment list or the
+files takes the archive's lock.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .storage import DEFAULT_USER
+
+if TYPE_CHECKING:
+    from .database import Database
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+
+@dataclass
+class Segment:
+    """Index record for one archive file."""
+
+    file: str
+    day: str
+    first_id: int
+    last_id: int
+    first_ts: str
+    last_ts: str
+    count: int = 0
+    # Rows per user; None for segments indexed before this was recorded
+    users: dict[str, int] | None = field(default_factory=dict)
+
+    def has_user(self, user_id: str) -> bool:
+        return self.users is None or user_id in self.users
+
+
+def _count_users(rows: list[dict[str, Any]]) -> dict[str, int]:
+    users: dict[str, int] = {}
+    for row in rows:
+        user = row.get("user_id", DEFAULT_USER)
+        users[user] = users.get(user, 0) + 1
+    return users
+
+
+class HistoryArchive:
+    """Directory of compressed JSONL history segments plus their index."""
+
+    def __init__(self, directory: str | Path, segment_max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.segments: list[Segment] = []
+        self._high_water = 0
+        # Reentrant: public methods call each other (and ``last_id``) while holding it
+        self._lock = threading.RLock()
+        self._load_index()
+
+    @property
+    def last_id(self) -> int:
+        """Highest id ever archived, even if its segment was later deleted."""
+        with self._lock:
+            return max(self._high_water, self.segments[-1].last_id if self.segments else 0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(seg.count for seg in self.segments)
+
+    # ─── Index ────────────────────────────────────────────────────────
+
+    def _load_index(self) -> None:
+        path = self.directory / INDEX_FILE
+        if not path.exists():
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.segments = [Segment(**{"users": None, **seg}) for seg in data.get("segments", [])]
+            self._high_water = int(data.get("last_id", 0))
+        except (OSError, ValueError, TypeError) as exc:
+            logger.error("Unreadable history archive index %s: %s", path, exc)
+            self.segments = []
+
+    def _save_index(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / INDEX_FILE
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(
+            json.dumps(
+                {"last_id": self.last_id, "segments": [asdict(seg) for seg in self.segments]},
+                indent=1,
+            ),
+            encoding="utf-8",
+        )
+        tmp.replace(path)
+
+    # ─── Writing ──────────────────────────────────────────────────────
+
+    def _segment_for(self, entry: dict[str, Any]) -> Segment:
+        day = entry["timestamp"][:10]
+        current = self.segments[-1] if self.segments else None
+        if current is not None and current.day == day:
+            path = self.directory / current.file
+            if not path.exists() or path.stat().st_size < self.segment_max_bytes:
+                return current
+        segment = Segment(
+            file=f"history-{day}-{entry['id']:010d}.jsonl.gz",
+            day=day,
+            first_id=entry["id"],
+            last_id=entry["id"],
+            first_ts=entry["timestamp"],
+            last_ts=entry["timestamp"],
+        )
+        self.segments.append(segment)
+        return segment
+
+    def append(self, entries: list[dict[str, Any]]) -> int:
+        """Append entries (ascending ``id``) and fsync them. Returns how many were new."""
+        with self._lock:
+            return self._append(entries)
+
+    def _append(self, entries: list[dict[str, Any]]) -> int:
+        fresh = [e for e in entries if e["id"] > self.last_id]
+        if not fresh:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        groups: list[tuple[Segment, list[dict[str, Any]]]] = []
+        for entry in fresh:
+            segment = self._segment_for(entry)
+            if not groups or groups[-1][0] is not segment:
+                groups.append((segment, []))
+            groups[-1][1].append(entry)
+            segment.last_id = entry["id"]
+            segment.last_ts = entry["timestamp"]
+            segment.count += 1
+            if segment.users is not None:
+                user = entry.get("user_id", DEFAULT_USER)
+                segment.users[user] = segment.users.get(user, 0) + 1
+            if len(groups[-1][1]) % 256 == 0:
+                # Flush periodically so the size-based rotation sees real file sizes.
+                self._write(*groups[-1])
+                groups[-1] = (segment, [])
+        for segment, batch in groups:
+            self._write(segment, batch)
+        self._save_index()
+        return len(fresh)
+
+    def _write(self, segment: Segment, batch: list[dict[str, Any]]) -> None:
+        if not batch:
+            return
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch)
+        # Each append adds a gzip member; readers decode multi-member files transparently.
+        with open(self.directory / segment.file, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                gz.write(payload.encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    # ─── Reading ──────────────────────────────────────────────────────
+
+    def _read(self, segment: Segment) -> list[dict[str, Any]]:
+        path = self.directory / segment.file
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                return [json.loads(line) for line in fh if line.strip()]
+        except (OSError, ValueError) as exc:
+            logger.error("Unreadable history segment %s: %s", path, exc)
+            return []
+
+    def read_before(
+        self, before_id: int | None, limit: int, user_id: str | None = None
+    ) -> list[dict[str, Any]]:
+        """Up to ``limit`` archived entries with ``id < before_id``, newest first."""
+        with self._lock:
+            return self._read_before(before_id, limit, user_id)
+
+    def _read_before(
+        self, before_id: int | None, limit: int, user_id: str | None
+    ) -> list[dict[str, Any]]:
+        out: list[dict[str, Any]] = []
+        for segment in reversed(self.segments):
+            if len(out) >= limit:
+                break
+            if before_id is not None and segment.first_id >= before_id:
+                continue
+            if user_id is not None and not segment.has_user(user_id):
+                continue
+            rows = self._read(segment)
+            rows.reverse()
+            for row in rows:
+                if user_id is not None and row.get("user_id", DEFAULT_USER) != user_id:
+                    continue
+                if before_id is None or row["id"] < before_id:
+                    out.append(row)
+                    if len(out) >= limit:
+                        break
+        return out
+
+    def read_range(self, start: str, end: str) -> list[dict[str, Any]]:
+        """Archived entries with ``start <= timestamp < end`` (ISO strings), oldest first."""
+        out: list[dict[str, Any]] = []
+        with self._lock:
+            for segment in self.segments:
+                if segment.last_ts < start or segment.first_ts >= end:
+                    continue
+                out.extend(row for row in self._read(segment) if start <= row["timestamp"] < end)
+        return out
+
+    # ─── Deletion ─────────────────────────────────────────────────────
+
+    def delete_before(self, before_id: int | None = None, user_id: str | None = None) -> int:
+        """Drop archived entries with ``id < before_id`` (all when None). Returns the count.
+
+        With ``user_id`` only that user's rows go; segments holding other
+        users' rows are rewritten without them. The id high-water mark is
+        kept, since history ids are never reused.
+        """
+        with self._lock:
+            return self._delete_before(before_id, user_id)
+
+    def _delete_before(self, before_id: int | None, user_id: str | None) -> int:
+        if not self.segments:
+            return 0  # nothing archived; don't create the directory or index
+        deleted = 0
+        kept: list[Segment] = []
+        for segment in self.segments:
+            path = self.directory / segment.file
+            if before_id is not None and segment.first_id >= before_id:
+                kept.append(segment)
+                continue
+            if user_id is not None and not segment.has_user(user_id):
+                kept.append(segment)
+                continue
+            if user_id is None and (before_id is None or segment.last_id < before_id):
+                deleted += segment.count
+                path.unlink(missing_ok=True)
+                continue
+            # Only part of the segment goes: rewrite it without those rows.
+            rows = [
+                r
+                for r in self._read(segment)
+                if not (
+                    (before_id is None or r["id"] < before_id)
+                    and (user_id is None or r.get("user_id", DEFAULT_USER) == user_id)
+                )
+            ]
+            deleted += segment.count - len(rows)
+            if len(rows) == segment.count:
+                if segment.users is None:
+                    segment.users = _count_users(rows)  # backfill an older index entry
+                kept.append(segment)
+                continue
+            if not rows:
+                path.unlink(missing_ok=True)
+                continue
+            tmp = replace(segment, file=segment.file + ".tmp")
+            (self.directory / tmp.file).unlink(missing_ok=True)
+            self._write(tmp, rows)
+            (self.directory / tmp.file).replace(path)
+            segment.first_id = rows[0]["id"]
+            segment.first_ts = rows[0]["timestamp"]
+            segment.count = len(rows)
+            segment.users = _count_users(rows)
+            kept.append(segment)
+        self._high_water = self.last_id
+        self.segments = kept
+        self._save_index()
+        return deleted
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "segments": len(self.segments),
+                "entries": len(self),
+                "bytes": sum(
+                    (self.directory / s.file).stat().st_size
+                    for s in self.segments
+                    if (self.directory / s.file).exists()
+                ),
+                "last_id": self.last_id,
+            }
+
+
+class RetentionWorker:
+    """Periodically moves history older than ``retention_days`` into the archive."""
+
+    def __init__(
+        self,
+        db: Database,
+        archive: HistoryArchive,
+        retention_days: float,
+        interval: float = 3600.0,
+        batch_size: int = 1000,
+    ) -> None:
+        self.db = db
+        self.archive = archive
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.archived = 0
+        self.last_run_ms = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="history-retention")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def run_once(self) -> int:
+        """Archive every hot row older than the retention window. Returns rows moved."""
+        started = time.perf_counter()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat()
+        newest = self.db.get_history(limit=1)
+        if not newest or newest[0].id is None:
+            return 0
+        # The newest row always stays hot, so archival alone never empties the table.
+        keep_id = newest[0].id
+        moved = 0
+        while True:
+            # Archive a contiguous id prefix so the archive's high-water mark stays exact.
+            rows = self.db.get_history(limit=self.batch_size, oldest_first=True)
+            expired = []
+            for row in rows:
+                if row.timestamp >= cutoff or row.id is None or row.id >= keep_id:
+                    break
+                expired.append(row.model_dump())
+            if not expired:
+                break
+            written = self.archive.append(expired)
+            if written < len(expired):
+                # Rows at or below the high-water mark: never delete what was not written
+                logger.error(
+                    "Archive skipped %d of %d rows (ids up to %d); leaving them in SQLite",
+                    len(expired) - written,
+                    len(expired),
+                    self.archive.last_id,
+                )
+                break
+            moved += self.db.delete_history(up_to_id=expired[-1]["id"])
+            if len(expired) < len(rows):
+                break
+        self.runs += 1
+        self.archived += moved
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        if moved:
+            logger.info("Archived %d history rows older than %s", moved, cutoff)
+        return moved
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as exc:
+                logger.error("History archival failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "retention_days": self.retention_days,
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run_ms": round(self.last_run_ms, 2),
+            **self.archive.stats(),
+        }
@@ -0,0 +1,119 @@
+"""PCM audio helpers shared by the speech-to-text paths.
+
+Uploaded audio is decoded in memory straight into the mono float32
+16 kHz buffer faster-whisper consumes, with no temporary file.
+"""
+
+from __future__ import annotations
+
+import struct
+
+import numpy as np
+
+# faster-whisper expects mono float32 samples in [-1, 1] at this rate
+WHISPER_SAMPLE_RATE = 16000
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Little-endian signed 16-bit PCM bytes as float32 samples in [-1, 1]."""
+    usable = len(data) - len(data) % 2
+    samples = np.frombuffer(data[:usable], dtype="<i2")
+    return samples.astype(np.float32) / 32768.0
+
+
+def rms(samples: np.ndarray) -> float:
+    """Root-mean-square level of ``samples`` (0.0 for an empty array)."""
+    if samples.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Linear-interpolation resample; good enough for speech recognition input."""
+    if src_rate <= 0:
+        raise ValueError(f"invalid sample rate {src_rate}")
+    if src_rate == dst_rate or samples.size == 0:
+        return samples
+    count = int(round(samples.size * dst_rate / src_rate))
+    positions = np.linspace(0, samples.size - 1, num=count, dtype=np.float64)
+    return np.interp(positions, np.arange(samples.size), samples).astype(np.float32)
+
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """Decode a PCM or IEEE-float WAV file to mono float32 samples and its sample rate.
+
+    Raises ValueError for anything else (compressed formats, truncated headers).
+    """
+    if not is_wav(data):
+        raise ValueError("not a RIFF/WAVE file")
+    fmt: tuple[int, int, int, int] | None = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, pos)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            tag, channels, rate = struct.unpack_from("<HHI", data, body)
+            (bits,) = struct.unpack_from("<H", data, body + 14)
+            if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                (tag,) = struct.unpack_from("<H", data, body + 24)  # first 2 bytes of SubFormat
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streams written before their length is known leave the size at 0 or too large
+            payload = data[body : body + size] if 0 < size <= len(data) - body else data[body:]
+            return _pcm_to_mono(payload, *fmt), fmt[2]
+        pos = body + size + (size & 1)  # chunks are word-aligned
+    raise ValueError("WAV file has no data chunk")
+
+
+def _pcm_to_mono(payload: bytes, tag: int, channels: int, rate: int, bits: int) -> np.ndarray:
+    dtypes = {
+        (_WAVE_FORMAT_PCM, 16): "<i2",
+        (_WAVE_FORMAT_PCM, 32): "<i4",
+        (_WAVE_FORMAT_IEEE_FLOAT, 32): "<f4",
+        (_WAVE_FORMAT_IEEE_FLOAT, 64): "<f8",
+    }
+    if tag == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif (tag, bits) in dtypes:
+        dtype = np.dtype(dtypes[(tag, bits)])
+        usable = len(payload) - len(payload) % dtype.itemsize
+        samples = np.frombuffer(payload[:usable], dtype=dtype).astype(np.float32)
+        if tag == _WAVE_FORMAT_PCM:
+            samples /= float(2 ** (bits - 1))
+    else:
+        raise ValueError(f"unsupported WAV encoding (format {tag}, {bits}-bit)")
+    if channels > 1:
+        samples = samples[: samples.size - samples.size % channels]
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def decode_pcm(
+    data: bytes, audio_format: str = "auto", sample_rate: int = WHISPER_SAMPLE_RATE
+) -> np.ndarray | None:
+    """Decode ``data`` to Whisper-ready samples, or None if it needs a full demuxer.
+
+    ``audio_format`` is ``"wav"``, ``"pcm16"`` (headerless, at ``sample_rate``)
+    or ``"auto"``, which recognises WAV by its RIFF header and leaves other
+    containers (webm, ogg, mp3) to faster-whisper's own decoder. Raises
+    ValueError for a non-positive ``sample_rate`` or a malformed WAV.
+    """
+    if audio_format == "pcm16":
+        if sample_rate <= 0:
+            raise ValueError(f"sample_rate must be positive, got {sample_rate}")
+        return resample(pcm16_to_float32(data), sample_rate)
+    if audio_format == "wav" or is_wav(data):
+        samples, rate = decode_wav(data)
+        return resample(samples, rate)
+    return None
@@ -0,0 +1,139 @@
+"""Token-budgeted prompt assembly.
+
+Ollama silently drops the start of any prompt longer than ``num_ctx``, and
+every extra token adds prefill time. Before a turn is sent, the assembler
+estimates the size of each prompt section and fits them into the context
+window minus the room reserved for the reply (``num_predict``):
+
+1. the system prompt, the session summary and the user's input are always
+   kept (the summary is bounded by ``summary_max_words``);
+2. retrieved memories are added best-score first, up to
+   ``memory_token_share`` of what remains;
+3. conversation history fills the rest, newest turn first.
+
+The per-section counts are returned so responses can report them.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..config import Config
+from .memory import render_context_block
+from .prompt import SUMMARY_HEADER
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Role markers and separators the chat template adds around each message
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast token-count estimate, no tokenizer needed.
+
+    BPE vocabularies average about four characters per token in English,
+    while every word and punctuation mark costs at least one, so the larger
+    of the two counts is used.
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_RE.findall(text)), (len(text) + 3) // 4)
+
+
+@dataclass
+class AssembledPrompt:
+    """The memories and history turns that fit the budget, plus token accounting."""
+
+    memories: list[dict[str, Any]] = field(default_factory=list)
+    history: list[tuple[str, str]] = field(default_factory=list)
+    usage: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def memory_context(self) -> str:
+        return render_context_block(self.memories)
+
+
+class PromptAssembler:
+    """Allocates the ``num_ctx`` budget across the sections of one prompt."""
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+
+    @property
+    def budget(self) -> int:
+        """Prompt tokens available once the reply and a safety margin are reserved."""
+        model = self.config.model_settings
+        margin = self.config.conversation_settings.prompt_token_margin
+        return max(0, model.num_ctx - model.num_predict - margin)
+
+    def assemble(
+        self,
+        system: str,
+        user_input: str,
+        memories: Sequence[dict[str, Any]] = (),
+        history: Sequence[tuple[str, str]] = (),
+        summary: str = "",
+    ) -> AssembledPrompt:
+        budget = self.budget
+        system_tokens = estimate_tokens(system) + MESSAGE_OVERHEAD
+        summary_tokens = estimate_tokens(f"{SUMMARY_HEADER}\n{summary}") if summary else 0
+        input_tokens = estimate_tokens(user_input) + MESSAGE_OVERHEAD
+        fixed = system_tokens + summary_tokens + input_tokens
+        remaining = budget - fixed
+        if remaining < 0:
+            logger.warning(
+                "System prompt, summary and input (%d tokens) exceed the %d-token budget",
+                fixed,
+                budget,
+            )
+
+        # Memories: best score first, within their share of the flexible budget.
+        share = self.config.conversation_settings.memory_token_share
+        memory_budget = int(max(remaining, 0) * share)
+        kept_memories: list[dict[str, Any]] = []
+        memory_tokens = 0
+        if memories:
+            frame = estimate_tokens(render_context_block([{"category": "", "content": ""}]))
+            ranked = sorted(memories, key=lambda m: m.get("relevance_score", 0.0), reverse=True)
+            used = frame
+            for memory in ranked:
+                cost = estimate_tokens(f"- [{memory['category']}] {memory['content']}")
+                if used + cost > memory_budget:
+                    continue
+                kept_memories.append(memory)
+                used += cost
+            if kept_memories:
+                memory_tokens = used
+        remaining -= memory_tokens
+
+        # History: newest turns first until the rest of the budget is spent.
+        kept_turns: list[tuple[str, str]] = []
+        history_tokens = 0
+        for user_text, assistant_text in reversed(history):
+            cost = estimate_tokens(user_text) + estimate_tokens(assistant_text)
+            cost += 2 * MESSAGE_OVERHEAD
+            if history_tokens + cost > remaining:
+                break
+            kept_turns.append((user_text, assistant_text))
+            history_tokens += cost
+        kept_turns.reverse()
+
+        total = fixed + memory_tokens + history_tokens
+        usage = {
+            "system": system_tokens,
+            "summary": summary_tokens,
+            "memory": memory_tokens,
+            "history": history_tokens,
+            "input": input_tokens,
+            "total": total,
+            "budget": budget,
+            "num_ctx": self.config.model_settings.num_ctx,
+            "memories_dropped": len(memories) - len(kept_memories),
+            "turns_dropped": len(history) - len(kept_turns),
+        }
+        return AssembledPrompt(memories=kept_memories, history=kept_turns, usage=usage)
@@ -0,0 +1,81 @@
+"""Small in-process caches shared by the services."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """Size-bounded least-recently-used cache with hit/miss counters.
+
+    With ``ttl`` > 0 entries also expire that many seconds after they were
+    stored; an expired entry counts as a miss.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 0.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._data: OrderedDict[Hashable, V] = OrderedDict()
+        self._expires: dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> V | None:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if self.ttl > 0 and self._expires.get(key, 0.0) <= time.monotonic():
+            self.pop(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.ttl > 0:
+            self._expires[key] = time.monotonic() + self.ttl
+        while len(self._data) > self.maxsize:
+            oldest, _ = self._data.popitem(last=False)
+            self._expires.pop(oldest, None)
+            self.evicted += 1
+
+    def pop(self, key: Hashable) -> V | None:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
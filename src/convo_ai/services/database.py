@@ -1,22 +1,68 @@
-"""SQLite-backed conversation history using SQLModel."""
+"""SQLite-backed conversation history using SQLModel.
+
+History is paged with keyset pagination on the primary key (``before_id``)
+so deep pages cost the same as the first, and searched through an FTS5
+index over ``user_text``/``assistant_text`` kept in sync by triggers.
+Every row belongs to a ``user_id``; a composite ``(user_id, id)`` index
+keeps one user's pages and deletes independent of everyone else's rows.
+Ids come from an AUTOINCREMENT sequence, so they are never reused even
+after the table is emptied; the history archive relies on that.
+"""
 
 from __future__ import annotations
 
 import logging
 from datetime import datetime, timezone
-from pathlib import Path
+from typing import Any
 
-from sqlmodel import Field, Session, SQLModel, create_engine, select
+from sqlalchemy import delete, func
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Field, Session, SQLModel, col, select
 
 from ..config import Config
+from .storage import DEFAULT_USER, Storage, UnitOfWork
 
 logger = logging.getLogger(__name__)
 
+FTS_TABLE = "conversationentry_fts"
+
+# External-content FTS5 index: the text lives only in conversationentry and
+# the triggers mirror every insert, update and delete into the index.
+_FTS_SCHEMA = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "user_text, assistant_text, content='conversationentry', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS conversationentry_ai AFTER INSERT ON conversationentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, user_text, assistant_text) "
+    "VALUES (new.id, new.user_text, new.assistant_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS conversationentry_ad AFTER DELETE ON conversationentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_text, assistant_text) "
+    "VALUES ('delete', old.id, old.user_text, old.assistant_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS conversationentry_au AFTER UPDATE ON conversationentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_text, assistant_text) "
+    "VALUES ('delete', old.id, old.user_text, old.assistant_text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, user_text, assistant_text) "
+    "VALUES (new.id, new.user_text, new.assistant_text); END",
+]
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Each word is quoted so FTS5 operators and punctuation in user input are
+    treated as plain text.
+    """
+    terms = ['"' + word.replace('"', '""') + '"*' for word in text.split()]
+    return " ".join(terms)
+
 
 class ConversationEntry(SQLModel, table=True):
     """A single user/assistant exchange."""
 
+    # Never hand out an id twice: archived rows are tracked by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: int | None = Field(default=None, primary_key=True)
+    user_id: str = Field(default=DEFAULT_USER, sa_column_kwargs={"server_default": DEFAULT_USER})
     timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     user_text: str = ""
     assistant_text: str = ""
@@ -26,38 +72,205 @@ class ConversationEntry(SQLModel, table=True):
 class Database:
     """Thin wrapper around a SQLModel SQLite database."""
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, storage: Storage | None = None) -> None:
         self.config = config
-        db_path = config.database_url.replace("sqlite:///", "")
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        self.engine = create_engine(config.database_url, echo=False)
+        self.storage = storage if storage is not None else Storage(config)
+        self.engine = self.storage.engine
         SQLModel.metadata.create_all(self.engine)
+        self.storage.ensure_column(
+            "conversationentry", "user_id", f"VARCHAR NOT NULL DEFAULT '{DEFAULT_USER}'"
+        )
+        self._ensure_autoincrement()
+        self.storage.ensure_index(
+            "ix_conversationentry_user_id_id", "conversationentry", "user_id, id"
+        )
+        self.fts_enabled = self._ensure_fts()
         logger.info("Database initialized at %s", config.database_url)
 
+    def _ensure_autoincrement(self) -> None:
+        """Rebuild a history table created without AUTOINCREMENT, keeping its rows and ids."""
+        table = "conversationentry"
+        with self.engine.begin() as conn:
+            ddl = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).scalar()
+            if ddl is None or "AUTOINCREMENT" in ddl.upper():
+                return
+            # The old triggers and indexes go with the legacy table; they are recreated below.
+            conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+            ConversationEntry.__table__.create(conn)  # type: ignore[attr-defined]
+            columns = ", ".join(c.name for c in ConversationEntry.__table__.columns)  # type: ignore[attr-defined]
+            conn.exec_driver_sql(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_legacy"
+            )
+            conn.exec_driver_sql(f"DROP TABLE {table}_legacy")
+        logger.info("Rebuilt %s with AUTOINCREMENT ids", table)
+
+    def reserve_ids(self, floor: int) -> None:
+        """Make every future history id larger than ``floor``, e.g. the archive's last id."""
+        if floor <= 0:
+            return
+        with self.engine.begin() as conn:
+            seq = conn.exec_driver_sql(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'conversationentry'"
+            ).scalar()
+            if seq is None:
+                conn.exec_driver_sql(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('conversationentry', ?)",
+                    (floor,),
+                )
+            elif seq < floor:
+                conn.exec_driver_sql(
+                    "UPDATE sqlite_sequence SET seq = ? WHERE name = 'conversationentry'", (floor,)
+                )
+
+    def _ensure_fts(self) -> bool:
+        """Create the FTS5 index and its triggers, backfilling existing rows once."""
+        try:
+            with self.engine.begin() as conn:
+                exists = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+                ).first()
+                if exists is None:
+                    conn.exec_driver_sql(_FTS_SCHEMA[0])
+                    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                for trigger in _FTS_SCHEMA[1:]:
+                    conn.exec_driver_sql(trigger)
+        except OperationalError as exc:
+            # SQLite builds without FTS5 fall back to LIKE scans in search().
+            logger.warning("FTS5 unavailable, history search will scan: %s", exc)
+            return False
+        return True
+
     def add_entry(
         self,
         user_text: str,
         assistant_text: str,
         mood: str = "neutral",
+        uow: UnitOfWork | None = None,
+        user_id: str = DEFAULT_USER,
     ) -> ConversationEntry:
         entry = ConversationEntry(
+            user_id=user_id,
             user_text=user_text,
             assistant_text=assistant_text,
             mood=mood,
         )
+        if uow is not None:
+            # Committed together with the rest of the turn's writes
+            uow.session.add(entry)
+            return entry
         with Session(self.engine) as session:
             session.add(entry)
             session.commit()
             session.refresh(entry)
         return entry
 
-    def get_history(self, limit: int = 50) -> list[ConversationEntry]:
+    def add_entries(self, entries: list[ConversationEntry]) -> None:
+        """Insert many entries in a single transaction."""
         with Session(self.engine) as session:
-            statement = select(ConversationEntry).order_by(ConversationEntry.id.desc()).limit(limit)
+            session.add_all(entries)
+            session.commit()
+
+    def get_history(
+        self,
+        limit: int = 50,
+        before_id: int | None = None,
+        oldest_first: bool = False,
+        user_id: str | None = None,
+    ) -> list[ConversationEntry]:
+        """Newest entries first. Pass the last ``id`` of a page as ``before_id`` for the next.
+
+        ``user_id`` restricts the page to one user; None reads every user's rows.
+        """
+        with Session(self.engine) as session:
+            statement = select(ConversationEntry)
+            if user_id is not None:
+                statement = statement.where(ConversationEntry.user_id == user_id)
+            if before_id is not None:
+                statement = statement.where(col(ConversationEntry.id) < before_id)
+            order = col(ConversationEntry.id)
+            statement = statement.order_by(order if oldest_first else order.desc()).limit(limit)
             return list(session.exec(statement).all())
 
-    def clear_history(self) -> None:
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        before_id: int | None = None,
+        user_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Entries matching every word of ``query``, newest first, keyset-paginated."""
+        if not query.split():
+            return []
+        if not self.fts_enabled:
+            return self._search_like(query, limit, before_id, user_id)
+        sql = (
+            "SELECT c.id, c.user_id, c.timestamp, c.user_text, c.assistant_text, c.mood, "
+            f"snippet({FTS_TABLE}, -1, '[', ']', '…', 12) "
+            f"FROM {FTS_TABLE} JOIN conversationentry c ON c.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ?"
+        )
+        params: list[Any] = [fts_query(query)]
+        if user_id is not None:
+            sql += " AND c.user_id = ?"
+            params.append(user_id)
+        if before_id is not None:
+            sql += " AND c.id < ?"
+            params.append(before_id)
+        sql += " ORDER BY c.id DESC LIMIT ?"
+        params.append(limit)
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql, tuple(params)).all()
+        keys = ("id", "user_id", "timestamp", "user_text", "assistant_text", "mood", "snippet")
+        return [dict(zip(keys, row, strict=True)) for row in rows]
+
+    def _search_like(
+        self, query: str, limit: int, before_id: int | None, user_id: str | None
+    ) -> list[dict[str, Any]]:
         with Session(self.engine) as session:
-            for entry in session.exec(select(ConversationEntry)).all():
-                session.delete(entry)
+            statement = select(ConversationEntry)
+            if user_id is not None:
+                statement = statement.where(ConversationEntry.user_id == user_id)
+            for word in query.split():
+                pattern = f"%{word}%"
+                statement = statement.where(
+                    col(ConversationEntry.user_text).like(pattern)
+                    | col(ConversationEntry.assistant_text).like(pattern)
+                )
+            if before_id is not None:
+                statement = statement.where(col(ConversationEntry.id) < before_id)
+            statement = statement.order_by(col(ConversationEntry.id).desc()).limit(limit)
+            return [
+                {**entry.model_dump(), "snippet": ""} for entry in session.exec(statement).all()
+            ]
+
+    def count(self) -> int:
+        with Session(self.engine) as session:
+            return session.exec(select(func.count()).select_from(ConversationEntry)).one()
+
+    def delete_history(
+        self,
+        before_id: int | None = None,
+        up_to_id: int | None = None,
+        user_id: str | None = None,
+    ) -> int:
+        """Delete matching entries in one statement; with no filters, delete everything.
+
+        ``before_id`` and ``up_to_id`` bound the ids (exclusive and inclusive);
+        ``user_id`` limits the delete to one user.
+        """
+        statement = delete(ConversationEntry)
+        if user_id is not None:
+            statement = statement.where(col(ConversationEntry.user_id) == user_id)
+        if before_id is not None:
+            statement = statement.where(col(ConversationEntry.id) < before_id)
+        if up_to_id is not None:
+            statement = statement.where(col(ConversationEntry.id) <= up_to_id)
+        with Session(self.engine) as session:
+            deleted = session.exec(statement).rowcount  # type: ignore[call-overload]
             session.commit()
+        return deleted
+
+    def clear_history(self, user_id: str | None = None) -> None:
+        self.delete_history(user_id=user_id)
@@ -0,0 +1,109 @@
+"""Background fact extraction.
+
+Extracting facts costs a second LLM call plus one embedding per fact, so
+chat turns hand the exchange to this worker and return as soon as the
+reply is ready. The worker drains the queue in the background, stores
+the new memories and reports them through the job's callback.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from .storage import DEFAULT_USER
+
+if TYPE_CHECKING:
+    from .memory import MemoryService
+
+logger = logging.getLogger(__name__)
+
+FactsCallback = Callable[[list[dict[str, Any]]], Awaitable[None]]
+
+
+@dataclass
+class ExtractionJob:
+    """One conversation exchange waiting for fact extraction."""
+
+    user_text: str
+    assistant_text: str
+    on_done: FactsCallback | None = None
+    user_id: str = DEFAULT_USER
+
+
+class FactExtractionWorker:
+    """Bounded asyncio queue of extraction jobs drained by a background task."""
+
+    def __init__(self, memory: MemoryService, max_queue: int = 100) -> None:
+        self.memory = memory
+        self.queue: asyncio.Queue[ExtractionJob] = asyncio.Queue(maxsize=max_queue)
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.facts_stored = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="fact-extraction")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Finish queued jobs (up to ``timeout`` seconds), then cancel the worker."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d unfinished extraction jobs", self.queue.qsize())
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def submit(self, job: ExtractionJob) -> bool:
+        """Queue a job without waiting. Returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Fact extraction queue full; skipping exchange")
+            return False
+        return True
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": self.queue.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "facts_stored": self.facts_stored,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                new_facts = await self.process(job)
+                if job.on_done is not None and new_facts:
+                    await job.on_done(new_facts)
+                self.processed += 1
+            except Exception as exc:
+                self.failed += 1
+                logger.error("Fact extraction job failed: %s", exc)
+            finally:
+                self.queue.task_done()
+
+    async def process(self, job: ExtractionJob) -> list[dict[str, Any]]:
+        """Extract, embed and store the facts from one exchange."""
+        facts = await self.memory.extract_facts(job.user_text, job.assistant_text)
+        entries = await self.memory.add_memories(
+            ({"content": content, "category": category} for category, content in facts),
+            user_id=job.user_id,
+        )
+        new_facts = [self.memory._entry_to_dict(entry) for entry in entries]
+        self.facts_stored += len(new_facts)
+        return new_facts
@@ -0,0 +1,153 @@
+"""Write-behind persistence for conversation history.
+
+Nothing in a chat reply depends on the history row, so turns hand their
+``ConversationEntry`` to this writer instead of committing inline. A
+background task groups queued entries into batches (flushed when
+``batch_size`` is reached or ``flush_interval`` seconds after the first
+entry arrived; ``flush()`` cuts the wait short) and commits each batch in
+one transaction on a worker thread, keeping the commit off the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from .database import ConversationEntry
+from .storage import DEFAULT_USER
+
+if TYPE_CHECKING:
+    from .database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Bounded queue of history rows committed in batches by a background task."""
+
+    def __init__(
+        self,
+        db: Database,
+        batch_size: int = 32,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+    ) -> None:
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue[ConversationEntry] = asyncio.Queue(maxsize=max_pending)
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.backpressure_waits = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self._flush_requested = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="history-writer")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush pending rows (up to ``timeout`` seconds), then cancel the writer."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d unwritten history rows", self.queue.qsize())
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def submit(
+        self,
+        user_text: str,
+        assistant_text: str,
+        mood: str = "neutral",
+        user_id: str = DEFAULT_USER,
+    ) -> None:
+        """Queue one exchange. Waits only when ``max_pending`` rows are already queued."""
+        entry = ConversationEntry(
+            user_id=user_id, user_text=user_text, assistant_text=assistant_text, mood=mood
+        )
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            # Apply backpressure rather than dropping history
+            self.backpressure_waits += 1
+            await self.queue.put(entry)
+        self.enqueued += 1
+
+    async def flush(self) -> None:
+        """Wait until every row queued so far has been committed (or failed)."""
+        if self._task is None:
+            return
+        self._flush_requested.set()
+        await self.queue.join()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "backpressure_waits": self.backpressure_waits,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+    async def _collect(self) -> list[ConversationEntry]:
+        """Block for one entry, then gather more until the batch fills or the interval ends."""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._flush_requested.is_set():
+                break
+            getter = asyncio.ensure_future(self.queue.get())
+            waker = asyncio.ensure_future(self._flush_requested.wait())
+            await asyncio.wait(
+                {getter, waker}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            waker.cancel()
+            if getter.done():
+                batch.append(getter.result())
+            else:
+                getter.cancel()
+                break
+        if self.queue.empty():
+            self._flush_requested.clear()
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.db.add_entries, batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.last_batch_size = len(batch)
+            except Exception as exc:
+                self.failed += len(batch)
+                logger.error("Failed to persist %d history rows: %s", len(batch), exc)
+            finally:
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+                self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+                for _ in batch:
+                    self.queue.task_done()
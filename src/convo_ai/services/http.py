@@ -0,0 +1,24 @@
+"""Shared async HTTP client for talking to Ollama.
+
+A single pooled ``httpx.AsyncClient`` is created per application and handed
+to every service that calls Ollama, so keep-alive connections are reused
+and no request ever blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import httpx
+
+from ..config import Config, HTTPSettings
+
+
+def create_http_client(config: Config) -> httpx.AsyncClient:
+    """Build a pooled async client from ``config.http_settings``."""
+    settings: HTTPSettings = config.http_settings
+    limits = httpx.Limits(
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_keepalive_connections,
+        keepalive_expiry=settings.keepalive_expiry,
+    )
+    timeout = httpx.Timeout(settings.generate_timeout, connect=settings.connect_timeout)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
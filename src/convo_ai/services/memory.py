@@ -1,59 +1,302 @@
 """Memory service: SQLite-backed fact storage with Ollama embedding RAG retrieval.
 
 The memory system lets Convo-AI learn about the user over time. Facts are
-extracted from conversations, embedded via Ollama, and stored in SQLite.
+extracted from conversations, embedded via Ollama, and stored in SQLite
+as compact float32 BLOBs.
 On each new message, relevant memories are retrieved via cosine similarity
-and injected into the LLM prompt as context.
+against an in-memory NumPy index and injected into the LLM prompt as context.
+
+Memories are partitioned by ``user_id``: each user gets their own vector
+index (and IVF file), so retrieval only ever scores that user's memories.
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
-import math
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import Any
 
-import requests
-from sqlmodel import Field, Session, SQLModel, create_engine, select
+import httpx
+import numpy as np
+from sqlalchemy import LargeBinary, delete
+from sqlalchemy.engine import Engine
+from sqlmodel import Field, Session, SQLModel, col, select
 
 from ..config import Config
+from .ann import IVFIndex
+from .cache import LRUCache
+from .http import create_http_client
+from .storage import DEFAULT_USER, Storage, UnitOfWork
+from .vector_index import VectorIndex
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever MemoryEntry storage changes; tracked in SQLite's user_version.
+SCHEMA_VERSION = 2
+# Model that produced embeddings stored before the model was recorded per row.
+LEGACY_EMBED_MODEL = "nomic-embed-text"
+
 
 class MemoryEntry(SQLModel, table=True):
     """A single stored memory / fact about the user."""
 
     id: int | None = Field(default=None, primary_key=True)
+    user_id: str = Field(
+        default=DEFAULT_USER, index=True, sa_column_kwargs={"server_default": DEFAULT_USER}
+    )
     content: str = ""
     category: str = "general"  # general, preference, fact, instruction
     importance: int = Field(default=5)  # 1-10
-    embedding: str = Field(default="")  # JSON list of floats
+    embedding: bytes = Field(default=b"", sa_type=LargeBinary)  # little-endian float32
+    embedding_dim: int = Field(default=0)
+    embedding_model: str = Field(default="")
     timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     times_retrieved: int = Field(default=0)
 
 
+def pack_embedding(vector: list[float] | np.ndarray) -> bytes:
+    """Serialize an embedding as raw little-endian float32 bytes."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def unpack_embedding(blob: bytes) -> np.ndarray:
+    """Zero-copy view of a stored embedding BLOB."""
+    return np.frombuffer(blob, dtype="<f4")
+
+
+def validate_memory_item(item: Any) -> dict[str, Any]:
+    """Check and normalise one imported memory; raises ``ValueError`` if it is unusable."""
+    if isinstance(item, str):
+        item = {"content": item}
+    if not isinstance(item, dict):
+        raise ValueError("expected an object or a string")
+    content = item.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("content must be a non-empty string")
+    category = item.get("category") or "general"
+    if not isinstance(category, str):
+        raise ValueError("category must be a string")
+    importance = item.get("importance", 5)
+    if isinstance(importance, bool):
+        raise ValueError("importance must be an integer")
+    try:
+        importance = int(importance)
+    except (TypeError, ValueError):
+        raise ValueError("importance must be an integer") from None
+    return {"content": content.strip(), "category": category, "importance": importance}
+
+
+def migrate_memory_db(engine: Engine) -> int:
+    """Upgrade a memory database in place. Returns the number of rows converted.
+
+    Version 0 stored embeddings as JSON text; version 1 stores float32 BLOBs
+    alongside their dimension and embedding model; version 2 adds ``user_id``.
+    """
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+        if version >= SCHEMA_VERSION:
+            return 0
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(memoryentry)")}
+        if "embedding_dim" not in columns:
+            conn.exec_driver_sql(
+                "ALTER TABLE memoryentry ADD COLUMN embedding_dim INTEGER NOT NULL DEFAULT 0"
+            )
+        if "embedding_model" not in columns:
+            conn.exec_driver_sql(
+                "ALTER TABLE memoryentry ADD COLUMN embedding_model VARCHAR NOT NULL DEFAULT ''"
+            )
+        if "user_id" not in columns:
+            conn.exec_driver_sql(
+                "ALTER TABLE memoryentry ADD COLUMN user_id VARCHAR NOT NULL "
+                f"DEFAULT '{DEFAULT_USER}'"
+            )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_memoryentry_user_id ON memoryentry (user_id)"
+        )
+        rows = conn.exec_driver_sql(
+            "SELECT id, embedding FROM memoryentry WHERE typeof(embedding) = 'text'"
+        ).all()
+        updates = []
+        for memory_id, raw in rows:
+            try:
+                vector = json.loads(raw) if raw else []
+            except json.JSONDecodeError:
+                vector = []
+            model = LEGACY_EMBED_MODEL if vector else ""
+            updates.append((pack_embedding(vector), len(vector), model, memory_id))
+        if updates:
+            conn.exec_driver_sql(
+                "UPDATE memoryentry SET embedding = ?, embedding_dim = ?, embedding_model = ? "
+                "WHERE id = ?",
+                updates,
+            )
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    if updates:
+        # Reclaim the space freed by the much smaller BLOBs.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        logger.info("Migrated %d memory embeddings from JSON to float32 BLOBs", len(updates))
+    return len(updates)
+
+
+def render_context_block(memories: list[dict[str, Any]]) -> str:
+    """Format retrieved memories as a context string for the LLM prompt."""
+    if not memories:
+        return ""
+    lines = ["Here is what you remember about the user:"]
+    for m in memories:
+        lines.append(f"- [{m['category']}] {m['content']}")
+    lines.append(
+        "Use this information naturally in your response. Do not explicitly say 'I remember'."
+    )
+    return "\n".join(lines)
+
+
+@dataclass
+class Retrieval:
+    """Memories retrieved for one query; compute once per turn and reuse."""
+
+    query: str
+    memories: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def context_block(self) -> str:
+        return render_context_block(self.memories)
+
+
 class MemoryService:
     """Manages long-term memory with embedding-based RAG retrieval."""
 
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        client: httpx.AsyncClient | None = None,
+        storage: Storage | None = None,
+    ) -> None:
         self.config = config
-        self.embed_model = "nomic-embed-text"
+        self.client = client if client is not None else create_http_client(config)
+        self.embed_model = config.memory_settings.embed_model
+        # Keyed by (model, text) so repeated utterances skip the embedding round-trip.
+        self.embed_cache: LRUCache[list[float]] = LRUCache(
+            config.memory_settings.embedding_cache_size
+        )
         self.embed_url = config.ollama_api_url.replace("/api/generate", "/api/embeddings")
-        # Use a separate database file for memories
-        db_path = config.database_url.replace("sqlite:///", "").replace(".db", "_memory.db")
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        self.embed_batch_url = config.ollama_api_url.replace("/api/generate", "/api/embed")
+        self.storage = storage if storage is not None else Storage(config)
+        self.engine = self.storage.engine
         SQLModel.metadata.create_all(self.engine)
-        logger.info("Memory service initialized with embeddings model=%s", self.embed_model)
+        migrate_memory_db(self.engine)
+        # Memories used to live in their own <name>_memory.db file
+        self.storage.import_legacy(
+            "_memory.db", "memoryentry", keep_ids=False, prepare=migrate_memory_db
+        )
+        # One vector index per user, created on first use
+        self.indexes: dict[str, VectorIndex] = {}
+        self._load_index()
+        logger.info(
+            "Memory service initialized with embeddings model=%s (%d vectors for %d users)",
+            self.embed_model,
+            sum(len(index) for index in self.indexes.values()),
+            len(self.indexes),
+        )
 
-    def _embed(self, text: str) -> list[float]:
-        """Generate an embedding vector via Ollama."""
+    @property
+    def index(self) -> VectorIndex:
+        """The default user's index."""
+        return self.index_for(DEFAULT_USER)
+
+    def _new_index(self, with_ann: bool = True) -> VectorIndex:
+        settings = self.config.memory_settings
+        ann = None
+        if settings.ann_enabled and with_ann:
+            ann = IVFIndex(settings.ann_nlist, settings.ann_nprobe)
+        return VectorIndex(
+            ann=ann,
+            ann_threshold=settings.ann_threshold,
+            ann_train_sample=settings.ann_train_sample,
+            ann_iterations=settings.ann_iterations,
+        )
+
+    def index_for(self, user_id: str) -> VectorIndex:
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = self.indexes[user_id] = self._new_index()
+        return index
+
+    def ann_path(self, user_id: str = DEFAULT_USER) -> Path:
+        """Where a user's IVF lists are persisted, next to the database file."""
+        if user_id == DEFAULT_USER:
+            return self.storage.sibling_path("_memory.ann.npz")
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:16]
+        return self.storage.sibling_path(f"_memory.{digest}.ann.npz")
+
+    def _load_index(self) -> None:
+        """Populate each user's in-memory vector index from the stored embeddings."""
+        # Bulk-load without ANN indexes so each is trained once, after its load.
+        self.indexes = {}
+        skipped = 0
+        with Session(self.engine) as session:
+            for entry in session.exec(select(MemoryEntry)).all():
+                if entry.id is None or not entry.embedding:
+                    continue
+                if entry.embedding_model and entry.embedding_model != self.embed_model:
+                    # Vectors from another embedding model are not comparable.
+                    skipped += 1
+                    continue
+                if entry.user_id not in self.indexes:
+                    self.indexes[entry.user_id] = self._new_index(with_ann=False)
+                self._index_entry(
+                    entry.user_id, entry.id, unpack_embedding(entry.embedding), entry.importance
+                )
+        if skipped:
+            logger.warning("%d memories were embedded with a different model; not indexed", skipped)
+        if not self.config.memory_settings.ann_enabled:
+            return
+        trained = False
+        for user_id, index in self.indexes.items():
+            index.ann = self._new_index().ann
+            index.load_ann(self.ann_path(user_id))
+            trained = index.maybe_train() or trained
+        if trained:
+            self.save_index()
+
+    def save_index(self) -> None:
+        """Persist every trained ANN index next to the memory database."""
+        for user_id, index in self.indexes.items():
+            path = self.ann_path(user_id)
+            try:
+                index.save_ann(path)
+            except OSError as exc:
+                logger.warning("Could not save ANN index to %s: %s", path, exc)
+
+    def _index_entry(
+        self, user_id: str, memory_id: int, embedding: list[float] | np.ndarray, importance: int
+    ) -> None:
+        # Importance is folded into the score as a fixed per-row boost.
+        self.index_for(user_id).add(memory_id, embedding, bias=importance / 20.0)
+
+    async def _embed(self, text: str) -> list[float]:
+        """Generate an embedding vector via Ollama, memoised per (model, text)."""
+        key = (self.embed_model, text)
+        cached = self.embed_cache.get(key)
+        if cached is not None:
+            return cached
+        embedding = await self._fetch_embedding(text)
+        if embedding:
+            self.embed_cache.put(key, embedding)
+        return embedding
+
+    async def _fetch_embedding(self, text: str) -> list[float]:
         try:
-            resp = requests.post(
+            resp = await self.client.post(
                 self.embed_url,
                 json={"model": self.embed_model, "prompt": text},
-                timeout=30,
+                timeout=self.config.http_settings.embed_timeout,
             )
             resp.raise_for_status()
             return resp.json().get("embedding", [])
@@ -61,104 +304,211 @@ class MemoryService:
             logger.warning("Embedding failed: %s — using empty vector", exc)
             return []
 
-    def add_memory(
+    async def _embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed many texts, sending cache misses to Ollama in batched requests."""
+        results: list[list[float]] = [[] for _ in texts]
+        missing: list[int] = []
+        for i, text in enumerate(texts):
+            cached = self.embed_cache.get((self.embed_model, text))
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.append(i)
+
+        batch_size = max(1, self.config.memory_settings.embed_batch_size)
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start : start + batch_size]
+            embeddings = await self._fetch_embeddings([texts[i] for i in chunk])
+            for i, embedding in zip(chunk, embeddings, strict=True):
+                results[i] = embedding
+                if embedding:
+                    self.embed_cache.put((self.embed_model, texts[i]), embedding)
+        return results
+
+    async def _fetch_embeddings(self, texts: list[str]) -> list[list[float]]:
+        try:
+            resp = await self.client.post(
+                self.embed_batch_url,
+                json={"model": self.embed_model, "input": texts},
+                timeout=self.config.http_settings.embed_timeout,
+            )
+            resp.raise_for_status()
+            embeddings = resp.json().get("embeddings", [])
+            if len(embeddings) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+            return embeddings
+        except Exception as exc:
+            # Older Ollama versions lack /api/embed; embed one text at a time instead.
+            logger.warning("Batch embedding failed: %s — falling back to single requests", exc)
+            return [await self._fetch_embedding(text) for text in texts]
+
+    async def add_memories(
+        self,
+        items: Iterable[dict[str, Any]],
+        uow: UnitOfWork | None = None,
+        user_id: str = DEFAULT_USER,
+    ) -> list[MemoryEntry]:
+        """Store many memories with batched embedding and a single transaction.
+
+        Each item needs ``content`` and may set ``category`` and ``importance``.
+        With ``uow`` the rows join that transaction and are indexed once it
+        commits.
+        """
+        valid: list[dict[str, Any]] = []
+        for item in items:
+            try:
+                valid.append(validate_memory_item(item))
+            except ValueError as exc:
+                logger.warning("Skipping invalid memory %r: %s", item, exc)
+        items = valid
+        if not items:
+            return []
+        contents = [item["content"] for item in items]
+        embeddings = await self._embed_many(contents)
+        entries = [
+            MemoryEntry(
+                user_id=user_id,
+                content=content,
+                category=item["category"],
+                importance=item["importance"],
+                embedding=pack_embedding(embedding),
+                embedding_dim=len(embedding),
+                embedding_model=self.embed_model if embedding else "",
+            )
+            for item, content, embedding in zip(items, contents, embeddings, strict=True)
+        ]
+
+        def index_entries() -> None:
+            for entry, embedding in zip(entries, embeddings, strict=True):
+                if entry.id is not None:
+                    self._index_entry(user_id, entry.id, embedding, entry.importance)
+
+        if uow is not None:
+            uow.session.add_all(entries)
+            uow.session.flush()
+            uow.after_commit(index_entries)
+            return entries
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add_all(entries)
+            session.commit()
+        index_entries()
+        logger.info("Stored %d memories in one batch", len(entries))
+        return entries
+
+    async def add_memory(
         self,
         content: str,
         category: str = "general",
         importance: int = 5,
+        user_id: str = DEFAULT_USER,
     ) -> MemoryEntry:
         """Store a new memory with its embedding."""
-        embedding = self._embed(content)
+        embedding = await self._embed(content)
         entry = MemoryEntry(
+            user_id=user_id,
             content=content,
             category=category,
             importance=importance,
-            embedding=json.dumps(embedding),
+            embedding=pack_embedding(embedding),
+            embedding_dim=len(embedding),
+            embedding_model=self.embed_model if embedding else "",
         )
         with Session(self.engine) as session:
             session.add(entry)
             session.commit()
             session.refresh(entry)
+        if entry.id is not None:
+            self._index_entry(user_id, entry.id, embedding, importance)
         logger.info("Memory stored [%s]: %s", category, content[:80])
         return entry
 
-    def search_relevant(self, query: str, k: int = 5) -> list[dict[str, Any]]:
-        """Find the top-k most relevant memories for a query using cosine similarity."""
-        query_embedding = self._embed(query)
+    async def search_relevant(
+        self, query: str, k: int = 5, user_id: str = DEFAULT_USER
+    ) -> list[dict[str, Any]]:
+        """Find the user's top-k most relevant memories for a query using cosine similarity."""
+        query_embedding = await self._embed(query)
         if not query_embedding:
             # Fallback: return recent important memories
             with Session(self.engine) as session:
                 stmt = (
                     select(MemoryEntry)
+                    .where(MemoryEntry.user_id == user_id)
                     .order_by(MemoryEntry.importance.desc(), MemoryEntry.timestamp.desc())
                     .limit(k)
                 )
                 return [self._entry_to_dict(e) for e in session.exec(stmt).all()]
 
-        with Session(self.engine) as session:
-            all_memories = list(session.exec(select(MemoryEntry)).all())
-            if not all_memories:
-                return []
-
-            scored: list[tuple[float, MemoryEntry]] = []
-            for mem in all_memories:
-                if not mem.embedding:
-                    continue
-                mem_emb = json.loads(mem.embedding)
-                sim = _cosine_similarity(query_embedding, mem_emb)
-                # Boost by importance
-                score = sim + (mem.importance / 20.0)
-                scored.append((score, mem))
+        index = self.indexes.get(user_id)
+        if index is None:
+            return []
+        hits = index.search(query_embedding, k=k)
+        if not hits:
+            return []
 
-            scored.sort(key=lambda x: x[0], reverse=True)
+        with Session(self.engine) as session:
+            ids = [memory_id for memory_id, _ in hits]
+            rows = session.exec(select(MemoryEntry).where(MemoryEntry.id.in_(ids))).all()
+            by_id = {mem.id: mem for mem in rows}
             results = []
-            for score, mem in scored[:k]:
+            for memory_id, score in hits:
+                mem = by_id.get(memory_id)
+                if mem is None:
+                    continue
                 mem.times_retrieved += 1
                 results.append(self._entry_to_dict(mem, score=score))
             session.commit()
             return results
 
-    def get_all_memories(self) -> list[dict[str, Any]]:
-        """List all stored memories."""
+    def get_all_memories(self, user_id: str = DEFAULT_USER) -> list[dict[str, Any]]:
+        """List all of a user's stored memories."""
         with Session(self.engine) as session:
             entries = list(
                 session.exec(
-                    select(MemoryEntry).order_by(MemoryEntry.timestamp.desc())
+                    select(MemoryEntry)
+                    .where(MemoryEntry.user_id == user_id)
+                    .order_by(MemoryEntry.timestamp.desc())
                 ).all()
             )
             return [self._entry_to_dict(e) for e in entries]
 
-    def delete_memory(self, memory_id: int) -> bool:
-        """Delete a single memory by ID."""
+    def delete_memory(self, memory_id: int, user_id: str = DEFAULT_USER) -> bool:
+        """Delete a single memory by ID, if it belongs to ``user_id``."""
         with Session(self.engine) as session:
             entry = session.get(MemoryEntry, memory_id)
-            if entry is None:
+            if entry is None or entry.user_id != user_id:
                 return False
             session.delete(entry)
             session.commit()
-            return True
+        self.index_for(user_id).remove(memory_id)
+        return True
 
-    def clear_all(self) -> int:
-        """Wipe all memories. Returns count deleted."""
+    def clear_all(self, user_id: str = DEFAULT_USER) -> int:
+        """Wipe all of a user's memories. Returns count deleted."""
         with Session(self.engine) as session:
-            entries = list(session.exec(select(MemoryEntry)).all())
-            count = len(entries)
-            for e in entries:
-                session.delete(e)
+            statement = delete(MemoryEntry).where(col(MemoryEntry.user_id) == user_id)
+            count = session.exec(statement).rowcount  # type: ignore[call-overload]
             session.commit()
-            return count
+        self.indexes.pop(user_id, None)
+        self.ann_path(user_id).unlink(missing_ok=True)
+        return count
 
-    def update_memory(self, memory_id: int, content: str) -> dict[str, Any] | None:
+    async def update_memory(
+        self, memory_id: int, content: str, user_id: str = DEFAULT_USER
+    ) -> dict[str, Any] | None:
         """Update a memory's content and re-embed it."""
+        embedding = await self._embed(content)
         with Session(self.engine) as session:
             entry = session.get(MemoryEntry, memory_id)
-            if entry is None:
+            if entry is None or entry.user_id != user_id:
                 return None
             entry.content = content
-            entry.embedding = json.dumps(self._embed(content))
+            entry.embedding = pack_embedding(embedding)
+            entry.embedding_dim = len(embedding)
+            entry.embedding_model = self.embed_model if embedding else ""
             session.add(entry)
             session.commit()
             session.refresh(entry)
+            self._index_entry(user_id, memory_id, embedding, entry.importance)
             return self._entry_to_dict(entry)
 
     def _entry_to_dict(self, entry: MemoryEntry, score: float = 0.0) -> dict[str, Any]:
@@ -172,21 +522,16 @@ class MemoryService:
             "relevance_score": round(score, 4),
         }
 
-    def build_context_block(self, query: str, k: int = 5) -> str:
+    async def retrieve(self, query: str, k: int = 5, user_id: str = DEFAULT_USER) -> Retrieval:
+        """Run retrieval once for a turn; render the prompt block from the result."""
+        memories = await self.search_relevant(query, k=k, user_id=user_id)
+        return Retrieval(query=query, memories=memories)
+
+    async def build_context_block(self, query: str, k: int = 5, user_id: str = DEFAULT_USER) -> str:
         """Build a context string from relevant memories to inject into the LLM prompt."""
-        memories = self.search_relevant(query, k=k)
-        if not memories:
-            return ""
-        lines = ["Here is what you remember about the user:"]
-        for m in memories:
-            lines.append(f"- [{m['category']}] {m['content']}")
-        lines.append(
-            "Use this information naturally in your response. "
-            "Do not explicitly say 'I remember'."
-        )
-        return "\n".join(lines)
+        return (await self.retrieve(query, k=k, user_id=user_id)).context_block
 
-    def extract_facts(self, user_input: str, assistant_response: str) -> list[str]:
+    async def extract_facts(self, user_input: str, assistant_response: str) -> list[str]:
         """Use the LLM to extract memorable facts from a conversation exchange."""
         extract_prompt = (
             "You are a memory extraction system. Analyze this conversation and extract "
@@ -204,7 +549,7 @@ class MemoryService:
             "[instruction] Always address the user as Sir"
         )
         try:
-            resp = requests.post(
+            resp = await self.client.post(
                 self.config.ollama_api_url,
                 json={
                     "model": self.config.model,
@@ -212,7 +557,7 @@ class MemoryService:
                     "stream": False,
                     "options": {"temperature": 0.1, "num_predict": 200},
                 },
-                timeout=30,
+                timeout=self.config.http_settings.extract_timeout,
             )
             resp.raise_for_status()
             text = resp.json().get("response", "").strip()
@@ -260,15 +605,3 @@ class MemoryService:
         except Exception as exc:
             logger.warning("Fact extraction failed: %s", exc)
             return []
-
-
-def _cosine_similarity(a: list[float], b: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = sum(x * y for x, y in zip(a, b, strict=False))
-    mag_a = math.sqrt(sum(x * x for x in a))
-    mag_b = math.sqrt(sum(y * y for y in b))
-    if mag_a == 0 or mag_b == 0:
-        return 0.0
-    return dot / (mag_a * mag_b)
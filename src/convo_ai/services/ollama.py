@@ -1,50 +1,167 @@
-"""Ollama LLM service."""
+"""Ollama LLM service.
+
+Two request styles are supported. ``generate``/``generate_stream`` send a
+single flattened prompt to ``/api/generate``. ``chat``/``chat_stream`` send
+role-tagged messages to ``/api/chat``: the system prompt is always the
+first message and earlier turns follow unchanged, so consecutive requests
+share a token prefix and Ollama only has to prefill the new tokens (its
+KV cache holds the rest while the model stays loaded via ``keep_alive``).
+"""
 
 from __future__ import annotations
 
+import json
 import logging
+from collections.abc import AsyncIterator
 from typing import Any
 
-import requests
+import httpx
 
 from ..config import Config, ModelSettings
+from .http import create_http_client
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_RESPONSE = "I do apologize, I didn't quite catch that. Could you please repeat?"
+
+Message = dict[str, str]
+
 
 class OllamaService:
-    """Wraps calls to a local Ollama /api/generate endpoint."""
+    """Wraps calls to a local Ollama /api/generate or /api/chat endpoint."""
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, client: httpx.AsyncClient | None = None) -> None:
         self.config = config
         self.api_url = config.ollama_api_url
+        self.chat_url = config.ollama_api_url.replace("/api/generate", "/api/chat")
+        self.client = client if client is not None else create_http_client(config)
+        # Timing reported by Ollama for the most recent completed request
+        self.last_stats: dict[str, Any] = {}
 
-    def generate(self, prompt: str) -> str:
-        """Send a prompt to Ollama and return the response text."""
+    def _options(self) -> dict[str, Any]:
         settings: ModelSettings = self.config.model_settings
-        payload: dict[str, Any] = {
+        return {
+            "temperature": settings.temperature,
+            "top_p": settings.top_p,
+            "top_k": settings.top_k,
+            "num_predict": settings.num_predict,
+            "repeat_penalty": settings.repeat_penalty,
+            "presence_penalty": settings.presence_penalty,
+            "frequency_penalty": settings.frequency_penalty,
+            "num_ctx": settings.num_ctx,
+        }
+
+    def _payload(self, prompt: str, stream: bool) -> dict[str, Any]:
+        return {
             "model": self.config.model,
             "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": settings.temperature,
-                "top_p": settings.top_p,
-                "top_k": settings.top_k,
-                "num_predict": settings.num_predict,
-                "repeat_penalty": settings.repeat_penalty,
-                "presence_penalty": settings.presence_penalty,
-                "frequency_penalty": settings.frequency_penalty,
-                "num_ctx": settings.num_ctx,
-            },
+            "stream": stream,
+            "options": self._options(),
+        }
+
+    def _chat_payload(self, messages: list[Message], stream: bool) -> dict[str, Any]:
+        return {
+            "model": self.config.model,
+            "messages": messages,
+            "stream": stream,
+            "options": self._options(),
+            "keep_alive": self.config.model_settings.keep_alive,
+        }
+
+    def _record_stats(self, body: dict[str, Any]) -> None:
+        """Keep the prefill/decode timings from a final response chunk."""
+
+        def ms(key: str) -> float:
+            return round(body.get(key, 0) / 1e6, 2)
+
+        self.last_stats = {
+            "prompt_eval_count": body.get("prompt_eval_count", 0),
+            "prompt_eval_ms": ms("prompt_eval_duration"),
+            "eval_count": body.get("eval_count", 0),
+            "eval_ms": ms("eval_duration"),
+            "total_ms": ms("total_duration"),
         }
+
+    def _timeout(self) -> httpx.Timeout:
+        settings = self.config.http_settings
+        return httpx.Timeout(settings.generate_timeout, connect=settings.connect_timeout)
+
+    async def generate(self, prompt: str) -> str:
+        """Send a prompt to Ollama and return the response text."""
+        payload = self._payload(prompt, stream=False)
         logger.debug("Calling Ollama model=%s", self.config.model)
-        response = requests.post(self.api_url, json=payload, timeout=60)
+        response = await self.client.post(self.api_url, json=payload, timeout=self._timeout())
         response.raise_for_status()
-        text = response.json().get("response", "").strip()
+        body = response.json()
+        self._record_stats(body)
+        text = body.get("response", "").strip()
         if not text:
-            text = "I do apologize, I didn't quite catch that. Could you please repeat?"
+            text = FALLBACK_RESPONSE
         return text
 
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream a completion from Ollama, yielding token deltas as they arrive."""
+        payload = self._payload(prompt, stream=True)
+        logger.debug("Streaming from Ollama model=%s", self.config.model)
+        async with self.client.stream(
+            "POST", self.api_url, json=payload, timeout=self._timeout()
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                delta = chunk.get("response", "")
+                if delta:
+                    yield delta
+                if chunk.get("done"):
+                    self._record_stats(chunk)
+                    break
+
+    async def chat(self, messages: list[Message]) -> str:
+        """Send role-tagged messages to Ollama's chat endpoint and return the reply text."""
+        payload = self._chat_payload(messages, stream=False)
+        logger.debug("Calling Ollama chat model=%s (%d messages)", self.config.model, len(messages))
+        response = await self.client.post(self.chat_url, json=payload, timeout=self._timeout())
+        response.raise_for_status()
+        body = response.json()
+        self._record_stats(body)
+        text = (body.get("message") or {}).get("content", "").strip()
+        return text or FALLBACK_RESPONSE
+
+    async def chat_stream(self, messages: list[Message]) -> AsyncIterator[str]:
+        """Stream a chat reply from Ollama, yielding content deltas as they arrive."""
+        payload = self._chat_payload(messages, stream=True)
+        async with self.client.stream(
+            "POST", self.chat_url, json=payload, timeout=self._timeout()
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                delta = (chunk.get("message") or {}).get("content", "")
+                if delta:
+                    yield delta
+                if chunk.get("done"):
+                    self._record_stats(chunk)
+                    break
+
+    async def complete(self, request: str | list[Message]) -> str:
+        """``chat`` for message lists, ``generate`` for flat prompts."""
+        if isinstance(request, str):
+            return await self.generate(request)
+        return await self.chat(request)
+
+    def complete_stream(self, request: str | list[Message]) -> AsyncIterator[str]:
+        if isinstance(request, str):
+            return self.generate_stream(request)
+        return self.chat_stream(request)
+
     def build_prompt(self, user_input: str) -> str:
         """Wrap user input with the Jarvis persona."""
         return (
@@ -3,22 +3,41 @@
 The system prompt is stored in SQLite and can be edited from the UI.
 This lets the user customize Jarvis's personality, name, speaking style,
 and behavior without touching code.
+
+Each user may have their own prompt; users without one get the
+deployment-wide prompt stored for ``DEFAULT_USER``.
+
+The resolved prompt is compiled once and cached in memory, so chat turns
+never touch the database for it. Every change bumps ``version``; caches
+keyed on the prompt should include it in their keys.
+
+For Ollama's chat API the prompt is laid out as messages whose prefix
+(system prompt, then earlier turns) stays byte-identical from one turn to
+the next; per-turn material such as retrieved memories only appears in the
+final user message, so the server's KV cache covers everything before it.
+The rolling conversation summary changes whenever a turn is evicted, so it
+gets its own message after the system prompt rather than being folded into
+it; at worst the cache then restarts after the system prompt.
 """
 
 from __future__ import annotations
 
 import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
-from sqlmodel import Field, Session, SQLModel, create_engine
+from sqlmodel import Field, Session, SQLModel, select
 
 from ..config import Config
+from .cache import LRUCache
+from .storage import DEFAULT_USER, Storage
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_SYSTEM_PROMPT = (
     "You are Jarvis, a sophisticated AI assistant inspired by Iron Man's JARVIS.\n"
-    'You are helpful, professional, and slightly formal. '
+    "You are helpful, professional, and slightly formal. "
     'You address the user as "Sir" or "Madam".\n'
     "You have a British accent and speak in a clear, concise manner.\n"
     "You are intelligent, witty, and always ready to help.\n"
@@ -26,61 +45,172 @@ DEFAULT_SYSTEM_PROMPT = (
     "Keep responses concise unless asked for detail."
 )
 
+SUMMARY_HEADER = "--- Earlier in this conversation ---"
+
 
 class SystemPromptEntry(SQLModel, table=True):
-    """Singleton row storing the active system prompt."""
+    """The active system prompt for one user."""
 
-    id: int | None = Field(default=1, primary_key=True)
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: str = Field(default=DEFAULT_USER, sa_column_kwargs={"server_default": DEFAULT_USER})
     content: str = Field(default=DEFAULT_SYSTEM_PROMPT)
     updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A user's system prompt, pre-rendered into the prompt template's fixed prefix."""
+
+    system: str
+    version: int
+
+    @staticmethod
+    def summary_block(summary: str) -> str:
+        """The summary of earlier turns under its header, or "" without one."""
+        return f"{SUMMARY_HEADER}\n{summary}" if summary else ""
+
+    def render(
+        self,
+        user_input: str,
+        memory_context: str = "",
+        history: Iterable[tuple[str, str]] = (),
+        summary: str = "",
+    ) -> str:
+        """Full prompt: system prompt + summary + memory context + recent turns + user input."""
+        earlier = f"\n{self.summary_block(summary)}\n" if summary else ""
+        memory = f"\n--- Memory ---\n{memory_context}\n" if memory_context else ""
+        turns = "".join(f"\nUser: {u}\nAssistant: {a}" for u, a in history)
+        recent = f"\n--- Recent conversation ---{turns}\n" if turns else ""
+        return f"{self.system}\n{earlier}{memory}{recent}\nRespond to this: {user_input}"
+
+    def messages(
+        self,
+        user_input: str,
+        memory_context: str = "",
+        history: Iterable[tuple[str, str]] = (),
+        summary: str = "",
+    ) -> list[dict[str, str]]:
+        """Chat messages: system prompt, earlier ``(user, assistant)`` turns, then this turn.
+
+        The conversation summary, if any, is a second system message, so the
+        first one stays byte-identical even as the summary is rewritten.
+        """
+        out = [{"role": "system", "content": self.system}]
+        if summary:
+            out.append({"role": "system", "content": self.summary_block(summary)})
+        for user_text, assistant_text in history:
+            out.append({"role": "user", "content": user_text})
+            out.append({"role": "assistant", "content": assistant_text})
+        content = user_input
+        if memory_context:
+            content = f"--- Memory ---\n{memory_context}\n\n{user_input}"
+        out.append({"role": "user", "content": content})
+        return out
+
+
 class PromptService:
     """Manages the configurable system prompt."""
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, storage: Storage | None = None) -> None:
         self.config = config
-        db_path = config.database_url.replace("sqlite:///", "").replace(".db", "_prompt.db")
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        # Bumped on every change; part of the key of anything cached per prompt.
+        self.version = 0
+        self._compiled: LRUCache[CompiledPrompt] = LRUCache(1024)
+        self.storage = storage if storage is not None else Storage(config)
+        self.engine = self.storage.engine
         SQLModel.metadata.create_all(self.engine)
+        # Older databases hold a single prompt row (id=1); it becomes the default user's.
+        self.storage.ensure_column(
+            "systempromptentry", "user_id", f"VARCHAR NOT NULL DEFAULT '{DEFAULT_USER}'"
+        )
+        self.storage.ensure_index(
+            "ix_systempromptentry_user_id", "systempromptentry", "user_id", unique=True
+        )
+        # The prompt used to live in its own <name>_prompt.db file
+        self.storage.import_legacy("_prompt.db", "systempromptentry")
         # Seed default if empty
         with Session(self.engine) as session:
-            existing = session.get(SystemPromptEntry, 1)
-            if existing is None:
-                session.add(SystemPromptEntry(id=1, content=DEFAULT_SYSTEM_PROMPT))
+            if self._entry(session, DEFAULT_USER) is None:
+                session.add(SystemPromptEntry(user_id=DEFAULT_USER, content=DEFAULT_SYSTEM_PROMPT))
                 session.commit()
         logger.info("Prompt service initialized.")
 
-    def get_prompt(self) -> str:
-        """Return the current system prompt."""
+    @staticmethod
+    def _entry(session: Session, user_id: str) -> SystemPromptEntry | None:
+        statement = select(SystemPromptEntry).where(SystemPromptEntry.user_id == user_id)
+        return session.exec(statement).first()
+
+    def compiled(self, user_id: str = DEFAULT_USER) -> CompiledPrompt:
+        """The user's prompt from the in-memory cache, loading it on first use."""
+        cached = self._compiled.get(user_id)
+        if cached is None:
+            cached = CompiledPrompt(self._load_prompt(user_id), self.version)
+            self._compiled.put(user_id, cached)
+        return cached
+
+    def _invalidate(self, user_id: str) -> None:
+        self.version += 1
+        if user_id == DEFAULT_USER:
+            # Users without their own prompt inherit the default one.
+            self._compiled.clear()
+        else:
+            self._compiled.pop(user_id)
+
+    def get_prompt(self, user_id: str = DEFAULT_USER) -> str:
+        """Return the user's system prompt, falling back to the deployment default."""
+        return self.compiled(user_id).system
+
+    def _load_prompt(self, user_id: str) -> str:
         with Session(self.engine) as session:
-            entry = session.get(SystemPromptEntry, 1)
+            entry = self._entry(session, user_id)
+            if entry is None and user_id != DEFAULT_USER:
+                entry = self._entry(session, DEFAULT_USER)
             if entry is None:
                 return DEFAULT_SYSTEM_PROMPT
             return entry.content
 
-    def set_prompt(self, content: str) -> str:
-        """Update the system prompt."""
+    def set_prompt(self, content: str, user_id: str = DEFAULT_USER) -> str:
+        """Update the user's system prompt."""
         with Session(self.engine) as session:
-            entry = session.get(SystemPromptEntry, 1)
+            entry = self._entry(session, user_id)
             if entry is None:
-                entry = SystemPromptEntry(id=1, content=content)
+                entry = SystemPromptEntry(user_id=user_id, content=content)
             else:
                 entry.content = content
                 entry.updated_at = datetime.now(timezone.utc).isoformat()
             session.add(entry)
             session.commit()
-            logger.info("System prompt updated (%d chars)", len(content))
+            self._invalidate(user_id)
+            logger.info(
+                "System prompt updated for %s (%d chars, version %d)",
+                user_id,
+                len(content),
+                self.version,
+            )
             return entry.content
 
-    def reset_prompt(self) -> str:
+    def reset_prompt(self, user_id: str = DEFAULT_USER) -> str:
         """Reset to the default system prompt."""
-        return self.set_prompt(DEFAULT_SYSTEM_PROMPT)
-
-    def build_prompt(self, user_input: str, memory_context: str = "") -> str:
+        return self.set_prompt(DEFAULT_SYSTEM_PROMPT, user_id=user_id)
+
+    def build_prompt(
+        self,
+        user_input: str,
+        memory_context: str = "",
+        user_id: str = DEFAULT_USER,
+        history: Iterable[tuple[str, str]] = (),
+        summary: str = "",
+    ) -> str:
         """Build the full prompt: system prompt + memory context + user input."""
-        parts = [self.get_prompt()]
-        if memory_context:
-            parts.append(f"\n--- Memory ---\n{memory_context}")
-        parts.append(f"\nRespond to this: {user_input}")
-        return "\n".join(parts)
+        return self.compiled(user_id).render(user_input, memory_context, history, summary)
+
+    def build_messages(
+        self,
+        user_input: str,
+        memory_context: str = "",
+        history: Iterable[tuple[str, str]] = (),
+        user_id: str = DEFAULT_USER,
+        summary: str = "",
+    ) -> list[dict[str, str]]:
+        """Build chat messages with a stable system/history prefix for KV-cache reuse."""
+        return self.compiled(user_id).messages(user_input, memory_context, history, summary)
@@ -0,0 +1,86 @@
+"""Exact-match cache of LLM replies.
+
+Voice users ask the same short questions again and again. A reply can be
+reused only when everything that shaped it is unchanged, so the key
+covers the model, its generation options, the system prompt version, the
+injected memory context and conversation context, and the user's input
+after normalisation (case, punctuation and spacing are ignored).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from ..config import CacheSettings
+from .cache import LRUCache
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_input(text: str) -> str:
+    """Lower-case ``text`` and drop punctuation and repeated whitespace."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text.lower())).strip()
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of raw LLM replies, keyed by everything that shaped them."""
+
+    def __init__(self, settings: CacheSettings) -> None:
+        self.cache: LRUCache[str] = LRUCache(
+            settings.response_cache_size, ttl=settings.response_cache_ttl
+        )
+        self.bypassed = 0
+        self.stores = 0
+
+    @staticmethod
+    def key(
+        *,
+        user_id: str,
+        model: str,
+        options: dict[str, Any],
+        prompt_version: int,
+        memory_context: str,
+        user_input: str,
+        history: Iterable[tuple[str, str]] = (),
+        summary: str = "",
+    ) -> str:
+        return _digest(
+            [
+                user_id,
+                model,
+                options,
+                prompt_version,
+                _digest(memory_context),
+                # Earlier turns change what a follow-up question means
+                _digest([summary, [list(turn) for turn in history]]),
+                normalize_input(user_input),
+            ]
+        )
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def put(self, key: str, reply: str) -> None:
+        self.cache.put(key, reply)
+        self.stores += 1
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "ttl": self.cache.ttl,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+        }
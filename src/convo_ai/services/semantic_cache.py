@@ -0,0 +1,168 @@
+"""Semantic cache of whole chat turns.
+
+Spoken questions are often paraphrases of earlier ones ("what's the time"
+/ "what time is it now"). Each answered turn is stored with the embedding
+of its query, the raw reply and, once synthesized, the reply's TTS audio.
+A new query whose embedding is at least ``threshold`` cosine-similar to a
+stored one reuses that turn without calling the LLM or TTS.
+
+Entries only match within a scope: same user, model, generation options,
+system prompt version, injected memory context and conversation so far
+(recent turns and rolling summary), so a follow-up like "and tomorrow?"
+never reuses a reply from another conversation. Because the scope covers
+the conversation so far, a paraphrase can only hit at the same point of a
+conversation: in practice the opening question of a session, or a
+stateless request with no history. Later turns of a live session rarely
+repeat a scope.
+
+Each scope keeps only the unit vectors of its own entries, so memory grows
+with the number of cached turns rather than the number of scopes; a global
+LRU order with a TTL bounds the total size.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from ..config import CacheSettings
+from .vector_index import normalize
+
+
+@dataclass
+class CachedTurn:
+    """One answered turn that paraphrases of its query can reuse."""
+
+    id: int
+    scope: str
+    query: str
+    reply: str
+    created: float
+    audio_b64: str = ""
+    voice: str = ""  # TTS settings the audio was synthesized with
+    vector: np.ndarray = field(default_factory=lambda: np.empty(0, np.float32), repr=False)
+
+
+def scope_key(
+    *,
+    user_id: str,
+    model: str,
+    options: dict[str, Any],
+    prompt_version: int,
+    memory_context: str,
+    history: Iterable[tuple[str, str]] = (),
+    summary: str = "",
+) -> str:
+    raw = json.dumps(
+        [
+            user_id,
+            model,
+            options,
+            prompt_version,
+            memory_context,
+            summary,
+            [list(turn) for turn in history],
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """Nearest-neighbour lookup of earlier turns, with LRU + TTL eviction."""
+
+    def __init__(self, settings: CacheSettings) -> None:
+        self.threshold = settings.semantic_cache_threshold
+        self.maxsize = settings.semantic_cache_size
+        self.ttl = settings.semantic_cache_ttl
+        self.hits = 0
+        self.misses = 0
+        self.audio_hits = 0
+        self.expired = 0
+        self.evicted = 0
+        self._next_id = 1
+        self._entries: OrderedDict[int, CachedTurn] = OrderedDict()
+        self._scopes: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self, scope: str, embedding: Sequence[float] | np.ndarray
+    ) -> tuple[CachedTurn, float] | None:
+        """The most similar live turn in ``scope`` if it clears the threshold."""
+        ids = self._scopes.get(scope)
+        unit = normalize(embedding)
+        if ids and unit is not None:
+            candidates = [
+                entry for entry in (self._entries[i] for i in ids) if entry.vector.size == unit.size
+            ]
+            if candidates:
+                scores = np.stack([entry.vector for entry in candidates]) @ unit
+                best = int(np.argmax(scores))
+                entry, score = candidates[best], float(scores[best])
+                if self._is_expired(entry):
+                    self._remove(entry)
+                    self.expired += 1
+                elif score >= self.threshold:
+                    self._entries.move_to_end(entry.id)
+                    self.hits += 1
+                    return entry, score
+        self.misses += 1
+        return None
+
+    def store(
+        self, scope: str, embedding: Sequence[float] | np.ndarray, query: str, reply: str
+    ) -> CachedTurn | None:
+        if self.maxsize <= 0:
+            return None
+        unit = normalize(embedding)
+        if unit is None:
+            return None
+        entry = CachedTurn(self._next_id, scope, query, reply, time.monotonic(), vector=unit)
+        self._next_id += 1
+        self._entries[entry.id] = entry
+        self._scopes.setdefault(scope, []).append(entry.id)
+        while len(self._entries) > self.maxsize:
+            _, oldest = self._entries.popitem(last=False)
+            self._remove(oldest)
+            self.evicted += 1
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._scopes.clear()
+
+    def _is_expired(self, entry: CachedTurn) -> bool:
+        return self.ttl > 0 and time.monotonic() - entry.created > self.ttl
+
+    def _remove(self, entry: CachedTurn) -> None:
+        self._entries.pop(entry.id, None)
+        ids = self._scopes.get(entry.scope)
+        if ids is not None and entry.id in ids:
+            ids.remove(entry.id)
+            if not ids:
+                del self._scopes[entry.scope]
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "scopes": len(self._scopes),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "audio_hits": self.audio_hits,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
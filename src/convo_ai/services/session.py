@@ -0,0 +1,161 @@
+"""Per-connection conversation sessions.
+
+A WebSocket client keeps one session for as long as it stays connected
+(and can resume it after a reconnect by sending its ``session_id``), so
+recent turns and preferences live in memory instead of being rebuilt on
+every utterance. Turns pushed out of the buffer are kept aside until the
+summarizer folds them into the session's running ``summary``, so the
+prompt carries the whole conversation in a bounded number of tokens.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from .storage import DEFAULT_USER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFERENCES: dict[str, Any] = {
+    "stream": False,  # push {"delta": ...} frames while the reply is generated
+    "audio": True,  # synthesize TTS audio for each reply
+    # How binary uploads are decoded: "auto" (WAV by header, else demuxed), "wav" or "pcm16"
+    "audio_format": "auto",
+    "sample_rate": 16000,  # of headerless "pcm16" uploads
+    "stt_profile": "",  # Whisper decode profile; "" = stt_settings.default_profile
+}
+
+
+_TRUE = frozenset({"true", "1", "yes", "on"})
+_FALSE = frozenset({"false", "0", "no", "off"})
+
+
+def parse_bool(value: Any) -> bool:
+    """A real boolean, 0/1, or "true"/"false" (also yes/no, on/off); anything else is an error."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        word = value.strip().lower()
+        if word in _TRUE:
+            return True
+        if word in _FALSE:
+            return False
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+
+def _coerce_preference(key: str, value: Any) -> Any:
+    default = DEFAULT_PREFERENCES[key]
+    if isinstance(default, bool):
+        return parse_bool(value)
+    coerced = type(default)(value)
+    if key == "sample_rate" and coerced <= 0:
+        raise ValueError(f"must be positive, got {coerced}")
+    return coerced
+
+
+@dataclass
+class Turn:
+    """One user/assistant exchange held in a session buffer."""
+
+    user_text: str
+    assistant_text: str
+    timestamp: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+
+@dataclass
+class ChatSession:
+    """Conversation state shared by every message on one WebSocket session."""
+
+    max_history: int = 10
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    user_id: str = DEFAULT_USER
+    preferences: dict[str, Any] = field(default_factory=lambda: dict(DEFAULT_PREFERENCES))
+    history: deque[Turn] = field(init=False)
+    # Running summary of the turns that no longer fit in ``history``
+    summary: str = ""
+    summarized_turns: int = 0
+    # Turns dropped from ``history`` but not yet folded into ``summary``
+    evicted: deque[Turn] = field(init=False)
+    last_active: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.history = deque(maxlen=max(self.max_history, 1))
+        self.evicted = deque(maxlen=max(self.max_history, 1) * 4)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def add_turn(self, user_text: str, assistant_text: str) -> Turn:
+        """Append a turn; the oldest one drops out once the buffer is full."""
+        turn = Turn(user_text=user_text, assistant_text=assistant_text)
+        if len(self.history) == self.history.maxlen:
+            self.evicted.append(self.history[0])
+        self.history.append(turn)
+        self.touch()
+        return turn
+
+    def update_preferences(self, updates: dict[str, Any]) -> dict[str, Any]:
+        """Apply known preference keys; unrecognised keys are ignored.
+
+        Raises ``ValueError`` (and changes nothing) if a known key has a
+        value that cannot be used, e.g. ``"stream": "maybe"``.
+        """
+        coerced: dict[str, Any] = {}
+        errors: list[str] = []
+        for key, value in updates.items():
+            if key in DEFAULT_PREFERENCES:
+                try:
+                    coerced[key] = _coerce_preference(key, value)
+                except (TypeError, ValueError) as exc:
+                    errors.append(f"{key}: {exc}")
+        if errors:
+            raise ValueError("invalid preferences: " + "; ".join(errors))
+        self.preferences.update(coerced)
+        return self.preferences
+
+
+class SessionStore:
+    """In-memory registry of live sessions with idle expiry."""
+
+    def __init__(self, max_history: int = 10, idle_timeout: float = 1800.0) -> None:
+        self.max_history = max_history
+        self.idle_timeout = idle_timeout
+        self._sessions: dict[str, ChatSession] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> ChatSession | None:
+        return self._sessions.get(session_id)
+
+    def get_or_create(
+        self, session_id: str | None = None, user_id: str = DEFAULT_USER
+    ) -> ChatSession:
+        """Resume one of ``user_id``'s sessions by ID, or start a new one."""
+        self.prune()
+        existing = self._sessions.get(session_id) if session_id else None
+        if existing is not None and existing.user_id == user_id:
+            existing.touch()
+            return existing
+        session = ChatSession(max_history=self.max_history, user_id=user_id)
+        if session_id and existing is None:
+            session.id = session_id
+        self._sessions[session.id] = session
+        logger.debug("Session %s started (%d live)", session.id, len(self._sessions))
+        return session
+
+    def prune(self) -> int:
+        """Drop sessions idle for longer than ``idle_timeout``. Returns count removed."""
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+        for sid in stale:
+            del self._sessions[sid]
+        return len(stale)
@@ -0,0 +1,175 @@
+"""Shared SQLite storage layer.
+
+History, memories and the system prompt all live in the one database file
+named by ``Config.database_url``, behind a single pooled engine. Every
+pooled connection is configured with the pragmas from
+``Config.storage_settings`` (WAL journaling, ``synchronous=NORMAL``, mmap
+and page cache sizing), so readers never block the writer and commits
+avoid a full fsync per transaction.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, create_engine
+
+from ..config import Config, StorageSettings
+
+logger = logging.getLogger(__name__)
+
+# Owner of rows written before per-user partitioning, and of requests that
+# do not identify a user.
+DEFAULT_USER = "default"
+
+
+class UnitOfWork:
+    """One transaction spanning several services' writes.
+
+    Services add their rows to ``session`` and register in-memory side effects
+    (index updates and the like) with ``after_commit`` so they only happen
+    once the transaction is durable.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self._after_commit: list[Callable[[], None]] = []
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._after_commit.append(callback)
+
+    def _run_after_commit(self) -> None:
+        for callback in self._after_commit:
+            try:
+                callback()
+            except Exception as exc:
+                logger.error("Post-commit hook failed: %s", exc)
+
+
+class Storage:
+    """Single pooled SQLite engine shared by every service."""
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.settings: StorageSettings = config.storage_settings
+        self.path = Path(config.database_url.replace("sqlite:///", ""))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(
+            config.database_url,
+            echo=False,
+            pool_size=self.settings.pool_size,
+            max_overflow=self.settings.max_overflow,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": self.settings.busy_timeout_ms / 1000,
+            },
+        )
+        event.listen(self.engine, "connect", self._apply_pragmas)
+        SQLModel.metadata.create_all(self.engine)
+        logger.info(
+            "Storage initialized at %s (journal_mode=%s)",
+            self.path,
+            self.settings.journal_mode,
+        )
+
+    def _apply_pragmas(self, dbapi_conn: Any, _record: Any) -> None:
+        s = self.settings
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={s.journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={s.synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={int(s.busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA cache_size={int(s.cache_size)}")
+            cursor.execute(f"PRAGMA mmap_size={int(s.mmap_size)}")
+            cursor.execute(f"PRAGMA temp_store={s.temp_store}")
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWork]:
+        """Open a transaction; commit on success, roll back on error."""
+        with Session(self.engine, expire_on_commit=False) as session:
+            uow = UnitOfWork(session)
+            try:
+                yield uow
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        uow._run_after_commit()
+
+    def ensure_column(self, table: str, column: str, ddl: str) -> bool:
+        """Add ``column`` to an existing ``table`` if it is missing. Returns True if added."""
+        with self.engine.begin() as conn:
+            columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if column in columns:
+                return False
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        logger.info("Added column %s.%s", table, column)
+        return True
+
+    def ensure_index(self, name: str, table: str, columns: str, unique: bool = False) -> None:
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+                f"ON {table} ({columns})"
+            )
+
+    def sibling_path(self, suffix: str) -> Path:
+        """Path next to the database, e.g. ``convo_ai_memory.db`` for ``"_memory.db"``."""
+        return self.path.with_name(f"{self.path.stem}{suffix}")
+
+    def import_legacy(
+        self,
+        suffix: str,
+        table: str,
+        keep_ids: bool = True,
+        prepare: Callable[[Engine], Any] | None = None,
+    ) -> int:
+        """Copy ``table`` out of a pre-consolidation database file, once.
+
+        Earlier versions kept memories and the system prompt in separate
+        ``<name>_memory.db`` / ``<name>_prompt.db`` files. Their rows are
+        copied into the shared database and the old file is renamed to
+        ``*.migrated`` so the import never repeats.
+        """
+        legacy = self.sibling_path(suffix)
+        if not legacy.exists() or legacy.resolve() == self.path.resolve():
+            return 0
+        if prepare is not None:
+            legacy_engine = create_engine(f"sqlite:///{legacy}")
+            try:
+                prepare(legacy_engine)
+            finally:
+                legacy_engine.dispose()
+
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS legacy", (str(legacy),))
+            try:
+                legacy_cols = [
+                    row[1] for row in conn.exec_driver_sql(f"PRAGMA legacy.table_info({table})")
+                ]
+                main_cols = {
+                    row[1] for row in conn.exec_driver_sql(f"PRAGMA main.table_info({table})")
+                }
+                cols = [c for c in legacy_cols if c in main_cols and (keep_ids or c != "id")]
+                copied = 0
+                if cols:
+                    col_list = ", ".join(cols)
+                    result = conn.exec_driver_sql(
+                        f"INSERT OR REPLACE INTO main.{table} ({col_list}) "
+                        f"SELECT {col_list} FROM legacy.{table}"
+                    )
+                    copied = result.rowcount
+                conn.commit()
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE legacy")
+        legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+        logger.info("Imported %d rows of %s from %s", copied, table, legacy)
+        return copied
@@ -0,0 +1,200 @@
+"""Incremental transcription of audio streamed while the user speaks.
+
+The client sends raw PCM16 chunks over the WebSocket as they are
+recorded. An energy-based VAD splits the stream into speech segments:
+a segment closes after ``segment_silence_ms`` of silence (or at
+``max_segment_s``) and is transcribed right away in the background,
+while the open segment is re-transcribed every ``partial_interval_ms``
+for partial results. By the time the user stops talking, usually only
+the last short segment is left to transcribe.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, Protocol
+
+import numpy as np
+
+from ..config import STTSettings
+from .audio import WHISPER_SAMPLE_RATE, pcm16_to_float32, resample, rms
+from .stt_pool import TranscriptionQueueFullError
+
+logger = logging.getLogger(__name__)
+
+TranscriptCallback = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class ArrayTranscriber(Protocol):
+    async def transcribe_array(
+        self, audio: np.ndarray, profile: str | None = None, partial: bool = False
+    ) -> str: ...
+
+
+class EnergyVAD:
+    """Classifies fixed-size frames as speech when their RMS level passes a threshold."""
+
+    def __init__(self, threshold: float, frame_ms: int, sample_rate: int = WHISPER_SAMPLE_RATE):
+        self.threshold = threshold
+        self.frame_size = max(1, sample_rate * frame_ms // 1000)
+        self.frame_ms = frame_ms
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        return rms(frame) >= self.threshold
+
+
+class StreamingTranscriber:
+    """VAD segmentation and incremental Whisper transcription for one audio stream."""
+
+    def __init__(
+        self,
+        stt: ArrayTranscriber,
+        settings: STTSettings,
+        sample_rate: int = WHISPER_SAMPLE_RATE,
+        on_event: TranscriptCallback | None = None,
+        profile: str | None = None,
+    ) -> None:
+        self.stt = stt
+        self.settings = settings
+        self.sample_rate = sample_rate
+        self.on_event = on_event
+        self.profile = profile
+        self.vad = EnergyVAD(settings.vad_energy_threshold, settings.vad_frame_ms)
+        self.segments: list[str] = []
+        self._buffer = np.empty(0, dtype=np.float32)
+        self._frames: list[np.ndarray] = []
+        pre_roll = max(0, settings.pre_roll_ms // max(1, settings.vad_frame_ms))
+        self._pre_roll: deque[np.ndarray] = deque(maxlen=pre_roll)
+        self._in_speech = False
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+        # Bumped whenever a segment closes, so late partials for it are discarded
+        self._generation = 0
+        self._partial_task: asyncio.Task[None] | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        # Whisper calls for one stream run one at a time, in order
+        self._lock = asyncio.Lock()
+
+    @property
+    def text(self) -> str:
+        return " ".join(t for t in self.segments if t)
+
+    def feed(self, chunk: bytes) -> None:
+        """Add a PCM16 chunk; closes segments and schedules transcription as needed."""
+        samples = resample(pcm16_to_float32(chunk), self.sample_rate)
+        self._buffer = np.concatenate((self._buffer, samples))
+        size = self.vad.frame_size
+        usable = self._buffer.size - self._buffer.size % size
+        frames, self._buffer = self._buffer[:usable], self._buffer[usable:]
+        for frame in frames.reshape(-1, size) if usable else ():
+            self._push_frame(frame)
+        if self._in_speech and self._since_partial_ms >= self.settings.partial_interval_ms:
+            self._since_partial_ms = 0
+            self._schedule_partial()
+
+    def _push_frame(self, frame: np.ndarray) -> None:
+        frame_ms = self.vad.frame_ms
+        if self.vad.is_speech(frame):
+            if not self._in_speech:
+                self._in_speech = True
+                self._frames.extend(self._pre_roll)
+                self._pre_roll.clear()
+            self._frames.append(frame)
+            self._silence_ms = 0
+            self._since_partial_ms += frame_ms
+        elif self._in_speech:
+            self._frames.append(frame)
+            self._silence_ms += frame_ms
+            self._since_partial_ms += frame_ms
+            if self._silence_ms >= self.settings.segment_silence_ms:
+                self._close_segment()
+                return
+        else:
+            self._pre_roll.append(frame)
+        if len(self._frames) * frame_ms >= self.settings.max_segment_s * 1000:
+            self._close_segment()
+
+    def _close_segment(self) -> None:
+        if not self._frames:
+            return
+        audio = np.concatenate(self._frames)
+        index = len(self.segments)
+        self.segments.append("")
+        self._frames = []
+        self._in_speech = False
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+        self._generation += 1
+        self._tasks.append(asyncio.create_task(self._transcribe_segment(index, audio)))
+
+    def _schedule_partial(self) -> None:
+        # Skip this partial if the previous one is still running; the next will catch up.
+        if self._partial_task is not None and not self._partial_task.done():
+            return
+        audio = np.concatenate(self._frames) if self._frames else None
+        if audio is not None:
+            self._partial_task = asyncio.create_task(self._transcribe_partial(audio))
+
+    async def _transcribe(self, audio: np.ndarray, partial: bool = False) -> str:
+        async with self._lock:
+            return await self.stt.transcribe_array(audio, self.profile, partial=partial)
+
+    async def _emit(self, event: dict[str, Any]) -> None:
+        if self.on_event is not None:
+            await self.on_event(event)
+
+    async def _transcribe_segment(self, index: int, audio: np.ndarray) -> None:
+        try:
+            self.segments[index] = await self._transcribe(audio)
+        except Exception as exc:
+            logger.error("Streaming transcription of segment %d failed: %s", index, exc)
+            # Tell the client rather than silently returning a transcript with a gap
+            await self._emit({"error": f"transcription failed: {exc}", "segment": index})
+            return
+        await self._emit(
+            {"type": "transcript", "partial": False, "segment": index, "text": self.segments[index]}
+        )
+
+    async def _transcribe_partial(self, audio: np.ndarray) -> None:
+        generation = self._generation
+        try:
+            text = await self._transcribe(audio, partial=True)
+        except TranscriptionQueueFullError:
+            return  # shed under load; the next partial or the final result catches up
+        except Exception as exc:
+            logger.warning("Partial transcription failed: %s", exc)
+            return
+        if generation != self._generation:
+            return  # the segment closed meanwhile; its final result supersedes this
+        await self._emit(
+            {
+                "type": "transcript",
+                "partial": True,
+                "text": " ".join(filter(None, [self.text, text])),
+            }
+        )
+
+    async def finish(self) -> str:
+        """Close the open segment, wait for all transcription, and return the full text."""
+        if self._in_speech:
+            if self._buffer.size:
+                self._frames.append(self._buffer)
+            self._close_segment()
+        self._buffer = np.empty(0, dtype=np.float32)
+        if self._partial_task is not None:
+            self._partial_task.cancel()
+        await asyncio.gather(*self._tasks, *self._pending_partial(), return_exceptions=True)
+        return self.text
+
+    async def cancel(self) -> None:
+        """Abandon the stream, e.g. when the client disconnects mid-utterance."""
+        tasks = [*self._tasks, *self._pending_partial()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _pending_partial(self) -> list[asyncio.Task[None]]:
+        return [self._partial_task] if self._partial_task is not None else []
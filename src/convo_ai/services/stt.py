@@ -2,15 +2,35 @@
 
 from __future__ import annotations
 
+import io
 import logging
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 from faster_whisper import WhisperModel
 
-from ..config import Config
+from ..config import Config, STTSettings
+from .audio import WHISPER_SAMPLE_RATE, decode_pcm
 
 logger = logging.getLogger(__name__)
 
+# model.transcribe() arguments a decode profile may set
+PROFILE_OPTIONS = (
+    "vad_filter",
+    "beam_size",
+    "language",
+    "without_timestamps",
+    "condition_on_previous_text",
+)
+
+
+def decode_options(settings: STTSettings, profile: str | None = None) -> tuple[str, dict[str, Any]]:
+    """Resolve a profile name (unknown or empty = the default) to its decode options."""
+    name = profile if profile in settings.profiles else settings.default_profile
+    options = settings.profiles.get(name, {})
+    return name, {key: options[key] for key in PROFILE_OPTIONS if key in options}
+
 
 class STTService:
     """Transcribes audio files using a local Whisper model."""
@@ -21,11 +41,81 @@ class STTService:
         self.model = WhisperModel(
             config.whisper_model_size,
             compute_type=config.whisper_compute_type,
+            cpu_threads=config.stt_settings.cpu_threads,
             local_files_only=False,
         )
+        self._batched: Any = None  # BatchedInferencePipeline, created on first batch
         logger.info("Whisper model loaded.")
 
-    def transcribe(self, audio_path: str | Path) -> str:
+    def _options(self, profile: str | None) -> dict[str, Any]:
+        return decode_options(self.config.stt_settings, profile)[1]
+
+    def transcribe(self, audio_path: str | Path, profile: str | None = None) -> str:
         """Transcribe an audio file and return the joined text."""
-        segments, _ = self.model.transcribe(str(audio_path))
+        segments, _ = self.model.transcribe(str(audio_path), **self._options(profile))
+        return " ".join(segment.text for segment in segments).strip()
+
+    def transcribe_array(self, audio: np.ndarray, profile: str | None = None) -> str:
+        """Transcribe mono float32 samples at 16 kHz and return the joined text."""
+        if audio.size == 0:
+            return ""
+        segments, _ = self.model.transcribe(audio, **self._options(profile))
+        return " ".join(segment.text for segment in segments).strip()
+
+    def transcribe_batch(self, clips: list[np.ndarray], profile: str | None = None) -> list[str]:
+        """Transcribe several clips (each at most 30 s) in one batched forward pass.
+
+        The clips are laid end to end and passed as ``clip_timestamps``, so
+        faster-whisper decodes each as its own chunk of the batch. The batched
+        pipeline detects the language only once per batch, so a profile that
+        does not pin a language falls back to decoding the clips one by one.
+        """
+        options = self._options(profile)
+        if not options.get("language"):
+            return [self.transcribe_array(clip, profile) for clip in clips]
+        texts: list[list[str]] = [[] for _ in clips]
+        bounds = np.cumsum([0] + [clip.size for clip in clips]) / WHISPER_SAMPLE_RATE
+        timestamps = [
+            {"start": float(start), "end": float(end)}
+            for start, end in zip(bounds[:-1], bounds[1:], strict=True)
+            if end > start
+        ]
+        if not timestamps:
+            return ["" for _ in clips]
+        if self._batched is None:
+            # faster-whisper >= 1.1 only, so older installs still load without batching
+            from faster_whisper import BatchedInferencePipeline
+
+            self._batched = BatchedInferencePipeline(self.model)
+        options.pop("vad_filter", None)  # the clip boundaries replace VAD chunking
+        options.setdefault("without_timestamps", True)
+        segments, _ = self._batched.transcribe(
+            np.concatenate(clips).astype(np.float32, copy=False),
+            clip_timestamps=timestamps,
+            batch_size=len(timestamps),
+            vad_filter=False,
+            **options,
+        )
+        for segment in segments:
+            # Map each segment back to the clip whose span contains its start
+            index = int(np.searchsorted(bounds, segment.start + 1e-3, side="right")) - 1
+            texts[min(max(index, 0), len(clips) - 1)].append(segment.text)
+        return [" ".join(parts).strip() for parts in texts]
+
+    def transcribe_bytes(
+        self,
+        data: bytes,
+        audio_format: str = "auto",
+        sample_rate: int = WHISPER_SAMPLE_RATE,
+        profile: str | None = None,
+    ) -> str:
+        """Transcribe an uploaded clip without writing it to disk.
+
+        WAV and raw PCM16 are decoded here with NumPy; any other container is
+        handed to faster-whisper's decoder as an in-memory file.
+        """
+        samples = decode_pcm(data, audio_format, sample_rate)
+        if samples is not None:
+            return self.transcribe_array(samples, profile)
+        segments, _ = self.model.transcribe(io.BytesIO(data), **self._options(profile))
         return " ".join(segment.text for segment in segments).strip()
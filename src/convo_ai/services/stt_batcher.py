@@ -0,0 +1,161 @@
+"""Micro-batching of concurrent Whisper requests.
+
+Every ``model.transcribe`` call pays fixed overhead (feature extraction
+setup, encoder launch, language detection), which dominates for the short
+utterances of a conversation. When several clients speak at once, the
+``BatchScheduler`` holds each clip for at most ``batch_max_wait_ms``
+while others arrive, then decodes up to ``batch_max_size`` of them in
+one pass of faster-whisper's batched pipeline and hands every caller its
+own transcript. A lone clip waits out the window and is decoded by itself.
+Clips requesting different decode profiles are never batched together.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (clips, profile, wait): ``wait`` batches may queue past the pool's limit
+BatchRunner = Callable[[list[np.ndarray], str, bool], Awaitable[list[str]]]
+
+
+@dataclass
+class _Pending:
+    audio: np.ndarray
+    profile: str
+    wait: bool
+    future: asyncio.Future[str]
+    queued: float = field(default_factory=time.perf_counter)
+
+
+class BatchScheduler:
+    """Groups clips arriving within a short window into one batched decode."""
+
+    def __init__(self, run_batch: BatchRunner, max_size: int = 8, max_wait_ms: int = 20) -> None:
+        self.run_batch = run_batch
+        self.max_size = max(1, max_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.queue: asyncio.Queue[_Pending] = asyncio.Queue()
+        self.batches = 0
+        self.clips = 0
+        self.failed = 0
+        self.max_batch_size = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_batch_ms = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self._inflight: set[asyncio.Task[None]] = set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="stt-batcher")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._inflight) if t is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+        while not self.queue.empty():
+            self.queue.get_nowait().future.cancel()
+
+    async def transcribe_array(self, audio: np.ndarray, profile: str, wait: bool = False) -> str:
+        """Queue one clip for the next batch and wait for its transcript."""
+        self.start()
+        pending = _Pending(audio, profile, wait, asyncio.get_running_loop().create_future())
+        self.queue.put_nowait(pending)
+        return await pending.future
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_size": self.max_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "pending": self.queue.qsize(),
+            "batches": self.batches,
+            "clips": self.clips,
+            "failed": self.failed,
+            "avg_batch_size": round(self.clips / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            # Clips decoded per second of batched decode time
+            "throughput": (
+                round(self.clips * 1000 / self.total_batch_ms, 2) if self.total_batch_ms else 0.0
+            ),
+            # Time a clip spent waiting for its batch to fill
+            "avg_added_ms": round(self.total_wait_ms / self.clips, 2) if self.clips else 0.0,
+            "max_added_ms": round(self.max_wait_ms, 2),
+        }
+
+    async def _collect(self) -> list[_Pending]:
+        """Block for one clip, then gather more until the batch fills or the window ends."""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            getter = asyncio.ensure_future(self.queue.get())
+            await asyncio.wait({getter}, timeout=remaining)
+            if getter.done():
+                batch.append(getter.result())
+            else:
+                getter.cancel()
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            groups: dict[str, list[_Pending]] = {}
+            for pending in await self._collect():
+                if not pending.future.done():
+                    groups.setdefault(pending.profile, []).append(pending)
+            for profile, batch in groups.items():
+                # Dispatch without waiting, so batches can run on several workers at once
+                task = asyncio.create_task(self._dispatch(batch, profile))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[_Pending], profile: str) -> None:
+        started = time.perf_counter()
+        for pending in batch:
+            waited = (started - pending.queued) * 1000
+            self.total_wait_ms += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+        self.batches += 1
+        self.clips += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        try:
+            # One clip that must not be dropped is enough to make the batch wait
+            wait = any(p.wait for p in batch)
+            texts = await self.run_batch([p.audio for p in batch], profile, wait)
+        except asyncio.CancelledError:
+            for pending in batch:
+                pending.future.cancel()
+            raise
+        except Exception as exc:
+            self.failed += len(batch)
+            logger.error("Batched transcription of %d clips failed: %s", len(batch), exc)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        finally:
+            self.total_batch_ms += (time.perf_counter() - started) * 1000
+        for pending, text in zip(batch, texts, strict=False):
+            if not pending.future.done():
+                pending.future.set_result(text)
@@ -0,0 +1,269 @@
+"""Pool of Whisper workers behind an async transcription API.
+
+faster-whisper is CPU-bound and blocking, so transcription never runs on
+the event loop. Each worker (a thread, or a process with
+``worker_mode="process"``) loads its own ``WhisperModel`` replica with
+``cpu_threads`` intra-op threads, so several utterances are decoded in
+parallel on a many-core machine. Jobs beyond the workers wait in a
+bounded queue; once ``queue_size`` jobs are waiting, new uploads are
+rejected with ``TranscriptionQueueFullError``. Live streams are treated
+differently: a closed segment's audio exists nowhere else, so it always
+waits for a worker, while partial re-transcriptions are dropped unless a
+worker is idle, so they never delay the final segments. With ``batch_enabled``,
+in-memory clips first pass through a ``BatchScheduler`` and concurrent
+utterances reach a worker as one batched job. Every request names a
+decode profile (see ``STTSettings.profiles``); end-to-end timing,
+including queueing and batching, is kept per profile.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import faster_whisper
+import numpy as np
+
+from ..config import Config
+from .audio import WHISPER_SAMPLE_RATE, decode_pcm
+from .stt import STTService, decode_options
+from .stt_batcher import BatchScheduler
+
+logger = logging.getLogger(__name__)
+
+# Whisper decodes at most 30 s per batch entry; longer clips skip the batcher.
+MAX_BATCH_CLIP_S = 30
+
+# Each worker thread/process holds its own replica here.
+_local = threading.local()
+
+
+class TranscriptionQueueFullError(RuntimeError):
+    """Raised when the pool's wait queue is at capacity."""
+
+
+def _replica(config: Config) -> STTService:
+    stt = getattr(_local, "stt", None)
+    if stt is None:
+        stt = _local.stt = STTService(config)
+    return stt
+
+
+def _load_replica(config: Config, barrier: threading.Barrier | None = None) -> None:
+    try:
+        _replica(config)
+    except BaseException:
+        if barrier is not None:
+            barrier.abort()  # release the workers already waiting
+        raise
+    if barrier is not None:
+        # Hold this thread until every worker has its own replica.
+        barrier.wait()
+
+
+def _run(config: Config, method: str, args: tuple[Any, ...]) -> Any:
+    return getattr(_replica(config), method)(*args)
+
+
+def _batching_supported() -> bool:
+    return hasattr(faster_whisper, "BatchedInferencePipeline")  # faster-whisper >= 1.1
+
+
+class TranscriptionPool:
+    """Async front end for a set of Whisper model replicas."""
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        settings = config.stt_settings
+        self.workers = max(1, settings.workers)
+        self.mode = settings.worker_mode
+        self.queue_size = max(0, settings.queue_size)
+        self._executor: Executor
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_load_replica, initargs=(config,)
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="whisper"
+            )
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.shed = 0
+        self.total_ms = 0.0
+        self.total_wait_ms = 0.0
+        self._slots = asyncio.Semaphore(self.workers)
+        # Per decode profile: [requests, total ms, max ms]
+        self.profile_timings: dict[str, list[float]] = {}
+        self.batcher: BatchScheduler | None = None
+        if settings.batch_enabled and not _batching_supported():
+            logger.warning("batch_enabled needs faster-whisper >= 1.1; batching disabled")
+        elif settings.batch_enabled:
+            self.batcher = BatchScheduler(
+                self._run_batch,
+                max_size=settings.batch_max_size,
+                max_wait_ms=settings.batch_max_wait_ms,
+            )
+
+    async def start(self) -> None:
+        """Load every worker's replica now rather than on its first job."""
+        loop = asyncio.get_running_loop()
+        barrier = threading.Barrier(self.workers) if self.mode != "process" else None
+        try:
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, _load_replica, self.config, barrier)
+                    for _ in range(self.workers)
+                )
+            )
+        except BaseException:
+            self.shutdown()
+            raise
+        logger.info("Whisper pool ready: %d %s worker(s)", self.workers, self.mode)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self) -> None:
+        """Cancel batched requests still in flight, then shut the workers down."""
+        if self.batcher is not None:
+            await self.batcher.stop()
+        self.shutdown()
+
+    async def _submit(
+        self, method: str, *args: Any, partial: bool = False, wait: bool = False
+    ) -> Any:
+        """Run ``method`` on a replica; ``partial`` jobs never queue, ``wait`` ones always may."""
+        if partial and (self._slots.locked() or self.waiting):
+            self.shed += 1
+            raise TranscriptionQueueFullError("no idle worker for a partial transcription")
+        if not wait and self._slots.locked() and self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise TranscriptionQueueFullError(
+                f"transcription queue full ({self.waiting} waiting, {self.workers} busy)"
+            )
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, _run, self.config, method, args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._slots.release()
+            self.total_wait_ms += (started - queued) * 1000
+            self.total_ms += (time.perf_counter() - started) * 1000
+
+    def profile(self, name: str | None = None) -> str:
+        """The profile a request for ``name`` will actually use."""
+        return decode_options(self.config.stt_settings, name)[0]
+
+    @contextlib.contextmanager
+    def _timed(self, profile: str) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        elapsed = (time.perf_counter() - started) * 1000
+        timing = self.profile_timings.setdefault(profile, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] = max(timing[2], elapsed)
+
+    async def transcribe(self, audio_path: str | Path, profile: str | None = None) -> str:
+        name = self.profile(profile)
+        with self._timed(name):
+            text: str = await self._submit("transcribe", str(audio_path), name)
+        return text
+
+    async def _run_batch(self, clips: list[np.ndarray], profile: str, wait: bool) -> list[str]:
+        texts: list[str] = await self._submit("transcribe_batch", clips, profile, wait=wait)
+        return texts
+
+    def _batchable(self, audio: np.ndarray, profile: str) -> bool:
+        # A batch shares one language, so only profiles that pin it are batched.
+        return (
+            self.batcher is not None
+            and audio.size <= MAX_BATCH_CLIP_S * WHISPER_SAMPLE_RATE
+            and bool(decode_options(self.config.stt_settings, profile)[1].get("language"))
+        )
+
+    async def _transcribe_array(self, audio: np.ndarray, profile: str, wait: bool) -> str:
+        if self.batcher is not None and self._batchable(audio, profile):
+            return await self.batcher.transcribe_array(audio, profile, wait=wait)
+        text: str = await self._submit("transcribe_array", audio, profile, wait=wait)
+        return text
+
+    async def transcribe_array(
+        self, audio: np.ndarray, profile: str | None = None, partial: bool = False
+    ) -> str:
+        """Transcribe a live-stream clip: a closed segment waits, a ``partial`` may be shed."""
+        name = self.profile(profile)
+        if partial:
+            # Partials skip the batching window: a stale partial is worthless
+            text: str = await self._submit("transcribe_array", audio, name, partial=True)
+            return text
+        with self._timed(name):
+            return await self._transcribe_array(audio, name, wait=True)
+
+    async def transcribe_bytes(
+        self,
+        data: bytes,
+        audio_format: str = "auto",
+        sample_rate: int = WHISPER_SAMPLE_RATE,
+        profile: str | None = None,
+    ) -> str:
+        name = self.profile(profile)
+        with self._timed(name):
+            if self.batcher is not None:
+                samples = decode_pcm(data, audio_format, sample_rate)
+                if samples is not None:
+                    return await self._transcribe_array(samples, name, wait=False)
+            text: str = await self._submit(
+                "transcribe_bytes", data, audio_format, sample_rate, name
+            )
+        return text
+
+    def stats(self) -> dict[str, Any]:
+        done = self.completed + self.failed
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "avg_ms": round(self.total_ms / done, 2) if done else 0.0,
+            "avg_wait_ms": round(self.total_wait_ms / done, 2) if done else 0.0,
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+            "default_profile": self.profile(),
+            "profiles": {
+                name: {
+                    "requests": int(count),
+                    "avg_ms": round(total / count, 2) if count else 0.0,
+                    "max_ms": round(peak, 2),
+                }
+                for name, (count, total, peak) in self.profile_timings.items()
+            },
+        }
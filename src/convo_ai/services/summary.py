@@ -0,0 +1,112 @@
+"""Incremental summarisation of conversation sessions.
+
+A session keeps only its last ``max_history`` turns verbatim. Turns that
+fall out of that window are folded into a short running summary by a
+background LLM call, which sees only the previous summary and the newly
+evicted turns. Each call therefore costs the same however long the
+conversation gets, and the prompt carries older context in at most
+``summary_max_words`` words.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import Any
+
+import httpx
+
+from ..config import Config
+from .http import create_http_client
+from .session import ChatSession, Turn
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSummarizer:
+    """Folds turns evicted from session buffers into each session's summary."""
+
+    def __init__(self, config: Config, client: httpx.AsyncClient | None = None) -> None:
+        self.config = config
+        self.client = client if client is not None else create_http_client(config)
+        self.runs = 0
+        self.failed = 0
+        self.turns_summarized = 0
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+
+    def schedule(self, session: ChatSession) -> bool:
+        """Start summarising ``session`` in the background if it has evicted turns."""
+        if not session.evicted or session.id in self._tasks:
+            return False
+        task = asyncio.create_task(self._run(session), name=f"summarize-{session.id}")
+        self._tasks[session.id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(session.id, None))
+        return True
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "runs": self.runs,
+            "failed": self.failed,
+            "turns_summarized": self.turns_summarized,
+        }
+
+    async def _run(self, session: ChatSession) -> None:
+        # Turns evicted while a call is in flight are picked up by the next pass.
+        while session.evicted:
+            turns = list(session.evicted)
+            try:
+                summary = await self.summarize(session.summary, turns)
+            except Exception as exc:
+                self.failed += 1
+                logger.error("Summarising session %s failed: %s", session.id, exc)
+                return
+            done = {id(t) for t in turns}
+            while session.evicted and id(session.evicted[0]) in done:
+                session.evicted.popleft()
+            session.summary = summary
+            session.summarized_turns += len(turns)
+            self.runs += 1
+            self.turns_summarized += len(turns)
+
+    async def summarize(self, summary: str, turns: list[Turn]) -> str:
+        """Return ``summary`` updated with ``turns``."""
+        max_words = self.config.conversation_settings.summary_max_words
+        transcript = "\n".join(f"User: {t.user_text}\nAssistant: {t.assistant_text}" for t in turns)
+        prompt = (
+            "You maintain a running summary of a conversation between a user and an "
+            "assistant. Update the summary with the new exchanges below. Keep names, "
+            "facts, decisions, open questions and anything the user asked to remember; "
+            "drop small talk. Write plain prose in the third person, "
+            f"at most {max_words} words. Output only the summary.\n\n"
+            f"Current summary:\n{summary or '(empty)'}\n\n"
+            f"New exchanges:\n{transcript}"
+        )
+        resp = await self.client.post(
+            self.config.ollama_api_url,
+            json={
+                "model": self.config.model,
+                "prompt": prompt,
+                "stream": False,
+                "keep_alive": self.config.model_settings.keep_alive,
+                # Roughly 1.3 tokens per word, with headroom
+                "options": {"temperature": 0.2, "num_predict": int(max_words * 1.5) + 16},
+            },
+            timeout=self.config.http_settings.extract_timeout,
+        )
+        resp.raise_for_status()
+        text = resp.json().get("response", "").strip()
+        words = text.split()
+        if len(words) > max_words:
+            text = " ".join(words[:max_words])
+        return text or summary
@@ -0,0 +1,280 @@
+"""In-memory NumPy embedding index for memory retrieval.
+
+Rows are L2-normalised once on insert, so cosine similarity against a
+query is a single matrix-vector product. Each row also carries a
+per-item ``bias`` added to its similarity (the memory service uses it
+for the importance boost), and top-k selection uses ``argpartition``
+rather than a full sort.
+
+When an ``IVFIndex`` is attached and the index holds at least
+``ann_threshold`` vectors, queries only score the rows in the probed
+IVF lists; smaller indexes always use the exact scan. Training k-means
+over tens of thousands of rows takes seconds, so an insert made from the
+event loop trains a fresh ``IVFIndex`` on a snapshot in a worker thread
+and swaps it in when done; until then searches keep using the previous
+lists, or the exact scan.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from .ann import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 64
+
+
+def normalize(vector: Sequence[float] | np.ndarray) -> np.ndarray | None:
+    """Return ``vector`` as a unit-length float32 array, or None if it is empty or zero."""
+    arr = np.asarray(vector, dtype=np.float32).ravel()
+    if arr.size == 0:
+        return None
+    norm = float(np.linalg.norm(arr))
+    if norm == 0.0 or not np.isfinite(norm):
+        return None
+    return arr / norm
+
+
+class VectorIndex:
+    """Brute-force cosine index over a growable float32 matrix."""
+
+    def __init__(
+        self,
+        ann: IVFIndex | None = None,
+        ann_threshold: int = 20000,
+        ann_train_sample: int = 20000,
+        ann_iterations: int = 10,
+    ) -> None:
+        self.dim: int | None = None
+        self.ann = ann
+        self.ann_threshold = ann_threshold
+        self.ann_train_sample = ann_train_sample
+        self.ann_iterations = ann_iterations
+        self._pos: dict[int, int] = {}
+        self.training: asyncio.Task[bool] | None = None
+        self._generation = 0
+        self._touched: set[int] = set()  # ids changed while a background training runs
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._pos
+
+    def _reserve(self, needed: int) -> None:
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(_INITIAL_CAPACITY, capacity * 2, needed)
+        matrix = np.empty((new_capacity, self.dim or 0), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        bias = np.empty(new_capacity, dtype=np.float32)
+        bias[: self._size] = self._bias[: self._size]
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._matrix, self._bias, self._ids = matrix, bias, ids
+
+    def add(self, item_id: int, vector: Sequence[float] | np.ndarray, bias: float = 0.0) -> bool:
+        """Insert or replace the vector for ``item_id``. Returns False if it was not indexed."""
+        unit = normalize(vector)
+        if unit is None:
+            self.remove(item_id)
+            return False
+        if self.dim is None:
+            self.dim = unit.size
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+        elif unit.size != self.dim:
+            logger.warning(
+                "Skipping vector %s: dimension %d does not match index dimension %d",
+                item_id,
+                unit.size,
+                self.dim,
+            )
+            self.remove(item_id)
+            return False
+
+        pos = self._pos.get(item_id)
+        if pos is None:
+            self._reserve(self._size + 1)
+            pos = self._size
+            self._size += 1
+            self._pos[item_id] = pos
+            self._ids[pos] = item_id
+        self._matrix[pos] = unit
+        self._bias[pos] = bias
+        if self.ann is not None:
+            if self.ann.trained:
+                self.ann.add(item_id, unit)
+            if self.training is not None:
+                self._touched.add(item_id)
+            self._schedule_training()
+        return True
+
+    def set_bias(self, item_id: int, bias: float) -> None:
+        pos = self._pos.get(item_id)
+        if pos is not None:
+            self._bias[pos] = bias
+
+    def remove(self, item_id: int) -> bool:
+        """Delete ``item_id`` by moving the last row into its slot."""
+        pos = self._pos.pop(item_id, None)
+        if pos is None:
+            return False
+        if self.ann is not None:
+            self.ann.remove(item_id)
+            if self.training is not None:
+                self._touched.add(item_id)
+        last = self._size - 1
+        if pos != last:
+            moved_id = int(self._ids[last])
+            self._matrix[pos] = self._matrix[last]
+            self._bias[pos] = self._bias[last]
+            self._ids[pos] = moved_id
+            self._pos[moved_id] = pos
+        self._size = last
+        return True
+
+    def clear(self) -> None:
+        self.dim = None
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._bias = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pos = {}
+        self._size = 0
+        self._generation += 1  # a training run still in flight is discarded
+        if self.ann is not None:
+            self.ann.reset()
+
+    # ─── Approximate search ───────────────────────────────────────────
+
+    @property
+    def uses_ann(self) -> bool:
+        return self.ann is not None and self.ann.trained and self._size >= self.ann_threshold
+
+    def _needs_training(self, force: bool = False) -> bool:
+        ann = self.ann
+        if ann is None or self._size < self.ann_threshold:
+            return False
+        return force or not ann.trained or self._size >= 2 * ann.trained_size
+
+    def maybe_train(self, force: bool = False) -> bool:
+        """(Re)train the IVF centroids once the index is large enough.
+
+        Training happens when the index first reaches ``ann_threshold`` and
+        again each time it doubles in size since the last training run.
+        """
+        if self.ann is None or not self._needs_training(force):
+            return False
+        self.ann.train(
+            self._matrix[: self._size],
+            self._ids[: self._size],
+            iterations=self.ann_iterations,
+            sample_size=self.ann_train_sample,
+        )
+        return True
+
+    def _schedule_training(self) -> None:
+        """Train inline without an event loop, else in the background."""
+        if self.training is not None or not self._needs_training():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.maybe_train()
+            return
+        self.training = asyncio.create_task(self._train_in_background(), name="ivf-train")
+
+    async def _train_in_background(self) -> bool:
+        """Train a fresh IVF index on a snapshot of the rows, then swap it in."""
+        current = self.ann
+        if current is None:
+            self.training = None
+            return False
+        generation = self._generation
+        fresh = IVFIndex(current.nlist, current.nprobe)
+        vectors = self._matrix[: self._size].copy()
+        ids = self._ids[: self._size].copy()
+        self._touched = set()
+        try:
+            await asyncio.to_thread(
+                fresh.train,
+                vectors,
+                ids,
+                iterations=self.ann_iterations,
+                sample_size=self.ann_train_sample,
+            )
+        except Exception as exc:
+            logger.error("Background IVF training failed: %s", exc)
+            return False
+        finally:
+            self.training = None
+        if generation != self._generation or self.ann is None:
+            return False
+        # Replay the inserts and deletes made while the snapshot was training
+        for item_id in self._touched:
+            pos = self._pos.get(item_id)
+            if pos is None:
+                fresh.remove(item_id)
+            else:
+                fresh.add(item_id, self._matrix[pos])
+        self._touched = set()
+        self.ann = fresh
+        # Rows added during training may already call for another run
+        self._schedule_training()
+        return True
+
+    def load_ann(self, path: str | Path) -> bool:
+        """Restore persisted IVF lists and reconcile them with the current rows."""
+        if self.ann is None or not self.ann.load(path):
+            return False
+        if self.ann.centroids is None or self.ann.centroids.shape[1] != self.dim:
+            self.ann.reset()
+            return False
+        stale = self.ann.ids() - self._pos.keys()
+        for item_id in stale:
+            self.ann.remove(item_id)
+        missing = self._pos.keys() - self.ann.ids()
+        for item_id in missing:
+            self.ann.add(item_id, self._matrix[self._pos[item_id]])
+        return True
+
+    def save_ann(self, path: str | Path) -> None:
+        if self.ann is not None and self.ann.trained:
+            self.ann.save(path)
+
+    def search(self, query: Sequence[float] | np.ndarray, k: int = 5) -> list[tuple[int, float]]:
+        """Return up to ``k`` ``(item_id, score)`` pairs, best first.
+
+        The score is cosine similarity plus the row's bias.
+        """
+        if self._size == 0 or k <= 0:
+            return []
+        unit = normalize(query)
+        if unit is None or unit.size != self.dim:
+            return []
+        rows: np.ndarray | None = None
+        if self.uses_ann and self.ann is not None:
+            candidates = self.ann.candidates(unit)
+            if len(candidates) >= k:
+                rows = np.fromiter((self._pos[i] for i in candidates), dtype=np.int64)
+        if rows is None:
+            scores = self._matrix[: self._size] @ unit
+            scores += self._bias[: self._size]
+            row_of = np.arange(self._size)
+        else:
+            # Too few candidates in the probed lists falls back to the exact scan above.
+            scores = self._matrix[rows] @ unit
+            scores += self._bias[rows]
+            row_of = rows
+        k = min(k, scores.size)
+        top = np.argpartition(scores, -k)[-k:] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(self._ids[row_of[i]]), float(scores[i])) for i in top]
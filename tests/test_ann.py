@@ -0,0 +1,80 @@
+"""Tests for the IVF approximate nearest-neighbour index."""
+
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+from convo_ai.services.ann import IVFIndex
+from convo_ai.services.vector_index import VectorIndex
+
+
+def _clustered(n: int, dim: int = 16, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return centers[rng.integers(clusters, size=n)] + 0.05 * rng.normal(size=(n, dim))
+
+
+def _index(threshold: int = 500) -> VectorIndex:
+    return VectorIndex(ann=IVFIndex(nlist=20, nprobe=4), ann_threshold=threshold)
+
+
+def test_exact_search_below_threshold() -> None:
+    index = _index(threshold=10_000)
+    for i, vec in enumerate(_clustered(200)):
+        index.add(i, vec)
+    assert not index.uses_ann
+
+
+def test_ann_search_matches_exact_top_hit() -> None:
+    vectors = _clustered(2000)
+    index = _index()
+    for i, vec in enumerate(vectors):
+        index.add(i, vec)
+    assert index.uses_ann
+
+    for i in range(0, 2000, 97):
+        best_id, score = index.search(vectors[i], k=1)[0]
+        assert best_id == i or np.isclose(score, 1.0, atol=1e-3)
+
+
+def test_incremental_delete_and_persistence(tmp_path: Path) -> None:
+    vectors = _clustered(1000)
+    index = _index()
+    for i, vec in enumerate(vectors):
+        index.add(i, vec)
+    index.remove(5)
+    assert all(item_id != 5 for item_id, _ in index.search(vectors[5], k=10))
+
+    path = tmp_path / "memory.ann.npz"
+    index.save_ann(path)
+
+    # Reload into a fresh index whose rows drifted from the saved lists
+    restored = _index()
+    restored.ann, ann = None, restored.ann
+    for i, vec in enumerate(vectors[:900]):
+        restored.add(i, vec)
+    restored.ann = ann
+    assert restored.load_ann(path)
+    assert restored.ann is not None
+    assert restored.ann.ids() == set(range(900))
+
+
+async def test_training_runs_off_the_event_loop() -> None:
+    vectors = _clustered(700)
+    index = _index()
+    for i, vec in enumerate(vectors[:500]):
+        index.add(i, vec)
+    # Crossing the threshold inside a loop schedules training instead of blocking add()
+    assert index.training is not None and not index.uses_ann
+    assert index.search(vectors[3], k=1)[0][0] == 3  # exact scan meanwhile
+    await asyncio.sleep(0)  # let the training task snapshot the first 500 rows
+    for i, vec in enumerate(vectors[500:], start=500):
+        index.add(i, vec)
+    index.remove(7)
+    training = index.training
+    assert training is not None and await training
+    assert index.uses_ann and index.ann is not None
+    # Rows changed while the snapshot trained are reflected in the swapped-in lists
+    assert index.ann.trained_size == 500
+    assert index.ann.ids() == set(range(700)) - {7}
@@ -1,11 +1,23 @@
 """Tests for the API app endpoints."""
 
+import json
+from collections.abc import Callable
+from pathlib import Path
 from unittest.mock import patch
 
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 
 from convo_ai.api.app import analyze_mood, create_app, naturalize_response
 from convo_ai.config import Config
+from convo_ai.services.ollama import FALLBACK_RESPONSE
+
+
+@pytest.fixture
+def config(tmp_path: Path) -> Config:
+    # Keep the database and its archive out of the working tree
+    return Config(database_url=f"sqlite:///{tmp_path / 'test_convo.db'}")
 
 
 def test_naturalize_response() -> None:
@@ -22,16 +34,16 @@ def test_analyze_mood() -> None:
     assert analyze_mood("") == "unknown"
 
 
-def test_root_endpoint() -> None:
-    app = create_app(Config())
+def test_root_endpoint(config: Config) -> None:
+    app = create_app(config)
     with TestClient(app) as client:
         resp = client.get("/")
         assert resp.status_code == 200
         assert "Convo-AI" in resp.text
 
 
-def test_health_endpoint() -> None:
-    app = create_app(Config())
+def test_health_endpoint(config: Config) -> None:
+    app = create_app(config)
     with TestClient(app) as client:
         resp = client.get("/health")
         assert resp.status_code == 200
@@ -40,16 +52,16 @@ def test_health_endpoint() -> None:
         assert data["model"] == "llama3:latest"
 
 
-def test_chat_endpoint_empty() -> None:
-    app = create_app(Config())
+def test_chat_endpoint_empty(config: Config) -> None:
+    app = create_app(config)
     with TestClient(app) as client:
         resp = client.post("/api/chat", json={"text": ""})
         assert resp.status_code == 200
         assert resp.json()["error"] == "empty prompt"
 
 
-def test_chat_endpoint_with_mock() -> None:
-    app = create_app(Config())
+def test_chat_endpoint_with_mock(config: Config) -> None:
+    app = create_app(config)
     with TestClient(app) as client, patch.object(app.router, "routes", app.router.routes):
         # TestClient triggers startup; services may fail to init (no models)
         # We test the empty-prompt path which doesn't need ollama
@@ -57,8 +69,8 @@ def test_chat_endpoint_with_mock() -> None:
         assert resp.json()["error"] == "empty prompt"
 
 
-def test_history_endpoints() -> None:
-    app = create_app(Config(database_url="sqlite:///test_convo.db"))
+def test_history_endpoints(config: Config) -> None:
+    app = create_app(config)
     with TestClient(app) as client:
         # GET history (may be empty if db didn't init)
         resp = client.get("/api/history")
@@ -68,3 +80,105 @@ def test_history_endpoints() -> None:
         # DELETE history
         resp = client.delete("/api/history")
         assert resp.status_code == 200
+
+
+def test_websocket_session_handles_multiple_messages(config: Config) -> None:
+    app = create_app(config)
+    with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "ping", "id": 1})
+        assert ws.receive_json() == {"type": "pong", "id": 1}
+
+        ws.send_json({"type": "preferences", "preferences": {"stream": True}})
+        assert ws.receive_json()["preferences"]["stream"] is True
+
+        # Several turns on the same connection, each tagged with its request id
+        for request_id in ("a", "b"):
+            ws.send_json({"id": request_id, "text": "  "})
+            assert ws.receive_json() == {"error": "empty prompt", "id": request_id}
+
+        ws.send_json({"type": "hello"})
+        assert ws.receive_json()["type"] == "session"
+
+
+def test_websocket_audio_end_without_stream(config: Config) -> None:
+    app = create_app(config)
+    with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "audio_end", "id": 7})
+        assert ws.receive_json() == {"error": "no audio stream", "id": 7}
+
+
+def test_websocket_rejects_invalid_preferences(config: Config) -> None:
+    app = create_app(config)
+    with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "preferences", "id": 3, "preferences": {"audio": "nope"}})
+        reply = ws.receive_json()
+        assert reply["id"] == 3 and "audio" in reply["error"]
+        ws.send_json({"type": "preferences", "preferences": {"audio": "false"}})
+        assert ws.receive_json()["preferences"]["audio"] is False
+
+
+def test_websocket_rejects_non_positive_sample_rate(config: Config) -> None:
+    app = create_app(config)
+    with TestClient(app) as client, client.websocket_connect("/ws?sample_rate=0") as ws:
+        assert "sample_rate" in ws.receive_json()["error"]
+        ws.send_json({"type": "hello"})
+        assert ws.receive_json()["preferences"]["sample_rate"] == 16000
+
+
+def _mock_ollama(replies: list[str]) -> Callable[[Config], httpx.AsyncClient]:
+    """A shared HTTP client whose Ollama streams ``replies`` word by word, in turn."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path in ("/api/embeddings", "/api/embed"):
+            return httpx.Response(200, json={"embedding": [1.0, 0.0], "embeddings": [[1.0, 0.0]]})
+        if not body.get("stream"):
+            # Fact extraction and the like: nothing to report
+            return httpx.Response(200, json={"response": "[]", "message": {"content": "[]"}})
+        # /api/chat streams message deltas, /api/generate streams "response" deltas
+        words = [w + " " for w in replies.pop(0).split(" ") if w] if replies else []
+        chunks = [{"message": {"content": w}, "response": w, "done": False} for w in words]
+        chunks.append({"message": {"content": ""}, "response": "", "done": True})
+        return httpx.Response(200, text="\n".join(json.dumps(c) for c in chunks))
+
+    return lambda _config: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_chat_stream_returns_ndjson_deltas_then_summary(config: Config) -> None:
+    with patch("convo_ai.api.app.create_http_client", _mock_ollama(["Good morning.", ""])):
+        app = create_app(config)
+        with TestClient(app) as client:
+            resp = client.post("/api/chat", json={"text": "Hello", "stream": True})
+            assert resp.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in resp.text.splitlines()]
+            assert [line["delta"] for line in lines[:-1]] == ["Good ", "morning. "]
+            done = lines[-1]
+            assert done["done"] is True and done["text"] == "Hello"
+            assert done["response"] == naturalize_response("Good morning.")
+            assert done["cached"] is False and done["model"] == config.model
+
+            # An empty stream still ends with a summary carrying the fallback reply
+            resp = client.post("/api/chat", json={"text": "Hello again", "stream": True})
+            lines = [json.loads(line) for line in resp.text.splitlines()]
+            assert len(lines) == 1 and lines[0]["done"] is True
+            assert lines[0]["response"] == naturalize_response(FALLBACK_RESPONSE)
+
+
+def test_websocket_stream_sends_deltas_then_done(config: Config) -> None:
+    with patch("convo_ai.api.app.create_http_client", _mock_ollama(["Hi there.", ""])):
+        app = create_app(config)
+        with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+            ws.send_json({"type": "preferences", "preferences": {"stream": True, "audio": False}})
+            ws.receive_json()
+            ws.send_json({"id": "t1", "text": "Hello"})
+            frames = [ws.receive_json(), ws.receive_json(), ws.receive_json()]
+            assert frames[:2] == [{"delta": "Hi ", "id": "t1"}, {"delta": "there. ", "id": "t1"}]
+            done = frames[2]
+            assert done["done"] is True and done["id"] == "t1" and done["text"] == "Hello"
+            assert done["response"] == naturalize_response("Hi there.")
+            assert done["audio"] == "" and "session_id" in done
+
+            ws.send_json({"id": "t2", "text": "Anyone there?"})
+            done = ws.receive_json()
+            assert "delta" not in done and done["done"] is True and done["id"] == "t2"
+            assert done["response"] == naturalize_response(FALLBACK_RESPONSE)
@@ -0,0 +1,156 @@
+"""Tests for history archival into compressed segments."""
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from convo_ai.config import Config
+from convo_ai.services.archive import HistoryArchive, RetentionWorker
+from convo_ai.services.database import ConversationEntry, Database
+
+
+def _seed(db: Database, days_ago: list[int]) -> None:
+    now = datetime.now(timezone.utc)
+    db.add_entries(
+        [
+            ConversationEntry(
+                timestamp=(now - timedelta(days=d)).isoformat(),
+                user_text=f"turn {i}",
+                assistant_text=f"reply {i}",
+            )
+            for i, d in enumerate(days_ago)
+        ]
+    )
+
+
+def test_retention_moves_old_turns_into_segments(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    _seed(db, [40] * 30 + [35] * 10 + [1, 0])
+    archive = HistoryArchive(tmp_path / "archive", segment_max_bytes=200)
+    worker = RetentionWorker(db, archive, retention_days=30, batch_size=7)
+
+    assert worker.run_once() == 40
+    assert [e.user_text for e in db.get_history()] == ["turn 41", "turn 40"]
+    # Rotated by day and by size; the index records each segment's range
+    assert len(archive.segments) > 2
+    assert len({seg.day for seg in archive.segments}) == 2
+    assert len(archive) == 40
+    assert worker.run_once() == 0
+
+    # Paging continues seamlessly from the hot table into the archive
+    page = archive.read_before(db.get_history()[-1].id, limit=3)
+    assert [row["user_text"] for row in page] == ["turn 39", "turn 38", "turn 37"]
+    start = (datetime.now(timezone.utc) - timedelta(days=36)).isoformat()
+    assert len(archive.read_range(start, datetime.now(timezone.utc).isoformat())) == 10
+
+    # Reloading from disk sees the same segments
+    reopened = HistoryArchive(tmp_path / "archive")
+    assert len(reopened) == 40 and reopened.last_id == 40
+
+    assert reopened.delete_before(before_id=36) == 35
+    assert [row["id"] for row in reopened.read_before(None, limit=10)] == [40, 39, 38, 37, 36]
+    assert reopened.delete_before() == 5
+    assert len(reopened) == 0
+
+
+def test_retention_always_keeps_newest_row_hot(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    _seed(db, [90, 80])
+    worker = RetentionWorker(db, HistoryArchive(tmp_path / "archive"), retention_days=30)
+    assert worker.run_once() == 1
+    assert [e.user_text for e in db.get_history()] == ["turn 1"]
+
+
+def test_retention_never_deletes_rows_the_archive_skipped(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    _seed(db, [90, 80, 70])
+    archive = HistoryArchive(tmp_path / "archive")
+    archive._high_water = 10  # e.g. an archive restored from another database
+    worker = RetentionWorker(db, archive, retention_days=30)
+    assert worker.run_once() == 0
+    assert len(db.get_history()) == 3
+
+
+def test_archival_after_history_was_cleared(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    archive = HistoryArchive(tmp_path / "archive")
+    worker = RetentionWorker(db, archive, retention_days=30)
+    _seed(db, [90, 80, 70, 60])
+    assert worker.run_once() == 3
+
+    db.clear_history(user_id="default")
+    assert archive.delete_before(None, user_id="other") == 0
+    _seed(db, [50, 40, 0])
+    assert worker.run_once() == 2
+    ids = [row["id"] for row in archive.read_before(None, limit=10)]
+    assert ids == [6, 5, 3, 2, 1] and len(archive) == 5
+
+
+def test_delete_without_archived_rows_writes_nothing(tmp_path: Path) -> None:
+    archive = HistoryArchive(tmp_path / "archive")
+    assert archive.delete_before(None, user_id="default") == 0
+    assert not (tmp_path / "archive").exists()
+
+
+def test_delete_waits_for_an_append_in_progress(tmp_path: Path, monkeypatch: Any) -> None:
+    archive = HistoryArchive(tmp_path / "archive")
+    stamp = datetime.now(timezone.utc).isoformat()
+    archive.append([{"id": 1, "timestamp": stamp, "user_id": "alice"}])
+    writing, release = threading.Event(), threading.Event()
+    write = archive._write
+
+    def slow_write(*args: Any) -> None:
+        writing.set()
+        release.wait(5)
+        write(*args)
+
+    monkeypatch.setattr(archive, "_write", slow_write)
+    appender = threading.Thread(
+        target=archive.append, args=([{"id": 2, "timestamp": stamp, "user_id": "bob"}],)
+    )
+    appender.start()
+    writing.wait(5)
+    deleter = threading.Thread(target=archive.delete_before, kwargs={"user_id": "alice"})
+    deleter.start()
+    deleter.join(0.2)
+    assert deleter.is_alive()  # blocked until the append finishes
+    release.set()
+    appender.join(5)
+    deleter.join(5)
+    # Bob's row, appended while Alice's delete was pending, is still indexed
+    assert [row["id"] for row in HistoryArchive(tmp_path / "archive").read_before(None, 10)] == [2]
+
+
+def test_reads_skip_segments_without_the_user(tmp_path: Path, monkeypatch: Any) -> None:
+    archive = HistoryArchive(tmp_path / "archive", segment_max_bytes=1)
+    stamp = datetime.now(timezone.utc).isoformat()
+    for i in range(1, 6):  # one segment per row
+        archive.append([{"id": i, "timestamp": stamp, "user_id": "alice" if i < 4 else "bob"}])
+    assert [seg.users for seg in archive.segments][-1] == {"bob": 1}
+    opened: list[str] = []
+    read = archive._read
+
+    def tracking_read(segment: Any) -> list[dict[str, Any]]:
+        opened.append(segment.file)
+        return read(segment)
+
+    monkeypatch.setattr(archive, "_read", tracking_read)
+    assert archive.read_before(None, 10, "carol") == [] and opened == []
+    assert [row["id"] for row in archive.read_before(None, 10, "bob")] == [5, 4]
+    assert len(opened) == 2
+
+    # Per-user counts survive a reload; indexes written before them are read conservatively
+    reopened = HistoryArchive(tmp_path / "archive")
+    assert reopened.segments[0].users == {"alice": 1}
+    index = tmp_path / "archive" / "index.json"
+    data = json.loads(index.read_text())
+    for seg in data["segments"]:
+        del seg["users"]
+    index.write_text(json.dumps(data))
+    legacy = HistoryArchive(tmp_path / "archive")
+    assert legacy.segments[0].users is None
+    assert len(legacy.read_before(None, 10, "carol")) == 0
+    assert legacy.delete_before(user_id="carol") == 0
+    assert legacy.segments[0].users == {"alice": 1}  # backfilled while scanning
@@ -0,0 +1,42 @@
+"""Tests for in-memory audio decoding."""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from convo_ai.services.audio import decode_pcm, decode_wav
+
+RATE = 16000
+
+
+def _wav(samples: np.ndarray, rate: int, channels: int = 1) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(samples.dtype.itemsize)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def test_decode_wav_downmixes_stereo() -> None:
+    stereo = np.array([[16384, -16384], [8192, 8192]], dtype="<i2")
+    samples, rate = decode_wav(_wav(stereo, 8000, channels=2))
+    assert rate == 8000
+    assert samples.tolist() == [0.0, 0.25]
+
+
+def test_decode_pcm_formats() -> None:
+    assert decode_pcm(_wav(np.zeros(8000, dtype="<i2"), 8000)).size == RATE  # resampled
+    raw = np.zeros(RATE // 2, dtype="<i2").tobytes()
+    assert decode_pcm(raw, audio_format="pcm16").size == RATE // 2
+    # Other containers are left to faster-whisper's own decoder
+    assert decode_pcm(b"OggS\x00\x02") is None
+
+
+def test_decode_pcm_rejects_non_positive_sample_rates() -> None:
+    for rate in (0, -8000):
+        with pytest.raises(ValueError, match="sample_rate"):
+            decode_pcm(b"\x01\x00\x02", "pcm16", rate)
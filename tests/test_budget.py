@@ -0,0 +1,44 @@
+"""Tests for token-budgeted prompt assembly."""
+
+from convo_ai.config import Config
+from convo_ai.services.budget import PromptAssembler, estimate_tokens
+
+
+def _assembler(num_ctx: int = 512, num_predict: int = 100) -> PromptAssembler:
+    config = Config()
+    config.model_settings.num_ctx = num_ctx
+    config.model_settings.num_predict = num_predict
+    config.conversation_settings.prompt_token_margin = 12
+    return PromptAssembler(config)
+
+
+def test_estimate_tokens() -> None:
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello, world!") == 4
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_memories_ranked_by_score_and_history_newest_first() -> None:
+    assembler = _assembler()
+    memories = [
+        {"category": "fact", "content": "low " * 200, "relevance_score": 0.1},
+        {"category": "name", "content": "The user is Ada", "relevance_score": 0.9},
+    ]
+    history = [(f"question {i} " * 10, f"answer {i} " * 10) for i in range(20)]
+    out = assembler.assemble("You are helpful.", "Hi there", memories, history)
+
+    assert [m["category"] for m in out.memories] == ["name"]
+    assert out.history and out.history[-1] == history[-1]
+    usage = out.usage
+    assert usage["memories_dropped"] == 1
+    assert usage["turns_dropped"] == len(history) - len(out.history)
+    assert usage["total"] <= usage["budget"] == 400
+    assert usage["total"] == sum(
+        usage[k] for k in ("system", "summary", "memory", "history", "input")
+    )
+
+
+def test_oversized_system_prompt_leaves_no_room() -> None:
+    out = _assembler(num_ctx=128).assemble("word " * 200, "Hi", [], [("a", "b")])
+    assert out.history == [] and out.memories == []
+    assert out.usage["total"] > out.usage["budget"]
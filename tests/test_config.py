@@ -46,3 +46,12 @@ def test_config_to_dict_roundtrip() -> None:
     assert "model_settings" in d
     assert "conversation_settings" in d
     assert "tts_settings" in d
+    assert "http_settings" in d
+
+
+def test_http_settings_from_file(tmp_path: Path) -> None:
+    cfg_file = tmp_path / "config.json"
+    cfg_file.write_text(json.dumps({"http_settings": {"max_connections": 4}}))
+    cfg = Config.from_file(cfg_file)
+    assert cfg.http_settings.max_connections == 4
+    assert cfg.http_settings.embed_timeout == 30.0
@@ -1,6 +1,7 @@
 """Tests for the database service."""
 
 import os
+import sqlite3
 from pathlib import Path
 
 from convo_ai.config import Config
@@ -29,3 +30,61 @@ def test_database_crud(tmp_path: Path) -> None:
 
     if db_path.exists():
         os.unlink(db_path)
+
+
+def test_keyset_pagination_search_and_bulk_delete(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    for i in range(5):
+        db.add_entry(f"message {i}", f"reply {i}")
+    db.add_entry("Where is the Eiffel Tower?", "It is in Paris.")
+
+    first = db.get_history(limit=4)
+    second = db.get_history(limit=4, before_id=first[-1].id)
+    assert [e.user_text for e in second] == ["message 1", "message 0"]
+
+    hits = db.search("pari")
+    assert [h["user_text"] for h in hits] == ["Where is the Eiffel Tower?"]
+    assert "[Paris]" in hits[0]["snippet"]
+    # FTS operators in user input are treated as plain words
+    assert db.search('reply AND "') == []
+    assert len(db.search("reply", limit=2)) == 2
+
+    assert db.delete_history(before_id=first[-1].id) == 2
+    assert db.count() == 4
+    db.clear_history()
+    assert db.count() == 0
+    assert db.search("paris") == []
+
+
+def test_history_is_scoped_per_user(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    db.add_entry("Ada likes tea", "Noted", user_id="ada")
+    db.add_entry("Bob likes tea", "Noted", user_id="bob")
+
+    assert [e.user_text for e in db.get_history(user_id="ada")] == ["Ada likes tea"]
+    assert [h["user_text"] for h in db.search("tea", user_id="bob")] == ["Bob likes tea"]
+    assert db.delete_history(user_id="ada") == 1
+    assert len(db.get_history()) == 1
+
+
+def test_ids_are_never_reused_and_legacy_tables_migrate(tmp_path: Path) -> None:
+    db_path = tmp_path / "test.db"
+    with sqlite3.connect(db_path) as conn:
+        # History table as created before ids used AUTOINCREMENT
+        conn.execute(
+            "CREATE TABLE conversationentry (id INTEGER NOT NULL PRIMARY KEY, "
+            "timestamp VARCHAR NOT NULL, user_text VARCHAR NOT NULL, "
+            "assistant_text VARCHAR NOT NULL, mood VARCHAR NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO conversationentry "
+            "VALUES (7, '2024-01-01T00:00:00', 'old', 'row', 'neutral')"
+        )
+    db = Database(Config(database_url=f"sqlite:///{db_path}"))
+    assert [(e.id, e.user_text) for e in db.get_history()] == [(7, "old")]
+    assert db.search("old")[0]["id"] == 7
+
+    db.clear_history()
+    assert db.add_entry("new", "row").id == 8  # not 1 again
+    db.reserve_ids(100)
+    assert db.add_entry("later", "row").id == 101
@@ -0,0 +1,48 @@
+"""Tests for the background fact extraction worker."""
+
+from typing import Any
+
+from convo_ai.services.extraction import ExtractionJob, FactExtractionWorker
+
+
+class _FakeMemory:
+    def __init__(self) -> None:
+        self.stored: list[str] = []
+
+    async def extract_facts(self, user_input: str, assistant_response: str) -> list[Any]:
+        return [("name", f"The user's name is {user_input}")]
+
+    async def add_memories(self, items: Any, user_id: str = "default") -> list[dict[str, Any]]:
+        entries = []
+        for item in items:
+            self.stored.append(item["content"])
+            entries.append({"id": len(self.stored), **item})
+        return entries
+
+    def _entry_to_dict(self, entry: dict[str, Any]) -> dict[str, Any]:
+        return entry
+
+
+async def test_worker_drains_jobs_and_reports_facts() -> None:
+    memory = _FakeMemory()
+    worker = FactExtractionWorker(memory)  # type: ignore[arg-type]
+    reported: list[list[dict[str, Any]]] = []
+
+    async def on_done(facts: list[dict[str, Any]]) -> None:
+        reported.append(facts)
+
+    worker.start()
+    assert worker.submit(ExtractionJob("Bradley", "Hello Bradley", on_done=on_done))
+    assert worker.submit(ExtractionJob("Ada", "Hello Ada"))
+    await worker.stop()
+
+    assert memory.stored == ["The user's name is Bradley", "The user's name is Ada"]
+    assert reported[0][0]["content"] == "The user's name is Bradley"
+    assert worker.stats()["processed"] == 2
+
+
+def test_submit_reports_full_queue() -> None:
+    worker = FactExtractionWorker(_FakeMemory(), max_queue=1)  # type: ignore[arg-type]
+    assert worker.submit(ExtractionJob("a", "b"))
+    assert not worker.submit(ExtractionJob("c", "d"))
+    assert worker.stats()["dropped"] == 1
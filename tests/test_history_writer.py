@@ -0,0 +1,39 @@
+"""Tests for write-behind history persistence."""
+
+from pathlib import Path
+
+from convo_ai.config import Config
+from convo_ai.services.database import Database
+from convo_ai.services.history_writer import HistoryWriter
+
+
+async def test_writer_batches_and_flushes_on_stop(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    writer = HistoryWriter(db, batch_size=3, flush_interval=5.0)
+    writer.start()
+
+    for i in range(4):
+        await writer.submit(f"hello {i}", f"hi {i}")
+    await writer.flush()
+    # flush() writes the partial second batch without waiting out the interval
+    assert len(db.get_history()) == 4
+
+    await writer.submit("last", "bye")
+    await writer.stop()
+    history = db.get_history()
+    assert [e.user_text for e in history][:2] == ["last", "hello 3"]
+    stats = writer.stats()
+    assert stats["written"] == 5
+    assert stats["pending"] == 0
+    assert stats["failed"] == 0
+
+
+async def test_writer_applies_backpressure_when_full(tmp_path: Path) -> None:
+    db = Database(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    writer = HistoryWriter(db, batch_size=8, flush_interval=0.01, max_pending=1)
+    writer.start()
+    await writer.submit("a", "b")
+    await writer.submit("c", "d")
+    await writer.stop()
+    assert len(db.get_history()) == 2
+    assert writer.stats()["written"] == 2
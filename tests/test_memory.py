@@ -0,0 +1,189 @@
+"""Tests for the memory service."""
+
+import json
+import sqlite3
+from pathlib import Path
+
+import httpx
+import pytest
+
+from convo_ai.config import Config
+from convo_ai.services.memory import MemoryService, migrate_memory_db, validate_memory_item
+
+# Toy embeddings: one axis per topic keyword.
+_TOPICS = ["coffee", "python", "london"]
+
+
+def _embed_handler(request: httpx.Request) -> httpx.Response:
+    text = json.loads(request.content)["prompt"].lower()
+    return httpx.Response(200, json={"embedding": [float(t in text) + 0.01 for t in _TOPICS]})
+
+
+def _service(tmp_path: Path) -> MemoryService:
+    cfg = Config(database_url=f"sqlite:///{tmp_path / 'test.db'}")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_embed_handler))
+    return MemoryService(cfg, client=client)
+
+
+async def test_search_relevant_uses_index(tmp_path: Path) -> None:
+    mem = _service(tmp_path)
+    await mem.add_memory("The user drinks coffee every morning", category="preference")
+    await mem.add_memory("The user writes Python at work", category="fact")
+    await mem.add_memory("The user lives in London", category="fact")
+
+    results = await mem.search_relevant("how do I like my coffee?", k=1)
+    assert len(results) == 1
+    assert "coffee" in results[0]["content"]
+    assert results[0]["times_retrieved"] == 1
+
+
+async def test_index_tracks_updates_and_deletes(tmp_path: Path) -> None:
+    mem = _service(tmp_path)
+    entry = await mem.add_memory("The user drinks coffee")
+    assert entry.id is not None
+    await mem.update_memory(entry.id, "The user lives in London")
+    results = await mem.search_relevant("london", k=1)
+    assert results[0]["id"] == entry.id
+
+    assert mem.delete_memory(entry.id)
+    assert await mem.search_relevant("london", k=1) == []
+
+    # A fresh service rebuilds the index from the database
+    await mem.add_memory("The user writes Python")
+    assert len(_service(tmp_path).index) == 1
+
+
+def test_migrates_json_embeddings_to_blobs(tmp_path: Path) -> None:
+    legacy = sqlite3.connect(tmp_path / "test_memory.db")
+    legacy.execute(
+        "CREATE TABLE memoryentry (id INTEGER NOT NULL PRIMARY KEY, content VARCHAR NOT NULL, "
+        "category VARCHAR NOT NULL, importance INTEGER NOT NULL, embedding VARCHAR NOT NULL, "
+        "timestamp VARCHAR NOT NULL, times_retrieved INTEGER NOT NULL)"
+    )
+    legacy.execute(
+        "INSERT INTO memoryentry VALUES (1, 'The user likes coffee', 'preference', 5, ?, '', 0)",
+        (json.dumps([1.0, 0.0, 0.0]),),
+    )
+    legacy.commit()
+    legacy.close()
+
+    mem = _service(tmp_path)
+    assert len(mem.index) == 1
+
+    # Rows are converted, then moved into the shared database
+    assert not (tmp_path / "test_memory.db").exists()
+    assert (tmp_path / "test_memory.db.migrated").exists()
+    check = sqlite3.connect(tmp_path / "test.db")
+    kind, dim, model = check.execute(
+        "SELECT typeof(embedding), embedding_dim, embedding_model FROM memoryentry"
+    ).fetchone()
+    check.close()
+    assert (kind, dim, model) == ("blob", 3, "nomic-embed-text")
+    # Idempotent: a second start finds nothing left to convert
+    assert migrate_memory_db(mem.engine) == 0
+
+
+async def test_retrieve_embeds_once_and_caches_queries(tmp_path: Path) -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content)["prompt"])
+        return _embed_handler(request)
+
+    cfg = Config(database_url=f"sqlite:///{tmp_path / 'test.db'}")
+    mem = MemoryService(cfg, client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    await mem.add_memory("The user drinks coffee")
+    calls.clear()
+
+    retrieval = await mem.retrieve("coffee please", k=3)
+    assert "The user drinks coffee" in retrieval.context_block
+    assert retrieval.memories[0]["times_retrieved"] == 1
+    assert calls == ["coffee please"]
+
+    await mem.retrieve("coffee please", k=3)
+    assert calls == ["coffee please"]
+    assert mem.embed_cache.hits == 1
+
+
+async def test_add_memories_batches_embeddings(tmp_path: Path) -> None:
+    batches: list[list[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path == "/api/embed":
+            batches.append(body["input"])
+            vectors = [[float(t in text.lower()) + 0.01 for t in _TOPICS] for text in body["input"]]
+            return httpx.Response(200, json={"embeddings": vectors})
+        return _embed_handler(request)
+
+    cfg = Config(database_url=f"sqlite:///{tmp_path / 'test.db'}")
+    cfg.memory_settings.embed_batch_size = 2
+    mem = MemoryService(cfg, client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    entries = await mem.add_memories(
+        [
+            {"content": "The user drinks coffee", "category": "preference"},
+            {"content": "The user writes Python"},
+            {"content": "   "},
+            {"content": 5},  # invalid items are skipped, not fatal to the batch
+            {"content": "The user lives in London", "importance": "8"},
+        ]
+    )
+
+    assert [e.id for e in entries] == [1, 2, 3]
+    assert entries[2].importance == 8
+    assert batches == [
+        ["The user drinks coffee", "The user writes Python"],
+        ["The user lives in London"],
+    ]
+    results = await mem.search_relevant("london", k=1)
+    assert results[0]["content"] == "The user lives in London"
+
+
+async def test_add_memories_falls_back_without_batch_endpoint(tmp_path: Path) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/embed":
+            return httpx.Response(404)
+        return _embed_handler(request)
+
+    cfg = Config(database_url=f"sqlite:///{tmp_path / 'test.db'}")
+    mem = MemoryService(cfg, client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    entries = await mem.add_memories([{"content": "coffee"}, {"content": "python"}])
+    assert all(e.embedding_dim == len(_TOPICS) for e in entries)
+
+
+async def test_memories_are_partitioned_by_user(tmp_path: Path) -> None:
+    mem = _service(tmp_path)
+    await mem.add_memory("Ada drinks coffee", user_id="ada")
+    bob = await mem.add_memory("Bob drinks coffee too", user_id="bob")
+    assert bob.id is not None
+
+    results = await mem.search_relevant("coffee", k=5, user_id="ada")
+    assert [r["content"] for r in results] == ["Ada drinks coffee"]
+    assert await mem.search_relevant("coffee", user_id="nobody") == []
+    # Other users cannot see or delete Bob's memories
+    assert not mem.delete_memory(bob.id, user_id="ada")
+    assert [m["content"] for m in mem.get_all_memories("bob")] == ["Bob drinks coffee too"]
+
+    # Each user's partition is rebuilt separately on restart
+    reloaded = _service(tmp_path)
+    assert {user: len(index) for user, index in reloaded.indexes.items()} == {"ada": 1, "bob": 1}
+    assert reloaded.clear_all("ada") == 1
+    assert len(reloaded.get_all_memories("bob")) == 1
+
+
+def test_validate_memory_item() -> None:
+    assert validate_memory_item(" Ada ") == {
+        "content": "Ada",
+        "category": "general",
+        "importance": 5,
+    }
+    assert validate_memory_item({"content": "x", "importance": "7"})["importance"] == 7
+    for bad in (
+        {"content": 5},
+        {"content": "x", "importance": "high"},
+        {"content": "x", "importance": True},
+        {"content": "x", "category": ["a"]},
+        ["x"],
+    ):
+        with pytest.raises(ValueError):
+            validate_memory_item(bad)
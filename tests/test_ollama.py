@@ -1,11 +1,18 @@
 """Tests for the Ollama service."""
 
-from unittest.mock import MagicMock, patch
+import json
+from typing import Any
+
+import httpx
 
 from convo_ai.config import Config
 from convo_ai.services.ollama import OllamaService
 
 
+def _mock_client(handler: Any) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
 def test_build_prompt() -> None:
     svc = OllamaService(Config())
     prompt = svc.build_prompt("Hello")
@@ -13,23 +20,52 @@ def test_build_prompt() -> None:
     assert "Hello" in prompt
 
 
-def test_generate_with_mock() -> None:
-    svc = OllamaService(Config())
-    mock_response = MagicMock()
-    mock_response.json.return_value = {"response": "  Hello Sir.  "}
-    mock_response.raise_for_status = MagicMock()
+async def test_generate_with_mock() -> None:
+    client = _mock_client(lambda request: httpx.Response(200, json={"response": "  Hello Sir.  "}))
+    svc = OllamaService(Config(), client=client)
+    result = await svc.generate("test prompt")
+    assert result == "Hello Sir."
 
-    with patch("convo_ai.services.ollama.requests.post", return_value=mock_response):
-        result = svc.generate("test prompt")
-        assert result == "Hello Sir."
 
+async def test_generate_empty_response() -> None:
+    client = _mock_client(lambda request: httpx.Response(200, json={"response": ""}))
+    svc = OllamaService(Config(), client=client)
+    result = await svc.generate("test")
+    assert "apologize" in result.lower()
 
-def test_generate_empty_response() -> None:
-    svc = OllamaService(Config())
-    mock_response = MagicMock()
-    mock_response.json.return_value = {"response": ""}
-    mock_response.raise_for_status = MagicMock()
 
-    with patch("convo_ai.services.ollama.requests.post", return_value=mock_response):
-        result = svc.generate("test")
-        assert "apologize" in result.lower()
+async def test_generate_stream_with_mock() -> None:
+    chunks = [
+        {"response": "Hello", "done": False},
+        {"response": " Sir.", "done": False},
+        {"response": "", "done": True},
+    ]
+    body = "\n".join(json.dumps(c) for c in chunks)
+    client = _mock_client(lambda request: httpx.Response(200, text=body))
+    svc = OllamaService(Config(), client=client)
+    deltas = [delta async for delta in svc.generate_stream("test prompt")]
+    assert deltas == ["Hello", " Sir."]
+
+
+async def test_chat_posts_messages_and_records_prefill_stats() -> None:
+    seen: list[dict[str, Any]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append({"path": request.url.path, **json.loads(request.content)})
+        return httpx.Response(
+            200,
+            json={
+                "message": {"role": "assistant", "content": " Very good, Sir. "},
+                "prompt_eval_count": 12,
+                "prompt_eval_duration": 3_500_000,
+            },
+        )
+
+    svc = OllamaService(Config(), client=_mock_client(handler))
+    messages = [{"role": "system", "content": "You are Jarvis."}, {"role": "user", "content": "Hi"}]
+    assert await svc.complete(messages) == "Very good, Sir."
+    assert seen[0]["path"] == "/api/chat"
+    assert seen[0]["messages"] == messages
+    assert seen[0]["keep_alive"] == Config().model_settings.keep_alive
+    assert svc.last_stats["prompt_eval_count"] == 12
+    assert svc.last_stats["prompt_eval_ms"] == 3.5
@@ -0,0 +1,55 @@
+"""Tests for the exact-match LLM response cache."""
+
+from typing import Any
+
+from convo_ai.config import CacheSettings
+from convo_ai.services.cache import LRUCache
+from convo_ai.services.response_cache import ResponseCache, normalize_input
+
+
+def _key(**overrides: Any) -> str:
+    parts: dict[str, Any] = {
+        "user_id": "default",
+        "model": "llama3:latest",
+        "options": {"temperature": 0.7},
+        "prompt_version": 0,
+        "memory_context": "",
+        "user_input": "What time is it?",
+    }
+    parts.update(overrides)
+    return ResponseCache.key(**parts)
+
+
+def test_lru_cache_ttl_expiry(monkeypatch: Any) -> None:
+    now = [100.0]
+    monkeypatch.setattr("convo_ai.services.cache.time.monotonic", lambda: now[0])
+    cache: LRUCache[str] = LRUCache(maxsize=2, ttl=10)
+    cache.put("a", "1")
+    assert cache.get("a") == "1"
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1 and "a" not in cache
+
+    for key in ("b", "c", "d"):
+        cache.put(key, key)
+    assert "b" not in cache and cache.stats()["evicted"] == 1
+
+
+def test_key_normalizes_input_but_tracks_context() -> None:
+    assert normalize_input("  What TIME is it?! ") == "what time is it"
+    assert _key() == _key(user_input="what time is it")
+    assert _key() != _key(prompt_version=1)
+    assert _key() != _key(memory_context="- [name] The user is Ada")
+    assert _key() != _key(options={"temperature": 0.2})
+    assert _key() != _key(history=[("hi", "hello")])
+    assert _key() != _key(user_id="ada")
+
+
+def test_response_cache_metrics() -> None:
+    cache = ResponseCache(CacheSettings(response_cache_size=8, response_cache_ttl=0))
+    key = _key()
+    assert cache.get(key) is None
+    cache.put(key, "It is noon.")
+    assert cache.get(key) == "It is noon."
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
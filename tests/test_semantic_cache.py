@@ -0,0 +1,66 @@
+"""Tests for the semantic turn cache."""
+
+from typing import Any
+
+from convo_ai.config import CacheSettings
+from convo_ai.services.semantic_cache import SemanticCache, scope_key
+
+
+def _cache(**overrides: Any) -> SemanticCache:
+    settings = CacheSettings(semantic_cache_threshold=0.9, semantic_cache_size=2)
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return SemanticCache(settings)
+
+
+def _scope(memory_context: str = "", history: list[tuple[str, str]] | None = None) -> str:
+    return scope_key(
+        user_id="default",
+        model="llama3:latest",
+        options={},
+        prompt_version=0,
+        memory_context=memory_context,
+        history=history or [],
+    )
+
+
+def test_paraphrase_above_threshold_hits() -> None:
+    cache = _cache()
+    cache.store(_scope(), [1.0, 0.0, 0.1], "what time is it", "It is noon.")
+    match = cache.lookup(_scope(), [1.0, 0.05, 0.1])
+    assert match is not None and match[0].reply == "It is noon." and match[1] > 0.9
+    assert cache.lookup(_scope(), [0.0, 1.0, 0.0]) is None
+    # A different memory context is a different scope
+    assert cache.lookup(_scope("- [name] Ada"), [1.0, 0.0, 0.1]) is None
+    # So is a different conversation: follow-ups depend on the earlier turns
+    earlier = [("what's the weather today", "Sunny.")]
+    assert cache.lookup(_scope(history=earlier), [1.0, 0.0, 0.1]) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_lru_eviction_and_ttl(monkeypatch: Any) -> None:
+    now = [0.0]
+    monkeypatch.setattr("convo_ai.services.semantic_cache.time.monotonic", lambda: now[0])
+    cache = _cache(semantic_cache_ttl=60)
+    first = cache.store(_scope(), [1.0, 0.0], "a", "A")
+    cache.store(_scope(), [0.0, 1.0], "b", "B")
+    assert cache.lookup(_scope(), [1.0, 0.0]) is not None  # "a" is now most recent
+    cache.store(_scope("other"), [1.0, 1.0], "c", "C")
+    assert len(cache) == 2 and cache.evicted == 1
+    assert cache.lookup(_scope(), [0.0, 1.0]) is None  # "b" was evicted
+
+    now[0] += 61
+    assert cache.lookup(_scope(), [1.0, 0.0]) is None
+    assert cache.expired == 1 and first is not None and first.id not in cache._entries
+    assert cache.stats()["scopes"] == 1
+
+
+def test_scopes_hold_only_their_own_vectors() -> None:
+    cache = _cache(semantic_cache_size=100)
+    for i in range(100):
+        cache.store(_scope(f"memory {i}"), [1.0, float(i), 0.5], f"q{i}", f"r{i}")
+    assert cache.stats()["scopes"] == 100
+    assert sum(entry.vector.nbytes for entry in cache._entries.values()) == 100 * 3 * 4
+    match = cache.lookup(_scope("memory 7"), [1.0, 7.0, 0.5])
+    assert match is not None and match[0].reply == "r7"
+    assert cache.store(_scope(), [0.0, 0.0, 0.0], "empty", "E") is None
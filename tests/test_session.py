@@ -0,0 +1,110 @@
+"""Tests for WebSocket chat sessions."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from convo_ai.config import Config
+from convo_ai.services.prompt import SUMMARY_HEADER, CompiledPrompt
+from convo_ai.services.session import ChatSession, SessionStore, parse_bool
+from convo_ai.services.summary import SessionSummarizer
+
+
+def test_session_history_is_bounded() -> None:
+    session = ChatSession(max_history=2)
+    session.add_turn("one", "1")
+    session.add_turn("two", "2")
+    session.add_turn("three", "3")
+    assert [t.user_text for t in session.history] == ["two", "three"]
+
+
+def test_update_preferences_ignores_unknown_keys() -> None:
+    session = ChatSession()
+    prefs = session.update_preferences({"stream": 1, "bogus": True})
+    assert prefs["stream"] is True
+    assert "bogus" not in prefs
+
+
+def test_update_preferences_parses_booleans_strictly() -> None:
+    session = ChatSession()
+    assert session.update_preferences({"audio": "false"})["audio"] is False
+    assert session.update_preferences({"stream": "true"})["stream"] is True
+    with pytest.raises(ValueError, match="stream"):
+        session.update_preferences({"stream": "maybe", "audio": True})
+    # A rejected update changes nothing
+    assert session.preferences["audio"] is False
+    with pytest.raises(ValueError, match="sample_rate"):
+        session.update_preferences({"sample_rate": "0"})
+    assert parse_bool(0) is False
+    with pytest.raises(ValueError):
+        parse_bool(2)
+
+
+def test_store_resumes_and_prunes() -> None:
+    store = SessionStore(max_history=3, idle_timeout=60)
+    session = store.get_or_create()
+    assert store.get_or_create(session.id) is session
+    assert len(store) == 1
+
+    session.last_active -= 120
+    assert store.prune() == 1
+    assert store.get(session.id) is None
+
+
+def test_store_does_not_resume_another_users_session() -> None:
+    store = SessionStore()
+    mine = store.get_or_create("abc", user_id="ada")
+    assert store.get_or_create("abc", user_id="ada") is mine
+    theirs = store.get_or_create("abc", user_id="bob")
+    assert theirs is not mine
+    assert theirs.user_id == "bob" and theirs.id != "abc"
+
+
+def test_evicted_turns_are_kept_for_summarising() -> None:
+    session = ChatSession(max_history=2)
+    for text in ("one", "two", "three", "four"):
+        session.add_turn(text, text.upper())
+    assert [t.user_text for t in session.evicted] == ["one", "two"]
+
+
+async def test_summarizer_folds_evicted_turns_incrementally() -> None:
+    prompts: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompts.append(json.loads(request.content)["prompt"])
+        return httpx.Response(200, json={"response": f"summary {len(prompts)}"})
+
+    summarizer = SessionSummarizer(
+        Config(), client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    session = ChatSession(max_history=1)
+    session.add_turn("My name is Ada", "Hello Ada")
+    assert summarizer.schedule(session) is False  # nothing evicted yet
+    session.add_turn("I like tea", "Noted")
+    assert summarizer.schedule(session) is True
+    await asyncio.sleep(0.05)
+    assert session.summary == "summary 1" and not session.evicted
+    assert "My name is Ada" in prompts[0] and "I like tea" not in prompts[0]
+
+    session.add_turn("Bye", "Goodbye")
+    summarizer.schedule(session)
+    await asyncio.sleep(0.05)
+    # Only the previous summary and the newly evicted turn are sent
+    assert "summary 1" in prompts[1] and "Ada" not in prompts[1]
+    assert session.summary == "summary 2" and session.summarized_turns == 2
+    assert summarizer.stats()["turns_summarized"] == 2
+
+
+def test_summary_follows_a_stable_system_message() -> None:
+    prompt = CompiledPrompt("You are Jarvis.", version=0)
+    messages = prompt.messages("Hi", history=[("a", "b")], summary="Ada likes tea.")
+    # A rewritten summary must not change the system message itself
+    assert messages[0] == {"role": "system", "content": "You are Jarvis."}
+    assert messages[1]["content"] == f"{SUMMARY_HEADER}\nAda likes tea."
+    assert [m["role"] for m in messages] == ["system", "system", "user", "assistant", "user"]
+    assert len(prompt.messages("Hi", history=[("a", "b")])) == 4
+    flat = prompt.render("Hi", history=[("a", "b")], summary="Ada likes tea.")
+    assert flat.startswith("You are Jarvis.\n\n" + SUMMARY_HEADER)
+    assert "Ada likes tea." in flat and "User: a" in flat
@@ -0,0 +1,100 @@
+"""Tests for the shared SQLite storage layer."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from convo_ai.config import Config
+from convo_ai.services.database import ConversationEntry, Database
+from convo_ai.services.prompt import PromptService
+from convo_ai.services.storage import Storage
+
+
+def _storage(tmp_path: Path) -> Storage:
+    return Storage(Config(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+
+
+def test_connections_use_wal(tmp_path: Path) -> None:
+    storage = _storage(tmp_path)
+    with storage.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+
+def test_unit_of_work_commits_or_rolls_back(tmp_path: Path) -> None:
+    storage = _storage(tmp_path)
+    db = Database(storage.config, storage=storage)
+    hooks: list[str] = []
+
+    with storage.unit_of_work() as uow:
+        db.add_entry("Hello", "Hi", uow=uow)
+        uow.after_commit(lambda: hooks.append("committed"))
+        assert hooks == []
+    assert hooks == ["committed"]
+    assert len(db.get_history()) == 1
+
+    with pytest.raises(RuntimeError), storage.unit_of_work() as uow:
+        db.add_entry("Lost", "Never stored", uow=uow)
+        uow.after_commit(lambda: hooks.append("rolled back"))
+        raise RuntimeError("boom")
+    assert hooks == ["committed"]
+    assert [e.user_text for e in db.get_history()] == ["Hello"]
+    assert isinstance(db.get_history()[0], ConversationEntry)
+
+
+def test_imports_legacy_prompt_file_once(tmp_path: Path) -> None:
+    legacy = sqlite3.connect(tmp_path / "test_prompt.db")
+    legacy.execute(
+        "CREATE TABLE systempromptentry (id INTEGER NOT NULL PRIMARY KEY, "
+        "content VARCHAR NOT NULL, updated_at VARCHAR NOT NULL)"
+    )
+    legacy.execute("INSERT INTO systempromptentry VALUES (1, 'You are Friday.', '')")
+    legacy.commit()
+    legacy.close()
+
+    storage = _storage(tmp_path)
+    assert PromptService(storage.config, storage=storage).get_prompt() == "You are Friday."
+    assert not (tmp_path / "test_prompt.db").exists()
+    assert (tmp_path / "test_prompt.db.migrated").exists()
+
+
+def test_prompts_are_per_user_with_shared_default(tmp_path: Path) -> None:
+    storage = _storage(tmp_path)
+    prompts = PromptService(storage.config, storage=storage)
+    prompts.set_prompt("You are Friday.")
+    prompts.set_prompt("You are Karen.", user_id="peter")
+    assert prompts.get_prompt("peter") == "You are Karen."
+    assert prompts.get_prompt("tony") == "You are Friday."
+    assert prompts.get_prompt() == "You are Friday."
+
+
+def test_prompt_is_cached_until_changed(tmp_path: Path) -> None:
+    storage = _storage(tmp_path)
+    prompts = PromptService(storage.config, storage=storage)
+    first = prompts.compiled("tony")
+    assert prompts.compiled("tony") is first
+    assert prompts.build_prompt("hi", "likes tea", user_id="tony") == (
+        f"{first.system}\n\n--- Memory ---\nlikes tea\n\nRespond to this: hi"
+    )
+
+    # Changing the shared default invalidates users who inherit it
+    prompts.set_prompt("You are Friday.")
+    assert prompts.version == first.version + 1
+    assert prompts.compiled("tony").system == "You are Friday."
+    assert prompts.compiled("tony").version == prompts.version
+
+
+def test_chat_messages_keep_a_stable_prefix(tmp_path: Path) -> None:
+    storage = _storage(tmp_path)
+    prompts = PromptService(storage.config, storage=storage)
+    first = prompts.build_messages("Hi", memory_context="likes tea")
+    second = prompts.build_messages(
+        "And you?", memory_context="likes coffee", history=[("Hi", "Hello, Sir.")]
+    )
+    # Only the final message carries per-turn memory, so earlier messages never change
+    assert second[0] == first[0]
+    assert second[1] == {"role": "user", "content": "Hi"}
+    assert second[2] == {"role": "assistant", "content": "Hello, Sir."}
+    assert second[-1]["content"].endswith("And you?")
+    assert "likes coffee" in second[-1]["content"]
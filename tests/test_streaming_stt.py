@@ -0,0 +1,93 @@
+"""Tests for streamed, VAD-segmented transcription."""
+
+from typing import Any
+
+import numpy as np
+
+from convo_ai.config import STTSettings
+from convo_ai.services.audio import pcm16_to_float32, resample
+from convo_ai.services.streaming_stt import StreamingTranscriber
+
+RATE = 16000
+
+
+def _pcm(seconds: float, amplitude: float = 0.0, rate: int = RATE) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    wave = amplitude * np.sin(2 * np.pi * 220 * t)
+    return (wave * 32767).astype("<i2").tobytes()
+
+
+class FakeSTT:
+    def __init__(self) -> None:
+        self.calls: list[float] = []
+
+    async def transcribe_array(
+        self, audio: np.ndarray, profile: str | None = None, partial: bool = False
+    ) -> str:
+        self.calls.append(audio.size / RATE)
+        return f"words{len(self.calls)}"
+
+
+def test_pcm_helpers() -> None:
+    samples = pcm16_to_float32(b"\x00\x80\xff\x7f\x01")  # odd trailing byte dropped
+    assert samples.tolist() == [-1.0, 32767 / 32768]
+    assert resample(np.zeros(8000, dtype=np.float32), 8000).size == RATE
+
+
+async def test_segments_close_on_silence_and_finish_flushes() -> None:
+    stt = FakeSTT()
+    events: list[dict[str, Any]] = []
+
+    async def on_event(event: dict[str, Any]) -> None:
+        events.append(event)
+
+    settings = STTSettings(segment_silence_ms=300, partial_interval_ms=10_000)
+    stream = StreamingTranscriber(stt, settings, on_event=on_event)
+    stream.feed(_pcm(0.5))  # leading silence is not transcribed
+    stream.feed(_pcm(0.6, amplitude=0.3))
+    stream.feed(_pcm(0.4))  # closes the first segment
+    stream.feed(_pcm(0.5, amplitude=0.3))  # still open at the end
+    text = await stream.finish()
+
+    assert text == "words1 words2"
+    assert len(stt.calls) == 2
+    # First segment: pre-roll + speech + the silence that closed it
+    assert 0.6 < stt.calls[0] < 1.2
+    finals = [e for e in events if e["partial"] is False]
+    assert [e["segment"] for e in finals] == [0, 1]
+
+
+async def test_partial_transcripts_while_speaking() -> None:
+    stt = FakeSTT()
+    events: list[dict[str, Any]] = []
+
+    async def on_event(event: dict[str, Any]) -> None:
+        events.append(event)
+
+    settings = STTSettings(partial_interval_ms=300)
+    stream = StreamingTranscriber(stt, settings, sample_rate=8000, on_event=on_event)
+    for _ in range(4):
+        stream.feed(_pcm(0.2, amplitude=0.3, rate=8000))
+        if stream._partial_task is not None:
+            await stream._partial_task
+    await stream.finish()
+    assert any(e["partial"] for e in events)
+    assert events[-1]["partial"] is False
+
+
+async def test_failed_final_segment_is_reported() -> None:
+    class FailingSTT(FakeSTT):
+        async def transcribe_array(
+            self, audio: np.ndarray, profile: str | None = None, partial: bool = False
+        ) -> str:
+            raise RuntimeError("worker crashed")
+
+    events: list[dict[str, Any]] = []
+
+    async def on_event(event: dict[str, Any]) -> None:
+        events.append(event)
+
+    stream = StreamingTranscriber(FailingSTT(), STTSettings(), on_event=on_event)
+    stream.feed(_pcm(0.5, amplitude=0.3))
+    await stream.finish()
+    assert events == [{"error": "transcription failed: worker crashed", "segment": 0}]
@@ -0,0 +1,140 @@
+"""Tests for the Whisper worker pool."""
+
+import asyncio
+import threading
+import time
+from typing import Any
+
+import numpy as np
+import pytest
+
+from convo_ai.config import Config
+from convo_ai.services import stt_pool
+from convo_ai.services.stt import decode_options
+from convo_ai.services.stt_pool import TranscriptionPool, TranscriptionQueueFullError
+
+
+class FakeReplica:
+    loaded: list[str] = []
+
+    def __init__(self) -> None:
+        FakeReplica.loaded.append(threading.current_thread().name)
+
+    def transcribe_array(self, audio: np.ndarray, profile: str) -> str:
+        time.sleep(0.1)
+        return f"{audio.size} samples on {threading.current_thread().name}"
+
+    def transcribe_batch(self, clips: list[np.ndarray], profile: str) -> list[str]:
+        time.sleep(0.1)
+        return [f"{clip.size} samples in a {profile} batch of {len(clips)}" for clip in clips]
+
+
+@pytest.fixture
+def fake_replicas(monkeypatch: Any) -> None:
+    local = threading.local()
+    FakeReplica.loaded = []
+
+    def replica(_config: Config) -> FakeReplica:
+        if not hasattr(local, "stt"):
+            local.stt = FakeReplica()
+        return local.stt
+
+    monkeypatch.setattr(stt_pool, "_replica", replica)
+
+
+async def test_pool_runs_replicas_in_parallel_with_bounded_queue(fake_replicas: None) -> None:
+    config = Config()
+    config.stt_settings.workers = 2
+    config.stt_settings.queue_size = 1
+    pool = TranscriptionPool(config)
+    try:
+        await pool.start()
+        assert len(set(FakeReplica.loaded)) == 2  # one replica per worker thread
+
+        audio = np.zeros(160, dtype=np.float32)
+        jobs = [asyncio.ensure_future(pool.transcribe_array(audio)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        assert (pool.active, pool.waiting) == (2, 1)
+        # Uploads are rejected once the queue is full, partials whenever no worker is idle
+        with pytest.raises(TranscriptionQueueFullError):
+            await pool.transcribe_bytes(b"", "pcm16")
+        with pytest.raises(TranscriptionQueueFullError):
+            await pool.transcribe_array(audio, partial=True)
+        # A closed live segment still waits for a worker rather than being dropped
+        jobs.append(asyncio.ensure_future(pool.transcribe_array(audio)))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*jobs)
+        assert all(r.startswith("160 samples on whisper") for r in results)
+        assert len({r.split(" on ")[1] for r in results}) == 2
+        # Two run at once, then the other two: about two job lengths, not four
+        assert time.perf_counter() - started < 0.25
+        stats = pool.stats()
+        assert (stats["completed"], stats["rejected"], stats["shed"]) == (4, 1, 1)
+    finally:
+        pool.shutdown()
+
+
+async def test_batcher_groups_concurrent_clips(fake_replicas: None) -> None:
+    config = Config()
+    config.stt_settings.batch_enabled = True
+    config.stt_settings.batch_max_size = 3
+    config.stt_settings.batch_max_wait_ms = 50
+    config.stt_settings.default_profile = "fast"  # batching needs a pinned language
+    pool = TranscriptionPool(config)
+    try:
+        clips = [np.zeros(160 * (i + 1), dtype=np.float32) for i in range(4)]
+        results = await asyncio.gather(*(pool.transcribe_array(c) for c in clips))
+        # Three fill the first batch; the fourth waits out the window alone
+        assert results[:3] == [f"{160 * (i + 1)} samples in a fast batch of 3" for i in range(3)]
+        assert results[3] == "640 samples in a fast batch of 1"
+        pcm = np.zeros(320, dtype="<i2").tobytes()
+        assert await pool.transcribe_bytes(pcm, "pcm16") == "320 samples in a fast batch of 1"
+
+        stats = pool.stats()["batching"]
+        assert (stats["batches"], stats["clips"], stats["max_batch_size"]) == (3, 5, 3)
+        assert stats["max_added_ms"] >= 40 and stats["throughput"] > 0
+        assert pool.stats()["completed"] == 3  # one pool job per batch
+    finally:
+        await pool.stop()
+
+
+def test_decode_profiles_resolve_by_name() -> None:
+    settings = Config().stt_settings
+    name, options = decode_options(settings, "fast")
+    assert name == "fast" and options["beam_size"] == 1 and options["language"] == "en"
+    assert decode_options(settings, "bogus")[0] == settings.default_profile
+    assert decode_options(settings, "")[0] == settings.default_profile
+
+
+async def test_profiles_are_batched_apart_and_timed(fake_replicas: None) -> None:
+    config = Config()
+    config.stt_settings.batch_enabled = True
+    config.stt_settings.batch_max_wait_ms = 20
+    profiles = config.stt_settings.profiles
+    profiles["fast_de"] = {**profiles["fast"], "language": "de"}
+    pool = TranscriptionPool(config)
+    try:
+        clip = np.zeros(160, dtype=np.float32)
+        results = await asyncio.gather(
+            pool.transcribe_array(clip, "fast"),
+            pool.transcribe_array(clip, "fast_de"),
+            pool.transcribe_array(clip, "fast"),
+            pool.transcribe_array(clip, "accurate"),
+        )
+        assert results[:3] == [
+            "160 samples in a fast batch of 2",
+            "160 samples in a fast_de batch of 1",
+            "160 samples in a fast batch of 2",
+        ]
+        # No pinned language: a batch would force the first clip's language on all
+        assert results[3].startswith("160 samples on whisper")
+        timings = pool.stats()["profiles"]
+        assert {name: t["requests"] for name, t in timings.items()} == {
+            "fast": 2,
+            "fast_de": 1,
+            "accurate": 1,
+        }
+        assert timings["fast"]["avg_ms"] >= 100
+    finally:
+        await pool.stop()
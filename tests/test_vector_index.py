@@ -0,0 +1,39 @@
+"""Tests for the NumPy vector index."""
+
+import numpy as np
+
+from convo_ai.services.vector_index import VectorIndex
+
+
+def test_search_ranks_by_cosine_plus_bias() -> None:
+    index = VectorIndex()
+    index.add(1, [1.0, 0.0, 0.0])
+    index.add(2, [0.0, 1.0, 0.0])
+    index.add(3, [0.7, 0.7, 0.0], bias=0.5)
+
+    hits = index.search([1.0, 0.0, 0.0], k=2)
+    assert [item_id for item_id, _ in hits] == [3, 1]
+    assert np.isclose(hits[1][1], 1.0)
+
+
+def test_update_and_remove_keep_rows_consistent() -> None:
+    index = VectorIndex()
+    for i in range(100):
+        index.add(i, [float(i), 1.0])
+    index.remove(0)
+    index.remove(50)
+    index.add(99, [-1.0, 0.0])  # replace in place
+    assert len(index) == 98
+    assert 50 not in index
+
+    best_id, _ = index.search([-1.0, 0.0], k=1)[0]
+    assert best_id == 99
+
+
+def test_rejects_empty_and_mismatched_vectors() -> None:
+    index = VectorIndex()
+    assert not index.add(1, [])
+    assert index.add(2, [1.0, 0.0])
+    assert not index.add(3, [1.0, 0.0, 0.0])
+    assert index.search([1.0, 0.0, 0.0]) == []
+    assert len(index) == 1